@@ -10,6 +10,7 @@ import io
 from io import BytesIO
 import tempfile
 import os
+from utils.progress import StageProgress, ProgressCancelled
 
 class ArrearsProcessorAPI:
     """API-friendly Arrears Processor without GUI dependencies."""
@@ -171,11 +172,20 @@ class ArrearsProcessorAPI:
             raise Exception(f"Error loading {filename}: {str(e)}")
     
     def process_data(self, sod_content: bytes, sod_filename: str, 
-                    cur_content: bytes, cur_filename: str) -> Optional[tuple]:
-        """Process the arrears data and return pivot table."""
+                    cur_content: bytes, cur_filename: str,
+                    progress: Optional[StageProgress] = None) -> Optional[tuple]:
+        """
+        Process the arrears data and return pivot table.
+        
+        Progress hooks need 'load_sod', 'load_current', 'merge' and 'bucket'
+        stages; cancellation is checked between stages and row blocks.
+        """
+        progress = progress or StageProgress(None, [])
         try:
             # Load and clean data
+            progress.stage('load_sod', "Loading SOD file...")
             df_sod = self.load_and_clean_data(sod_content, sod_filename)
+            progress.stage('load_current', "Loading current file...")
             df_cur = self.load_and_clean_data(cur_content, cur_filename)
             
             # Normalize officer names
@@ -206,6 +216,7 @@ class ArrearsProcessorAPI:
             unique_officers = sorted(df_sod['SalesRep'].unique().tolist())
             
             # Merge dataframes
+            progress.stage('merge', f"Matching {len(df_sod):,} loans...")
             df_merged = pd.merge(
                 df_sod[['LoanId', 'SalesRep', 'Arrears_SOD', 'Age_SOD']],
                 df_cur[['LoanId', 'Arrears_CUR']],
@@ -222,13 +233,18 @@ class ArrearsProcessorAPI:
             
             # Filter and categorize
             df_collected = df_merged[df_merged['Collected'] > 0].copy()
-            df_collected['Bucket'] = df_collected['Age_SOD'].apply(self.get_bucket)
+            progress.stage('bucket', "Calculating collections...", rows_total=len(df_collected))
+            df_collected['Bucket'] = progress.apply(
+                df_collected['Age_SOD'], lambda block: block.apply(self.get_bucket)
+            )
             
             # Filter for valid buckets only
             df_collected = df_collected[df_collected['Bucket'].isin(self.VALID_BUCKETS)]
             
             return df_collected, df_merged, unique_officers
             
+        except ProgressCancelled:
+            raise
         except Exception as e:
             raise Exception(f"Error processing data: {str(e)}")
     
@@ -525,7 +541,8 @@ class ArrearsProcessorAPI:
     def process(self, sod_content: bytes, sod_filename: str,
                 cur_content: bytes, cur_filename: str,
                 officer_targets: Optional[Dict[str, float]] = None,
-                output_format: str = 'json') -> Dict:
+                output_format: str = 'json',
+                progress: Optional[StageProgress] = None) -> Dict:
         """
         Main processing method for API use.
         
@@ -536,14 +553,17 @@ class ArrearsProcessorAPI:
             cur_filename: Name of Current file
             officer_targets: Optional dictionary of officer targets
             output_format: 'json' or 'excel'
+            progress: Optional stage hooks (the process_data stages plus 'report');
+                ProgressCancelled propagates when the operation is cancelled
         
         Returns:
             Dictionary with results and either JSON data or Excel bytes
         """
+        progress = progress or StageProgress(None, [])
         try:
             # Process data
             df_collected, df_merged, officers = self.process_data(
-                sod_content, sod_filename, cur_content, cur_filename
+                sod_content, sod_filename, cur_content, cur_filename, progress
             )
             
             if df_collected.empty:
@@ -559,6 +579,7 @@ class ArrearsProcessorAPI:
                 }
             
             # Create formatted table with targets
+            progress.stage('report', "Generating summary...")
             final_df = self.create_formatted_table(df_collected, officers, officer_targets)
             
             if output_format.lower() == 'excel':
@@ -579,6 +600,8 @@ class ArrearsProcessorAPI:
                 
                 return json_report
             
+        except ProgressCancelled:
+            raise
         except Exception as e:
             return {
                 'status': 'error',
@@ -11,6 +11,8 @@ from openpyxl import load_workbook
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
 import warnings
+from utils.logging_pipeline import configure_logging
+from utils.progress import StageProgress, ProgressCancelled
 warnings.filterwarnings('ignore')
 
 class ProcessingHistory:
@@ -69,15 +71,8 @@ class BranchDataProcessorAPI:
         }
     
     def setup_logging(self, log_file: str):
-        """Setup logging configuration"""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(log_file),
-                logging.StreamHandler()
-            ]
-        )
+        """Setup logging configuration (shared; only the first call in a process adds handlers)"""
+        configure_logging(log_format='text', log_file=log_file)
         self.logger = logging.getLogger(__name__)
     
     def set_options(self, options: Dict[str, Any]) -> None:
@@ -88,10 +83,13 @@ class BranchDataProcessorAPI:
                 self.options[key] = value
         self.logger.info(f"Options set: {self.options}")
     
-    def load_data(self, file_content: bytes, filename: str) -> Dict[str, Any]:
-        """Load data from bytes (Excel file)"""
+    def load_data(self, file_content: bytes, filename: str,
+                  progress: Optional[StageProgress] = None) -> Dict[str, Any]:
+        """Load data from bytes (Excel file); progress hooks need a 'load' stage"""
+        progress = progress or StageProgress(None, [])
         try:
             self.logger.info(f"Loading file: {filename}")
+            progress.stage('load', f"Reading {filename}...")
             
             # Read the Excel file from bytes
             if filename.lower().endswith('.csv'):
@@ -147,6 +145,8 @@ class BranchDataProcessorAPI:
                 }
             }
                 
+        except ProgressCancelled:
+            raise
         except Exception as e:
             error_msg = f"Error loading file: {str(e)}"
             self.logger.error(error_msg, exc_info=True)
@@ -194,8 +194,9 @@ class BranchDataProcessorAPI:
                     return col
         return None
     
-    def format_excel_file(self, wb, df):
+    def format_excel_file(self, wb, df, progress: Optional[StageProgress] = None):
         """Add formatting to Excel workbook with bold yellow headers"""
+        progress = progress or StageProgress(None, [])
         try:
             ws = wb.active
             
@@ -231,6 +232,9 @@ class BranchDataProcessorAPI:
             
             # Apply formatting to data rows with alternating colors
             for row in range(2, len(df) + 2):
+                if row % progress.block_rows == 0:
+                    progress.rows(row - 1)
+                
                 for col in range(1, len(df.columns) + 1):
                     cell = ws.cell(row=row, column=col)
                     cell.alignment = alignment
@@ -248,6 +252,8 @@ class BranchDataProcessorAPI:
             self.logger.info("Added formatting to Excel file")
             return wb
             
+        except ProgressCancelled:
+            raise
         except Exception as e:
             self.logger.warning(f"Could not apply Excel formatting: {str(e)}")
             return wb
@@ -369,8 +375,14 @@ class BranchDataProcessorAPI:
         
         return checks
     
-    def process_branch(self, branch_name: str) -> Dict[str, Any]:
-        """Process data for a single branch"""
+    def process_branch(self, branch_name: str, progress: Optional[StageProgress] = None) -> Dict[str, Any]:
+        """
+        Process data for a single branch
+        
+        Progress hooks need 'filter', 'normalize', 'deduplicate', 'sort' and
+        'quality' stages; cancellation is checked between row blocks.
+        """
+        progress = progress or StageProgress(None, [])
         if self.df is None:
             return {
                 'status': 'error',
@@ -385,6 +397,7 @@ class BranchDataProcessorAPI:
         
         try:
             self.logger.info(f"Starting data processing for branch: {branch_name}")
+            progress.stage('filter', f"Selecting branch: {branch_name}")
             
             # Find branch column
             branch_col = self.find_column_by_keywords(self.df, ['branch'])
@@ -423,10 +436,15 @@ class BranchDataProcessorAPI:
                 if any(keyword in col.lower() for keyword in ['phone', 'mobile', 'number', 'borrowerphone']):
                     phone_columns_to_normalize.append(col)
             
+            progress.stage('normalize', "Normalizing phone numbers...", rows_total=len(branch_data))
             if phone_columns_to_normalize:
-                branch_data = self.normalize_phone_numbers_vectorized(branch_data, phone_columns_to_normalize)
+                branch_data = progress.apply(
+                    branch_data,
+                    lambda block: self.normalize_phone_numbers_vectorized(block, phone_columns_to_normalize)
+                )
             
             # STEP 4: Remove duplicates if option is checked
+            progress.stage('deduplicate', "Removing duplicates...")
             duplicates_removed = 0
             if self.options.get('remove_duplicates', True) and phone_columns_to_normalize:
                 branch_data, duplicates_removed = self.deduplicate_phone_numbers(branch_data, phone_columns_to_normalize)
@@ -445,6 +463,7 @@ class BranchDataProcessorAPI:
                 branch_data[date_cleared_col] = pd.to_datetime(branch_data[date_cleared_col], errors='coerce')
             
             # STEP 8: Sort data
+            progress.stage('sort', "Sorting by officer...", rows_total=len(branch_data))
             if ro_col:
                 # Get unique officers/portfolios and sort them in ascending order
                 officers = sorted(branch_data[ro_col].dropna().unique())
@@ -465,6 +484,7 @@ class BranchDataProcessorAPI:
                     
                     # Add this officer's data to the sorted DataFrame
                     sorted_data = pd.concat([sorted_data, officer_data])
+                    progress.rows(len(sorted_data))
                 
                 if sorted_data.empty:
                     if date_cleared_col:
@@ -482,6 +502,7 @@ class BranchDataProcessorAPI:
                     sorted_data = branch_data
             
             # STEP 9: Perform quality checks
+            progress.stage('quality', "Performing quality checks...")
             quality_checks = self.perform_quality_checks(sorted_data)
             
             # Prepare response
@@ -517,6 +538,8 @@ class BranchDataProcessorAPI:
             
             return response
             
+        except ProgressCancelled:
+            raise
         except Exception as e:
             error_msg = f"Error processing data: {str(e)}"
             self.logger.error(error_msg, exc_info=True)
@@ -659,12 +682,16 @@ class BranchDataProcessorAPI:
                 'message': error_msg
             }
     
-    def download_processed_data(self, branch_name: str, format: str = 'excel') -> Dict[str, Any]:
+    def download_processed_data(self, branch_name: str, format: str = 'excel',
+                                progress: Optional[StageProgress] = None) -> Dict[str, Any]:
         """
         Download processed data for a specific branch
         
+        Progress hooks need an 'export' stage.
+        
         Returns dictionary with file data and metadata
         """
+        progress = progress or StageProgress(None, [])
         if self.df is None:
             return {
                 'status': 'error',
@@ -720,6 +747,7 @@ class BranchDataProcessorAPI:
                 branch_data = branch_data.sort_values(by=date_cleared_col, ascending=False)
             
             # Prepare filename
+            progress.stage('export', f"Generating {format} file...", rows_total=len(branch_data))
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             safe_branch_name = branch_name.replace(' ', '_').replace('/', '_')
             
@@ -745,7 +773,7 @@ class BranchDataProcessorAPI:
                 if self.options.get('add_formatting', True):
                     output.seek(0)
                     wb = load_workbook(output)
-                    wb = self.format_excel_file(wb, branch_data)
+                    wb = self.format_excel_file(wb, branch_data, progress)
                     
                     # Save formatted workbook back to buffer
                     output = BytesIO()
@@ -766,6 +794,8 @@ class BranchDataProcessorAPI:
                 'timestamp': timestamp
             }
             
+        except ProgressCancelled:
+            raise
         except Exception as e:
             error_msg = f"Error generating download file: {str(e)}"
             self.logger.error(error_msg, exc_info=True)
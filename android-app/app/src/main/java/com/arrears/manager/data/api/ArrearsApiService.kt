@@ -103,9 +103,12 @@ interface ArrearsApiService {
     // Progress Tracking
     // ============================================
 
+    // Long poll: with version and wait the call returns when the progress changes
     @GET("loans/progress/{operationId}")
     suspend fun getProcessingProgress(
-        @Path("operationId") operationId: String
+        @Path("operationId") operationId: String,
+        @Query("version") version: Int? = null,
+        @Query("wait") wait: Int? = null
     ): Response<ProgressResponse>
 
     // ============================================
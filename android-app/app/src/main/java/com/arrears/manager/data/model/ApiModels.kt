@@ -218,7 +218,10 @@ data class ProgressResponse(
     val metadata: Map<String, Any>? = null,
     @SerializedName("elapsed_seconds")
     val elapsedSeconds: Double,
-    val completed: Boolean
+    val completed: Boolean,
+    val cancelled: Boolean = false,
+    val finished: Boolean = false,
+    val version: Int = 0
 )
 
 // ============================================
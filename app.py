@@ -4,7 +4,6 @@ Main application file with middleware integration and route registration
 """
 from flask import Flask, request
 from flask_cors import CORS
-from flask_compress import Compress
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import logging
@@ -19,7 +18,29 @@ from database import init_db, db
 # Import middleware
 from middleware.error_handler import register_error_handlers
 from middleware.security import SecurityMiddleware, configure_secure_cookies
+from middleware.auth import AuthMiddleware
 from middleware.logging_middleware import LoggingMiddleware
+from middleware.compression import CompressionMiddleware
+from middleware.metrics import MetricsMiddleware
+from middleware.profiling import ProfilingMiddleware
+from middleware.rate_limit import LocalRateLimitStorage  # noqa: F401 (registers the local:// rate limit storage)
+
+# Import upload ingestion
+from utils.ingest import SpoolingRequest
+
+# Import logging pipeline
+from utils.logging_pipeline import configure_logging
+
+# Import shared progress store and request deadlines
+from utils.progress import configure_progress_store
+from utils.deadline import start_request_deadline
+
+# Import metrics shared by the workers of the host
+from utils.metrics import configure_metrics_store
+from routes.health import process_metric_lines
+
+# Import result store shared by the workers of the host
+from utils.result_store import configure_result_store
 
 # Configure logging
 logging.basicConfig(
@@ -41,6 +62,9 @@ def create_app(config_name=None):
     """
     app = Flask(__name__)
     
+    # Parse uploads from an in-memory spool instead of a temp file
+    app.request_class = SpoolingRequest
+    
     # Load configuration
     if config_name is None:
         config_name = os.getenv('FLASK_ENV', 'development')
@@ -48,6 +72,31 @@ def create_app(config_name=None):
     config = get_config(config_name)
     app.config.from_object(config)
     
+    # Queue all logging to a background writer (first app in the process sets it up)
+    configure_logging(
+        level=app.config['LOG_LEVEL'],
+        log_format=app.config['LOG_FORMAT'],
+        log_file=app.config['LOG_FILE'],
+        queue_size=app.config['LOG_QUEUE_SIZE']
+    )
+    
+    # Publish progress of long-running operations to all workers (first app sets it up)
+    configure_progress_store(
+        path=app.config['PROGRESS_STORE_PATH'],
+        ttl=app.config['PROGRESS_TTL'],
+        flush_interval=app.config['PROGRESS_FLUSH_INTERVAL']
+    )
+    
+    # Publish metrics of every worker for /metrics (first app sets it up)
+    configure_metrics_store(
+        path=app.config['METRICS_STORE_PATH'],
+        extra_lines=process_metric_lines,
+        interval=app.config['METRICS_PUBLISH_INTERVAL']
+    )
+    
+    # Serve stored results from any worker of this host
+    configure_result_store(app.config['RESULT_STORE_DIR'])
+    
     logger.info(f"Starting Arrears Manager API in {config_name} mode")
     
     # Initialize database
@@ -63,11 +112,17 @@ def create_app(config_name=None):
          max_age=app.config['CORS_MAX_AGE'])
     logger.info("CORS configured for Android applications")
     
-    # Initialize compression (gzip/brotli)
-    Compress(app)
+    # Initialize on-demand profiling (first, so profiles cover the other middleware too)
+    profiling = ProfilingMiddleware(app)
+    
+    # Initialize stage timing and metrics (before compression, so compress time is included)
+    metrics_middleware = MetricsMiddleware(app)
+    
+    # Initialize compression (gzip/brotli, level adapted to size and load)
+    compression = CompressionMiddleware(app)
     logger.info("Response compression enabled")
     
-    # Initialize rate limiting
+    # Initialize rate limiting (local:// storage shares counters between workers)
     limiter = Limiter(
         app=app,
         key_func=get_remote_address,
@@ -86,6 +141,9 @@ def create_app(config_name=None):
     logging_middleware = LoggingMiddleware(app)
     logger.info("Logging middleware initialized")
     
+    # Initialize authentication (one instance shared by all requests)
+    auth = AuthMiddleware(app)
+    
     # Register error handlers
     register_error_handlers(app)
     logger.info("Error handlers registered")
@@ -99,11 +157,11 @@ def create_app(config_name=None):
         os.makedirs(upload_folder)
         logger.info(f"Created upload folder: {upload_folder}")
     
-    # Add request timeout handling
+    # Give every request a deadline that processors check between stages
     @app.before_request
     def set_request_timeout():
-        """Set request timeout for mobile optimization"""
-        request.environ['werkzeug.server.shutdown_timeout'] = app.config['REQUEST_TIMEOUT']
+        """Start the request deadline (REQUEST_TIMEOUT, or a shorter X-Request-Timeout)"""
+        start_request_deadline(app.config['REQUEST_TIMEOUT'], reserve=app.config['REQUEST_DEADLINE_RESERVE'])
     
     logger.info("Application initialization complete")
     
@@ -119,6 +177,7 @@ def register_blueprints(app):
     from routes.v1.devices import devices_bp
     from routes.v1.loans import loans_bp
     from routes.v1.uploads import uploads_bp
+    from routes.v1.profiles import profiles_bp
     
     # Register health check (no version prefix)
     app.register_blueprint(health_bp)
@@ -129,6 +188,7 @@ def register_blueprints(app):
     app.register_blueprint(devices_bp, url_prefix=f"{api_prefix}/devices")
     app.register_blueprint(loans_bp, url_prefix=f"{api_prefix}/loans")
     app.register_blueprint(uploads_bp, url_prefix=f"{api_prefix}/uploads")
+    app.register_blueprint(profiles_bp, url_prefix=f"{api_prefix}/profiles")
     
     logger.info(f"API blueprints registered with prefix: {api_prefix}")
 
@@ -10,6 +10,7 @@ import io
 import tempfile
 from datetime import datetime
 from typing import Dict, Optional, Union
+from utils.progress import StageProgress, ProgressCancelled
 
 class EnterpriseDashboardAPI:
     """API version of Enterprise Dashboard without tkinter"""
@@ -21,18 +22,24 @@ class EnterpriseDashboardAPI:
         self.temp_files = []
     
     def create_enterprise_dashboard(self, file_input: Union[str, io.BytesIO], 
-                                   output_path: Optional[str] = None) -> Dict:
+                                   output_path: Optional[str] = None,
+                                   progress: Optional[StageProgress] = None) -> Dict:
         """
         Create enterprise dashboard report
         
         Args:
             file_input: File path or BytesIO object
             output_path: Optional output path for the report
+            progress: Optional stage hooks ('load', 'clean', 'sort', 'excel'
+                and 'summary'); ProgressCancelled propagates when the
+                operation is cancelled
         
         Returns:
             Dictionary with results
         """
+        progress = progress or StageProgress(None, [])
         try:
+            progress.stage('load', "Loading data file...")
             # Determine file type and load data
             if isinstance(file_input, io.BytesIO):
                 # Reset stream position
@@ -65,6 +72,7 @@ class EnterpriseDashboardAPI:
                     df = pd.read_excel(file_input)
             
             # --- DATA CLEANING & PREP ---
+            progress.stage('clean', f"Cleaning {len(df):,} records...", rows_total=len(df))
             required_cols = ['FullNames', 'PhoneNumber', 'Arrears Amount', 'DaysInArrears', 'LoanBalance', 'SalesRep']
             df.columns = [c.strip() for c in df.columns]
             
@@ -88,7 +96,9 @@ class EnterpriseDashboardAPI:
                     return str(int(float(x)))
                 except:
                     return str(x)
-            df_clean['PhoneNumber'] = df_clean['PhoneNumber'].apply(clean_phone)
+            df_clean['PhoneNumber'] = progress.apply(
+                df_clean['PhoneNumber'], lambda block: block.apply(clean_phone)
+            )
 
             # BUCKETING LOGIC
             def get_bucket(days):
@@ -112,6 +122,7 @@ class EnterpriseDashboardAPI:
             df_clean['BucketID'] = df_clean['DaysInArrears'].apply(get_bucket_id)
 
             # --- SORTING LOGIC ---
+            progress.stage('sort', "Sorting by sales rep...")
             df_clean.sort_values(by=['SalesRep', 'DaysInArrears'], ascending=[True, True], inplace=True)
             
             self.df = df
@@ -133,12 +144,14 @@ class EnterpriseDashboardAPI:
             self.output_file = output_path
             
             # Generate the Excel report
-            result = self.generate_excel_report(output_path)
+            progress.stage('excel', "Generating Excel report...", rows_total=len(df_clean))
+            result = self.generate_excel_report(output_path, progress)
             
             if result['status'] == 'error':
                 return result
             
             # Calculate summary statistics
+            progress.stage('summary', "Calculating summary...")
             summary = self.calculate_summary_statistics()
             
             return {
@@ -157,6 +170,8 @@ class EnterpriseDashboardAPI:
                 }
             }
             
+        except ProgressCancelled:
+            raise
         except Exception as e:
             import logging
             logger = logging.getLogger(__name__)
@@ -166,8 +181,9 @@ class EnterpriseDashboardAPI:
                 'message': f'Error creating dashboard: {str(e)}'
             }
     
-    def generate_excel_report(self, output_file: str) -> Dict:
-        """Generate Excel report with charts and formatting"""
+    def generate_excel_report(self, output_file: str, progress: Optional[StageProgress] = None) -> Dict:
+        """Generate Excel report with charts and formatting (progress rows are reported per sales rep)"""
+        progress = progress or StageProgress(None, [])
         try:
             # Create Excel writer
             writer = pd.ExcelWriter(output_file, engine='xlsxwriter')
@@ -316,6 +332,7 @@ class EnterpriseDashboardAPI:
                 ws.write(0, col, h, fmt_header_yellow)
             
             row_num = 1
+            rows_written = 0
             col_widths = [len(h) for h in headers]  # For auto-fit
 
             # Iterate by Rep (for Total grouping)
@@ -426,6 +443,8 @@ class EnterpriseDashboardAPI:
                 ws.write(row_num, 6, total_balance, fmt_total_row)
 
                 row_num += 2 
+                rows_written += len(group)
+                progress.rows(rows_written)
 
             # --- APPLY INTELLIGENT AUTO-FIT ---
             for i, width in enumerate(col_widths):
@@ -447,6 +466,8 @@ class EnterpriseDashboardAPI:
                 'message': 'Excel report generated successfully'
             }
             
+        except ProgressCancelled:
+            raise
         except Exception as e:
             return {
                 'status': 'error',
@@ -0,0 +1,84 @@
+"""
+Benchmark: column-wise DataFrame JSON encoding vs the records + jsonify path
+
+Usage:
+    python benchmarks/bench_json_encoder.py [rows] [repeats]
+
+Compares, for one page of a loan result frame:
+  - current path: frame.to_dict(orient='records') followed by Flask's JSON provider
+  - encoder path: utils.json_encoder.dumps straight from the frame's columns
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.json_encoder import dumps  # noqa: E402
+
+
+def build_frame(rows: int) -> pd.DataFrame:
+    """Build a loan-shaped frame with strings, ints, floats with NaN and dates"""
+    rng = np.random.default_rng(42)
+    arrears = rng.uniform(0, 50000, rows).round(2)
+    arrears[rng.random(rows) < 0.05] = np.nan
+
+    return pd.DataFrame({
+        'LoanId': np.arange(rows),
+        'FullNames': [f'Client {i}' for i in range(rows)],
+        'PhoneNumber': [f'2547{i:08d}' for i in range(rows)],
+        'SalesRep': [f'Officer {i % 40}' for i in range(rows)],
+        'Arrears Amount': arrears,
+        'DaysInArrears': rng.integers(0, 180, rows),
+        'LoanBalance': rng.uniform(1000, 200000, rows).round(2),
+        'DisbursedOn': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365, rows), unit='D'),
+        'Bucket': pd.Categorical(rng.choice(['1-3 Days', '4-5 Days', '10-30 Days', '31+ Days'], rows)),
+    })
+
+
+def time_call(func, repeats: int) -> float:
+    """Return best-of-N wall time in milliseconds"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    app = Flask(__name__)
+    frame = build_frame(rows)
+
+    def records_path():
+        # Mirrors the previous handler path: records first, then jsonify
+        records = frame.to_dict(orient='records')
+        for record in records:
+            for key, value in record.items():
+                if isinstance(value, float) and np.isnan(value):
+                    record[key] = None
+        return app.json.dumps({'data': records})
+
+    def encoder_path():
+        return dumps({'data': frame})
+
+    with app.app_context():
+        records_ms = time_call(records_path, repeats)
+        encoder_ms = time_call(encoder_path, repeats)
+        size_kb = len(encoder_path()) / 1024
+
+    print(f'rows={rows} columns={len(frame.columns)} payload={size_kb:.0f}KB (best of {repeats})')
+    print(f'  records + jsonify : {records_ms:8.1f} ms')
+    print(f'  column encoder    : {encoder_ms:8.1f} ms')
+    print(f'  speedup           : {records_ms / encoder_ms:8.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -22,12 +22,16 @@ class Config:
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'dev-jwt-secret-change-in-production')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(seconds=int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES', 3600)))
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(seconds=int(os.getenv('JWT_REFRESH_TOKEN_EXPIRES', 2592000)))
+    AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', 10000))  # Verified tokens kept (signature checked once per token)
+    AUTH_REVOCATION_STORE_PATH = os.getenv('AUTH_REVOCATION_STORE_PATH', '/tmp/arrears_manager_revocations.sqlite')  # Revoked tokens, shared by the workers of a host
+    AUTH_REVOCATION_CHECK_INTERVAL = float(os.getenv('AUTH_REVOCATION_CHECK_INTERVAL', 1.0))  # Seconds until other workers' revocations are seen
+    AUTH_BYPASS = os.getenv('AUTH_BYPASS', 'True') == 'True'  # require_auth injects a dummy user instead of checking tokens
     
     # CORS
     CORS_ORIGINS = [origin.strip() for origin in os.getenv('CORS_ORIGINS', 'http://localhost,capacitor://localhost').split(',')]
     CORS_METHODS = ['GET', 'POST', 'PUT', 'DELETE', 'PATCH', 'OPTIONS']
     CORS_ALLOW_HEADERS = ['Content-Type', 'Authorization', 'X-Requested-With', 'X-Idempotency-Key', 'X-Device-Id', 'X-App-Version', 'X-Platform']
-    CORS_EXPOSE_HEADERS = ['X-RateLimit-Limit', 'X-RateLimit-Remaining', 'X-RateLimit-Reset', 'ETag', 'X-Correlation-Id']
+    CORS_EXPOSE_HEADERS = ['X-RateLimit-Limit', 'X-RateLimit-Remaining', 'X-RateLimit-Reset', 'ETag', 'X-Correlation-Id', 'Server-Timing']
     CORS_SUPPORTS_CREDENTIALS = True
     CORS_MAX_AGE = 86400  # 24 hours
     
@@ -49,7 +53,7 @@ class Config:
     CACHE_DEFAULT_TIMEOUT = int(os.getenv('CACHE_DEFAULT_TIMEOUT', 300))
     
     # Rate Limiting
-    RATELIMIT_STORAGE_URL = os.getenv('RATELIMIT_STORAGE_URL', 'memory://')  # Use in-memory for development
+    RATELIMIT_STORAGE_URL = os.getenv('RATELIMIT_STORAGE_URL', 'local:///tmp/arrears_manager_ratelimit.sqlite')  # Shared by all workers on this host; redis:// for several hosts
     RATELIMIT_DEFAULT = os.getenv('RATELIMIT_DEFAULT', '100/hour')
     RATELIMIT_HEADERS_ENABLED = True
     RATELIMIT_SWALLOW_ERRORS = False
@@ -58,6 +62,8 @@ class Config:
     MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 52428800))  # 50MB
     UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', '/tmp/uploads')
     ALLOWED_EXTENSIONS = set(os.getenv('ALLOWED_EXTENSIONS', 'csv,xlsx,xls').split(','))
+    UPLOAD_SPOOL_MAX_MEMORY = int(os.getenv('UPLOAD_SPOOL_MAX_MEMORY', 8388608))  # 8MB per file part, larger parts spill to UPLOAD_FOLDER
+    UPLOAD_MAX_PARALLEL_STREAMS = int(os.getenv('UPLOAD_MAX_PARALLEL_STREAMS', 4))  # Concurrent chunk uploads advertised per session
     CHUNK_SIZE = int(os.getenv('CHUNK_SIZE', 1048576))  # 1MB
     
     # Compression
@@ -65,12 +71,17 @@ class Config:
         'text/html', 'text/css', 'text/xml', 'application/json',
         'application/javascript', 'text/plain'
     ]
-    COMPRESS_LEVEL = int(os.getenv('COMPRESSION_LEVEL', 6))
+    COMPRESS_LEVEL = int(os.getenv('COMPRESSION_LEVEL', 6))  # Streamed exports; responses pick levels by size
     COMPRESS_MIN_SIZE = int(os.getenv('MIN_COMPRESSION_SIZE', 500))
     COMPRESS_ALGORITHM = ['gzip', 'br'] if os.getenv('ENABLE_BROTLI', 'True') == 'True' else ['gzip']
+    COMPRESS_HIGH_LOAD = float(os.getenv('COMPRESS_HIGH_LOAD', 1.0))  # Load average per CPU above which the fastest levels are used
+    
+    # Streaming exports (?output=stream)
+    STREAM_BLOCK_ROWS = int(os.getenv('STREAM_BLOCK_ROWS', 5000))
     
     # Timeouts (mobile-optimized)
-    REQUEST_TIMEOUT = int(os.getenv('REQUEST_TIMEOUT', 15))
+    REQUEST_TIMEOUT = int(os.getenv('REQUEST_TIMEOUT', 15))  # Deadline of a request; X-Request-Timeout can shorten it
+    REQUEST_DEADLINE_RESERVE = float(os.getenv('REQUEST_DEADLINE_RESERVE', 1.0))  # Seconds of it kept for building the response
     CONNECTION_TIMEOUT = int(os.getenv('CONNECTION_TIMEOUT', 30))
     KEEPALIVE_TIMEOUT = int(os.getenv('KEEPALIVE_TIMEOUT', 60))
     
@@ -82,11 +93,37 @@ class Config:
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
     LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
     LOG_FILE = os.getenv('LOG_FILE', 'logs/app.log')
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))  # Records buffered for the log writer; more are dropped
+    LOG_SUCCESS_SAMPLE_RATE = float(os.getenv('LOG_SUCCESS_SAMPLE_RATE', 1.0))  # Share of successful requests logged
+    LOG_SLOW_REQUEST_MS = int(os.getenv('LOG_SLOW_REQUEST_MS', 1000))  # Requests at least this slow are always logged
+    
+    # Metrics
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'  # Serve Prometheus metrics at /metrics
+    METRICS_STORE_PATH = os.getenv('METRICS_STORE_PATH', '/tmp/arrears_manager_metrics.sqlite')  # Shared by the workers of a host
+    METRICS_PUBLISH_INTERVAL = float(os.getenv('METRICS_PUBLISH_INTERVAL', 5.0))  # Seconds between publications per worker
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')  # Scrapers send Authorization: Bearer <token>
+    METRICS_ALLOWED_IPS = [ip.strip() for ip in os.getenv('METRICS_ALLOWED_IPS', '').split(',') if ip.strip()]  # Loopback only if neither is set
+    
+    # Profiling (admins can always request a profile with X-Profile: 1)
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0.0))  # Share of requests profiled, e.g. 0.001
+    PROFILE_DIR = os.getenv('PROFILE_DIR', '/tmp/arrears_manager_profiles')
+    PROFILE_MAX_ENTRIES = int(os.getenv('PROFILE_MAX_ENTRIES', 50))  # Older profiles are deleted
+    
+    # Progress of long-running operations (shared by the workers of a host)
+    PROGRESS_STORE_PATH = os.getenv('PROGRESS_STORE_PATH', '/tmp/arrears_manager_progress.sqlite')
+    PROGRESS_TTL = int(os.getenv('PROGRESS_TTL', 3600))  # Seconds progress is kept after its last update
+    PROGRESS_FLUSH_INTERVAL = float(os.getenv('PROGRESS_FLUSH_INTERVAL', 0.25))  # Seconds between batched progress writes
+    PROGRESS_LONG_POLL_MAX = int(os.getenv('PROGRESS_LONG_POLL_MAX', 30))  # Longest ?wait= on the progress endpoint
+    PROGRESS_STREAM_HEARTBEAT = int(os.getenv('PROGRESS_STREAM_HEARTBEAT', 15))  # Seconds between keep-alive comments
+    PROGRESS_STREAM_MAX_SECONDS = int(os.getenv('PROGRESS_STREAM_MAX_SECONDS', 300))  # Streams close after this; clients reconnect
+    PROGRESS_MAX_WAITERS = int(os.getenv('PROGRESS_MAX_WAITERS', 4))  # Long polls/streams per worker; keep below gunicorn --threads
     
     # API Configuration
     API_VERSION = os.getenv('API_VERSION', 'v1')
     API_TITLE = os.getenv('API_TITLE', 'Arrears Manager API')
     API_DESCRIPTION = os.getenv('API_DESCRIPTION', 'Mobile-optimized API for loan analysis')
+    # Part of every input-fingerprint ETag; empty = digest of the source tree
+    CODE_VERSION = os.getenv('CODE_VERSION', os.getenv('RENDER_GIT_COMMIT', ''))
     
     # Security Headers
     ENABLE_HSTS = os.getenv('ENABLE_HSTS', 'True') == 'True'
@@ -94,12 +131,29 @@ class Config:
     ENABLE_CSP = os.getenv('ENABLE_CSP', 'True') == 'True'
     ENABLE_XSS_PROTECTION = os.getenv('ENABLE_XSS_PROTECTION', 'True') == 'True'
     
+    # Request screening (SQL injection / XSS patterns)
+    SECURITY_SCREEN_MAX_LENGTH = int(os.getenv('SECURITY_SCREEN_MAX_LENGTH', 4096))  # Characters checked per value
+    SECURITY_SCREEN_MAX_VALUES = int(os.getenv('SECURITY_SCREEN_MAX_VALUES', 1000))  # JSON body strings checked per request
+    
     # Pagination
     DEFAULT_PAGE_SIZE = 20
     MAX_PAGE_SIZE = 100
     
     # Response Size Limits
     MAX_RESPONSE_SIZE = 10485760  # 10MB
+    
+    # Stored analysis results (paginated via result handles)
+    RESULT_STORE_TTL = int(os.getenv('RESULT_STORE_TTL', 900))  # 15 minutes
+    RESULT_STORE_MAX_ENTRIES = int(os.getenv('RESULT_STORE_MAX_ENTRIES', 64))  # Kept in memory per worker
+    RESULT_STORE_DIR = os.getenv('RESULT_STORE_DIR', '/tmp/arrears_manager_results')  # Shared by the workers of a host; empty keeps results per worker
+    
+    # Stored results can also be written (in the background) to the analysis_results tables, where they outlive the worker's store
+    PERSIST_RESULTS = os.getenv('PERSIST_RESULTS', 'False') == 'True'
+    RESULT_PERSIST_TTL = int(os.getenv('RESULT_PERSIST_TTL', 604800))  # 7 days
+    RESULT_INSERT_BATCH_ROWS = int(os.getenv('RESULT_INSERT_BATCH_ROWS', 200))  # Rows per multi-row INSERT
+    
+    # Analyses run concurrently per worker process (the single endpoints and /loans/batch)
+    JOB_MAX_WORKERS = int(os.getenv('JOB_MAX_WORKERS', os.getenv('BATCH_MAX_WORKERS', 4)))
 
 
 class DevelopmentConfig(Config):
@@ -148,12 +202,14 @@ class TestingConfig(Config):
     """Testing configuration"""
     DEBUG = True
     TESTING = True
+    LOG_FILE = ''  # Console only
     
     # Use in-memory database for tests
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     
     # Disable rate limiting in tests
     RATELIMIT_ENABLED = False
+    RATELIMIT_STORAGE_URL = 'memory://'
     
     # Simple cache for tests
     CACHE_TYPE = 'simple'
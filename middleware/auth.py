@@ -2,17 +2,114 @@
 JWT-based authentication middleware for mobile API
 Supports token generation, validation, refresh, and device binding
 """
-from flask import request, g
+from flask import request, g, current_app
 from functools import wraps
+from collections import OrderedDict
+from utils.local_store import LocalStore
 import jwt
 from datetime import datetime, timedelta
+import hashlib
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
 
+DEFAULT_REVOCATION_STORE_PATH = '/tmp/arrears_manager_revocations.sqlite'
+
+# Counter bumped by every revocation on the host
+REVOCATION_GENERATION_KEY = 'revocation-generation'
+
+
+class VerifiedTokenCache:
+    """
+    Bounded cache of verified token claims
+    
+    Keyed by the SHA-256 digest of the token (tokens themselves are not
+    kept). Entries expire with the token's exp claim; the least recently
+    used entries are evicted beyond max_entries. Each entry also records the
+    revocation generation it was last found not revoked in.
+    """
+    
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def digest(token):
+        """Get cache key of a token"""
+        return hashlib.sha256(token.encode()).hexdigest()
+    
+    def get(self, key):
+        """Get cached claims (None if not cached or expired)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            
+            payload, expires_at, _ = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                return None
+            
+            self._entries.move_to_end(key)
+            return payload
+    
+    def put(self, key, payload):
+        """Cache claims of a verified token until its exp claim"""
+        expires_at = payload.get('exp')
+        if not expires_at:
+            return  # Tokens without expiry are always verified in full
+        
+        with self._lock:
+            self._entries[key] = [payload, expires_at, None]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def revocation_generation(self, key):
+        """Get the revocation generation a token was last found not revoked in (None if never)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[2] if entry is not None else None
+    
+    def mark_not_revoked(self, key, generation):
+        """Record that a cached token was not revoked in a revocation generation"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[2] = generation
+    
+    def discard(self, key):
+        """Remove a token from the cache"""
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def discard_user(self, user_id):
+        """Remove all cached tokens of a user"""
+        with self._lock:
+            for key in [key for key, (payload, _, _) in self._entries.items() if payload.get('user_id') == user_id]:
+                del self._entries[key]
+    
+    def __len__(self):
+        return len(self._entries)
+
+
 class AuthMiddleware:
-    """JWT authentication middleware"""
+    """
+    JWT authentication middleware
+    
+    One instance per app (see get_auth). Verified token claims are cached,
+    so repeat requests with the same token skip the signature check; token
+    type and device binding are still checked on every request.
+    Revocations are kept in a LocalStore file shared by the workers of the
+    host, so a logout through one worker holds in all of them. Each worker
+    reads the host's revocation generation at most every
+    AUTH_REVOCATION_CHECK_INTERVAL seconds and only looks a cached token up
+    again once the generation changed.
+    """
     
     def __init__(self, app=None):
         self.app = app
@@ -24,9 +121,95 @@ class AuthMiddleware:
         self.app = app
         self.secret_key = app.config['JWT_SECRET_KEY']
         self.algorithm = 'HS256'
+        self.token_cache = VerifiedTokenCache(app.config.get('AUTH_TOKEN_CACHE_SIZE', 10000))
+        
+        # Revocation hooks: callables taking (payload, token digest), True if revoked
+        self.revocation_checks = []
+        self.revocations = LocalStore(app.config.get('AUTH_REVOCATION_STORE_PATH', DEFAULT_REVOCATION_STORE_PATH))
+        self.revocation_check_interval = app.config.get('AUTH_REVOCATION_CHECK_INTERVAL', 1.0)
+        self._generation = None
+        self._generation_read_at = None
+        # User revocations outlive every token issued before them
+        self.user_revocation_ttl = max(
+            app.config['JWT_ACCESS_TOKEN_EXPIRES'], app.config['JWT_REFRESH_TOKEN_EXPIRES']
+        ).total_seconds()
+        
+        app.extensions['auth'] = self
         
         logger.info("Authentication middleware initialized")
     
+    def add_revocation_check(self, check):
+        """
+        Register a revocation hook (e.g. a shared denylist lookup)
+        
+        Hooks run on every request, after the host's revocations.
+        
+        Args:
+            check: Callable taking the token payload and the token's SHA-256
+                digest, returning True if the token must be rejected
+        """
+        self.revocation_checks.append(check)
+    
+    def revoke_token(self, token):
+        """Revoke a single token until it expires (e.g. on logout)"""
+        key = self.token_cache.digest(token)
+        
+        try:
+            payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+        except jwt.InvalidTokenError:
+            return  # Expired or invalid tokens are rejected anyway
+        
+        # Kept until the token expires (a day for tokens without exp)
+        ttl = payload['exp'] - time.time() if 'exp' in payload else 86400
+        self.revocations.set_values({f'revoked-token:{key}': True}, max(ttl, 1))
+        self._bump_revocation_generation()
+        
+        self.token_cache.discard(key)
+    
+    def revoke_user_tokens(self, user_id):
+        """
+        Revoke all tokens issued to a user so far (e.g. on password change)
+        
+        iat claims are whole seconds, so tokens issued earlier in the same
+        second stay valid; tokens issued right after (a new login) do too.
+        """
+        self.revocations.set_values({f'revoked-user:{user_id}': int(time.time())}, self.user_revocation_ttl)
+        self._bump_revocation_generation()
+        
+        self.token_cache.discard_user(user_id)
+    
+    def _bump_revocation_generation(self):
+        """Tell every worker of the host to look cached tokens up again"""
+        self.revocations.incr(REVOCATION_GENERATION_KEY, self.user_revocation_ttl)
+        self._generation_read_at = None
+    
+    def _revocation_generation(self):
+        """
+        Get the host's revocation generation, read at most every AUTH_REVOCATION_CHECK_INTERVAL
+        
+        The counter's expiry is part of the generation, so a counter that
+        expired and counted up again never repeats an earlier generation.
+        """
+        now = time.monotonic()
+        read_at = self._generation_read_at
+        if read_at is None or now - read_at >= self.revocation_check_interval:
+            self._generation = self.revocations.get_counter(REVOCATION_GENERATION_KEY)
+            self._generation_read_at = now
+        
+        return self._generation
+    
+    def _is_revoked_on_host(self, payload, token_digest):
+        """Check tokens revoked through any worker of this host"""
+        user_key = f"revoked-user:{payload.get('user_id')}"
+        token_key = f'revoked-token:{token_digest}'
+        revoked = self.revocations.get_values([user_key, token_key])
+        
+        revoked_before = revoked.get(user_key)
+        if revoked_before is not None and payload.get('iat', 0) < revoked_before:
+            return True
+        
+        return token_key in revoked
+    
     def generate_access_token(self, user_id, device_id=None, roles=None):
         """
         Generate JWT access token
@@ -115,29 +298,45 @@ class AuthMiddleware:
         """
         from middleware.error_handler import AuthenticationError
         
-        try:
-            payload = jwt.decode(
-                token,
-                self.secret_key,
-                algorithms=[self.algorithm]
-            )
-            
-            # Verify token type
-            if payload.get('type') != token_type:
-                raise AuthenticationError('Invalid token type')
-            
-            # Verify device binding if present
-            device_id = request.headers.get('X-Device-Id')
-            if payload.get('device_id') and device_id:
-                if payload['device_id'] != device_id:
-                    raise AuthenticationError('Token device mismatch')
-            
-            return payload
+        key = self.token_cache.digest(token)
+        payload = self.token_cache.get(key)
+        
+        if payload is None:
+            try:
+                payload = jwt.decode(
+                    token,
+                    self.secret_key,
+                    algorithms=[self.algorithm]
+                )
+            except jwt.ExpiredSignatureError:
+                raise AuthenticationError('Token has expired')
+            except jwt.InvalidTokenError as e:
+                raise AuthenticationError(f'Invalid token: {str(e)}')
             
-        except jwt.ExpiredSignatureError:
-            raise AuthenticationError('Token has expired')
-        except jwt.InvalidTokenError as e:
-            raise AuthenticationError(f'Invalid token: {str(e)}')
+            self.token_cache.put(key, payload)
+        
+        # Verify token type
+        if payload.get('type') != token_type:
+            raise AuthenticationError('Invalid token type')
+        
+        # Verify device binding if present
+        device_id = request.headers.get('X-Device-Id')
+        if payload.get('device_id') and device_id:
+            if payload['device_id'] != device_id:
+                raise AuthenticationError('Token device mismatch')
+        
+        # Tokens revoked on this host (looked up again only once revocations changed)
+        generation = self._revocation_generation()
+        if self.token_cache.revocation_generation(key) != generation:
+            if self._is_revoked_on_host(payload, key):
+                raise AuthenticationError('Token has been revoked')
+            self.token_cache.mark_not_revoked(key, generation)
+        
+        # Check revocation hooks
+        if any(check(payload, key) for check in self.revocation_checks):
+            raise AuthenticationError('Token has been revoked')
+        
+        return payload
     
     def get_token_from_request(self):
         """
@@ -162,6 +361,19 @@ class AuthMiddleware:
         return None
 
 
+def get_auth():
+    """
+    Get the app's AuthMiddleware (created on first use if not initialized)
+    
+    Returns:
+        AuthMiddleware instance shared by all requests of the app
+    """
+    auth = current_app.extensions.get('auth')
+    if auth is None:
+        auth = AuthMiddleware(current_app._get_current_object())
+    return auth
+
+
 def require_auth(f):
     """
     Decorator to require authentication for endpoint
@@ -176,37 +388,29 @@ def require_auth(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         from middleware.error_handler import AuthenticationError
-        from flask import current_app
         
-        # BYPASS AUTHENTICATION FOR TESTING
+        # BYPASS AUTHENTICATION FOR TESTING (AUTH_BYPASS)
         # Always inject dummy user
-        g.user_id = 1
-        g.device_id = 'bypass_device'
-        g.roles = ['admin', 'user']
+        if current_app.config.get('AUTH_BYPASS', True):
+            g.user_id = 1
+            g.device_id = 'bypass_device'
+            g.roles = ['admin', 'user']
+            return f(*args, **kwargs)
         
-        # Original logic commented out below:
-        """
-        # Get auth middleware instance
-        auth = AuthMiddleware(current_app)
+        auth = get_auth()
         
-        try:
-            # Extract token
-            token = auth.get_token_from_request()
-            if not token:
-                raise AuthenticationError('No authentication token provided')
-            
-            # Verify token
-            payload = auth.verify_token(token, 'access')
-            
-            # Store user info in request context
-            g.user_id = payload['user_id']
-            g.device_id = payload.get('device_id')
-            g.roles = payload.get('roles', [])
-        except Exception as e:
-             # Just warn but allow if we want strict bypass, 
-             # but setting g.user_id above handles it.
-             pass
-        """
+        # Extract token
+        token = auth.get_token_from_request()
+        if not token:
+            raise AuthenticationError('No authentication token provided')
+        
+        # Verify token
+        payload = auth.verify_token(token, 'access')
+        
+        # Store user info in request context
+        g.user_id = payload['user_id']
+        g.device_id = payload.get('device_id')
+        g.roles = payload.get('roles', [])
         
         return f(*args, **kwargs)
     
@@ -259,11 +463,9 @@ def optional_auth(f):
     """
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        from flask import current_app
-        
         try:
             # Get auth middleware instance
-            auth = AuthMiddleware(current_app)
+            auth = get_auth()
             
             # Extract token
             token = auth.get_token_from_request()
@@ -0,0 +1,294 @@
+"""
+Adaptive response compression middleware
+Picks the encoding level from the body size and the current CPU load,
+measures time spent compressing and serves precompressed bodies where a
+handler cached them (e.g. pages of stored results)
+"""
+from flask import request, current_app
+from utils.metrics import add_server_timing, record_stage
+from collections import defaultdict
+from typing import Any, Dict, Optional, Tuple
+import gzip
+import logging
+import os
+import threading
+import time
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+
+# (max body bytes, brotli quality, gzip level) - larger bodies get cheaper levels.
+# Brotli's default quality 11 takes seconds on multi-MB JSON bodies.
+COMPRESSION_TIERS = (
+    (64 * 1024, 6, 6),
+    (1024 * 1024, 5, 5),
+    (None, 4, 3)
+)
+
+# Levels used for every size while the host is under high load
+HIGH_LOAD_LEVELS = {'br': 1, 'gzip': 1}
+
+# Seconds between load average samples
+LOAD_SAMPLE_INTERVAL = 1.0
+
+
+class CompressionStats:
+    """Process-wide counters of compression work"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = defaultdict(lambda: {'responses': 0, 'bytes_in': 0, 'bytes_out': 0, 'seconds': 0.0})
+        self._cache_hits = 0
+
+    def record(self, encoding: str, bytes_in: int, bytes_out: int, seconds: float):
+        """Record one compressed body"""
+        with self._lock:
+            totals = self._totals[encoding]
+            totals['responses'] += 1
+            totals['bytes_in'] += bytes_in
+            totals['bytes_out'] += bytes_out
+            totals['seconds'] += seconds
+
+    def record_cache_hit(self):
+        """Record a response served from a precompressed body"""
+        with self._lock:
+            self._cache_hits += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get copy of the counters"""
+        with self._lock:
+            return {
+                'encodings': {
+                    encoding: {**totals, 'seconds': round(totals['seconds'], 6)}
+                    for encoding, totals in self._totals.items()
+                },
+                'precompressed_hits': self._cache_hits
+            }
+
+
+compression_stats = CompressionStats()
+
+_load_sample = {'at': 0.0, 'value': 0.0}
+
+
+def cpu_load() -> float:
+    """
+    Get 1-minute load average per CPU (sampled at most once per second)
+
+    Returns:
+        Load per CPU, or 0 where the load average is unavailable
+    """
+    now = time.monotonic()
+    if now - _load_sample['at'] >= LOAD_SAMPLE_INTERVAL:
+        try:
+            _load_sample['value'] = os.getloadavg()[0] / (os.cpu_count() or 1)
+        except (AttributeError, OSError):  # Not available on Windows
+            _load_sample['value'] = 0.0
+        _load_sample['at'] = now
+
+    return _load_sample['value']
+
+
+def choose_encoding(accept_encoding: str, enabled: Tuple[str, ...]) -> Optional[str]:
+    """
+    Pick encoding from the Accept-Encoding header
+
+    Args:
+        accept_encoding: Accept-Encoding header value
+        enabled: Server encodings in order of preference
+
+    Returns:
+        'br', 'gzip' or None
+    """
+    qualities = {}
+    wildcard = False
+
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                pass
+        name = name.strip()
+        if name == '*':
+            wildcard = quality > 0
+        elif name:
+            qualities[name] = quality
+
+    candidates = [
+        encoding for encoding in enabled
+        if qualities.get(encoding, 1.0 if wildcard else 0) > 0
+    ]
+    if not candidates:
+        return None
+
+    # Highest client preference wins, ties go to server order
+    return max(candidates, key=lambda encoding: qualities.get(encoding, 0))
+
+
+def enabled_encodings() -> Tuple[str, ...]:
+    """Get encodings the server may use, in order of preference"""
+    configured = current_app.config.get('COMPRESS_ALGORITHM', ['gzip'])
+    preferred = [encoding for encoding in ('br', 'gzip') if encoding in configured]
+    return tuple(encoding for encoding in preferred if encoding != 'br' or brotli is not None)
+
+
+def negotiated_encoding() -> Optional[str]:
+    """Get encoding for the current request's response"""
+    return choose_encoding(request.headers.get('Accept-Encoding', ''), enabled_encodings())
+
+
+def compression_level(encoding: str, size: int, load: Optional[float] = None) -> int:
+    """
+    Pick compression level for a body
+
+    Args:
+        encoding: 'br' or 'gzip'
+        size: Uncompressed size in bytes
+        load: Load per CPU (sampled if not given)
+
+    Returns:
+        Brotli quality or gzip level
+    """
+    if load is None:
+        load = cpu_load()
+
+    if load >= current_app.config.get('COMPRESS_HIGH_LOAD', 1.0):
+        return HIGH_LOAD_LEVELS[encoding]
+
+    for max_size, brotli_quality, gzip_level in COMPRESSION_TIERS:
+        if max_size is None or size <= max_size:
+            return brotli_quality if encoding == 'br' else gzip_level
+
+
+def compress_body(data: bytes, encoding: str, level: int) -> Tuple[bytes, float]:
+    """
+    Compress a body and record the work
+
+    Args:
+        data: Uncompressed body
+        encoding: 'br' or 'gzip'
+        level: Brotli quality or gzip level
+
+    Returns:
+        Tuple of (compressed body, seconds spent)
+    """
+    started = time.perf_counter()
+
+    if encoding == 'br':
+        compressed = brotli.compress(data, mode=brotli.MODE_TEXT, quality=level)
+    else:
+        compressed = gzip.compress(data, compresslevel=level, mtime=0)
+
+    elapsed = time.perf_counter() - started
+    compression_stats.record(encoding, len(data), len(compressed), elapsed)
+    record_stage('compress', elapsed)
+
+    return compressed, elapsed
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """Get ETag of the encoded representation ("<etag>:<encoding>")"""
+    return f'{etag[:-1]}:{encoding}"' if etag.endswith('"') else etag
+
+
+def cache_compressed_body(response, store, key: str):
+    """
+    Have the compressed body of a response kept for later requests
+
+    Args:
+        response: Response about to be returned by a view
+        store: Object with put_encoded(key, body), e.g. a StoredResult
+        key: Key identifying the representation (e.g. its input ETag)
+    """
+    response.compressed_body_store = (store, key)
+
+
+def precompressed_response(body: bytes, encoding: str, etag: str):
+    """
+    Create response from a body compressed for an earlier request
+
+    Args:
+        body: Compressed JSON body
+        encoding: Encoding of the body
+        etag: ETag of the uncompressed representation
+
+    Returns:
+        Response tuple
+    """
+    compression_stats.record_cache_hit()
+
+    response = current_app.response_class(body, mimetype='application/json')
+    response.headers['Content-Encoding'] = encoding
+    response.headers['ETag'] = encoded_etag(etag, encoding)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    add_server_timing(response, 'compress', 0, 'precompressed')
+
+    return response, 200
+
+
+class CompressionMiddleware:
+    """Adaptive gzip/brotli compression of API responses"""
+
+    def __init__(self, app=None):
+        self.app = app
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize compression middleware"""
+        self.app = app
+
+        app.after_request(self.after_request)
+
+        logger.info("Compression middleware initialized")
+
+    def after_request(self, response):
+        """Compress eligible responses"""
+        vary = response.headers.get('Vary')
+        if not vary:
+            response.headers['Vary'] = 'Accept-Encoding'
+        elif 'accept-encoding' not in vary.lower():
+            response.headers['Vary'] = f'{vary}, Accept-Encoding'
+
+        # Streamed exports compress themselves block by block
+        if (response.is_streamed or
+                response.direct_passthrough or
+                'Content-Encoding' in response.headers or
+                not 200 <= response.status_code < 300 or
+                response.mimetype not in self.app.config['COMPRESS_MIMETYPES']):
+            return response
+
+        encoding = negotiated_encoding()
+        if encoding is None:
+            return response
+
+        data = response.get_data()
+        if len(data) < self.app.config['COMPRESS_MIN_SIZE']:
+            return response
+
+        level = compression_level(encoding, len(data))
+        compressed, elapsed = compress_body(data, encoding, level)
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+
+        etag = response.headers.get('ETag')
+        if etag:
+            response.headers['ETag'] = encoded_etag(etag, encoding)
+
+        add_server_timing(response, 'compress', elapsed, f'{encoding} {level}')
+
+        cached = getattr(response, 'compressed_body_store', None)
+        if cached is not None:
+            store, key = cached
+            store.put_encoded(f'{key}:{encoding}', compressed)
+
+        return response
@@ -1,48 +1,26 @@
 """
 Structured logging middleware with correlation IDs and request tracing
-Provides JSON-formatted logs with device information and sensitive data redaction
+Provides JSON-formatted logs (see utils.logging_pipeline) with device
+information and sensitive data redaction
 """
 from flask import request, g
+from utils.metrics import get_stage_timings
 import logging
-import json
+import random
 import uuid
-from datetime import datetime
 import time
 
-# Configure structured logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(message)s'
-)
-
-
-class StructuredLogger(logging.Logger):
-    """Custom logger that outputs JSON-formatted logs"""
-    
-    def _log(self, level, msg, args, exc_info=None, extra=None, stack_info=False):
-        """Override _log to format as JSON"""
-        if extra is None:
-            extra = {}
-        
-        # Build log record
-        record = {
-            'timestamp': datetime.utcnow().isoformat() + 'Z',
-            'level': logging.getLevelName(level),
-            'message': msg,
-            **extra
-        }
-        
-        # Add exception info if present
-        if exc_info:
-            import traceback
-            record['exception'] = ''.join(traceback.format_exception(*exc_info))
-        
-        # Output as JSON
-        super()._log(level, json.dumps(record), args, exc_info, extra, stack_info)
-
 
 class LoggingMiddleware:
-    """Logging middleware for request/response tracking"""
+    """
+    Logging middleware for request/response tracking
+    
+    Each request produces one "Request completed" record. Successful, fast
+    requests are sampled at LOG_SUCCESS_SAMPLE_RATE; errors and requests
+    slower than LOG_SLOW_REQUEST_MS are always logged. Records go through the
+    queued pipeline (utils.logging_pipeline), so nothing is written on the
+    request thread.
+    """
     
     def __init__(self, app=None):
         self.app = app
@@ -63,7 +41,7 @@ class LoggingMiddleware:
         self.logger.info("Logging middleware initialized")
     
     def before_request(self):
-        """Log request start and generate correlation ID"""
+        """Generate correlation ID and start the request timer"""
         # Generate or extract correlation ID
         correlation_id = request.headers.get('X-Correlation-Id') or str(uuid.uuid4())
         request.correlation_id = correlation_id
@@ -71,27 +49,6 @@ class LoggingMiddleware:
         
         # Store request start time
         g.request_start_time = time.time()
-        
-        # Extract device information
-        device_id = request.headers.get('X-Device-Id')
-        device_platform = request.headers.get('X-Device-Platform', 'unknown')
-        app_version = request.headers.get('X-App-Version', 'unknown')
-        
-        # Log request
-        self.logger.info(
-            "Request started",
-            extra={
-                'correlation_id': correlation_id,
-                'method': request.method,
-                'path': request.path,
-                'remote_addr': self._get_client_ip(),
-                'user_agent': request.headers.get('User-Agent', 'unknown'),
-                'device_id': device_id,
-                'device_platform': device_platform,
-                'app_version': app_version,
-                'content_length': request.content_length
-            }
-        )
     
     def after_request(self, response):
         """Log request completion"""
@@ -99,12 +56,12 @@ class LoggingMiddleware:
             return response
         
         # Calculate request duration
-        duration = time.time() - g.request_start_time
+        duration_ms = round((time.time() - g.request_start_time) * 1000, 2)
         
-        # Get user ID if authenticated
-        user_id = getattr(g, 'user_id', None)
+        if not self._should_log(response.status_code, duration_ms):
+            return response
         
-        # Log response
+        # Log request and response in one record
         self.logger.info(
             "Request completed",
             extra={
@@ -112,14 +69,34 @@ class LoggingMiddleware:
                 'method': request.method,
                 'path': request.path,
                 'status_code': response.status_code,
-                'duration_ms': round(duration * 1000, 2),
+                'duration_ms': duration_ms,
                 'response_size': response.content_length,
-                'user_id': user_id
+                'user_id': getattr(g, 'user_id', None),
+                'remote_addr': self._get_client_ip(),
+                'user_agent': request.headers.get('User-Agent', 'unknown'),
+                'device_id': request.headers.get('X-Device-Id'),
+                'device_platform': request.headers.get('X-Device-Platform', 'unknown'),
+                'app_version': request.headers.get('X-App-Version', 'unknown'),
+                'content_length': request.content_length,
+                'stages_ms': {
+                    stage: round(seconds * 1000, 2) for stage, seconds in get_stage_timings().items()
+                }
             }
         )
         
         return response
     
+    def _should_log(self, status_code, duration_ms):
+        """Check if a completed request is logged (success-path sampling)"""
+        if status_code >= 400:
+            return True
+        
+        if duration_ms >= self.app.config.get('LOG_SLOW_REQUEST_MS', 1000):
+            return True
+        
+        sample_rate = self.app.config.get('LOG_SUCCESS_SAMPLE_RATE', 1.0)
+        return sample_rate >= 1.0 or random.random() < sample_rate
+    
     def teardown_request(self, exception=None):
         """Log request errors"""
         if exception:
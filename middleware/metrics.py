@@ -0,0 +1,75 @@
+"""
+Request metrics middleware
+Reports the stage timings of each request in its Server-Timing header and
+records latency, stage, row and byte metrics for /metrics
+"""
+from flask import request, g
+from utils.metrics import metrics, add_server_timing, get_stage_timings, get_metrics_publisher
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsMiddleware:
+    """
+    Stage timing and request metrics
+
+    Register before CompressionMiddleware: after_request handlers run in
+    reverse order, so this one sees the compressed body and compress time.
+    """
+
+    def __init__(self, app=None):
+        self.app = app
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize metrics middleware"""
+        self.app = app
+
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+
+        logger.info("Metrics middleware initialized")
+
+    def before_request(self):
+        """Start the request timer"""
+        g.metrics_start_time = time.perf_counter()
+
+    def after_request(self, response):
+        """Add Server-Timing entries and record the request"""
+        started = g.get('metrics_start_time')
+        if started is None:
+            return response
+
+        elapsed = time.perf_counter() - started
+        stages = get_stage_timings()
+
+        # Stages reported by other middleware (compress) are not repeated
+        reported = {
+            entry.split(';', 1)[0].strip()
+            for entry in response.headers.get('Server-Timing', '').split(',') if entry
+        }
+        for stage, seconds in stages.items():
+            if stage not in reported:
+                add_server_timing(response, stage, seconds)
+        add_server_timing(response, 'total', elapsed)
+
+        metrics.observe_request(
+            endpoint=request.endpoint or 'unmatched',
+            method=request.method,
+            status=response.status_code,
+            seconds=elapsed,
+            stages=stages,
+            rows=g.get('rows_processed', 0),
+            bytes_in=request.content_length or 0,
+            bytes_out=0 if response.is_streamed else (response.content_length or 0)
+        )
+
+        # Publish this worker's metrics to the other workers (thread started once per process)
+        publisher = get_metrics_publisher()
+        if publisher is not None:
+            publisher.start()
+
+        return response
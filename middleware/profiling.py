@@ -0,0 +1,171 @@
+"""
+On-demand request profiling
+Requests are run under cProfile when an admin sends X-Profile: 1, or when
+sampled at PROFILE_SAMPLE_RATE. Profiles are kept with the request's input
+shape in a bounded ProfileStore (see /api/v1/profiles)
+"""
+from flask import request, g, current_app
+from middleware.auth import get_auth
+from middleware.error_handler import AuthenticationError
+from utils.profiling import ProfileStore
+import cProfile
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# Endpoints (by blueprint prefix) never sampled
+UNSAMPLED_ENDPOINTS = ('health.', 'profiles.')
+
+
+class ProfilingMiddleware:
+    """
+    Opt-in cProfile profiling of single requests
+
+    At most one request per process is profiled at a time; a request
+    picked while another one is being profiled runs unprofiled. Requests
+    that are not profiled only pay for the sampling decision, so a low
+    sample rate is safe to leave on in production.
+    """
+
+    def __init__(self, app=None):
+        self.app = app
+        self.store = None
+        self._busy = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize profiling middleware"""
+        self.app = app
+        self.store = ProfileStore(
+            app.config.get('PROFILE_DIR', '/tmp/arrears_manager_profiles'),
+            max_entries=app.config.get('PROFILE_MAX_ENTRIES', 50)
+        )
+
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        app.teardown_request(self.teardown_request)
+
+        app.extensions['profiling'] = self
+
+        logger.info("Profiling middleware initialized")
+
+    def before_request(self):
+        """Start profiling if requested by an admin or sampled"""
+        trigger = self._trigger()
+        if trigger is None or not self._busy.acquire(blocking=False):
+            return
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # Another profiler is active in this thread
+            self._busy.release()
+            return
+
+        g.profiling = (profiler, trigger, time.perf_counter())
+
+    def _trigger(self):
+        """Get why the current request is profiled (None if it is not)"""
+        if request.headers.get('X-Profile') == '1' and self._is_admin():
+            return 'header'
+
+        sample_rate = self.app.config.get('PROFILE_SAMPLE_RATE', 0.0)
+        if sample_rate > 0 and random.random() < sample_rate:
+            if not (request.endpoint or '').startswith(UNSAMPLED_ENDPOINTS):
+                return 'sample'
+
+        return None
+
+    def _is_admin(self):
+        """Check the request carries a valid access token with the admin role"""
+        auth = get_auth()
+        token = auth.get_token_from_request()
+        if not token:
+            return False
+
+        try:
+            payload = auth.verify_token(token, 'access')
+        except AuthenticationError:
+            return False
+
+        return 'admin' in payload.get('roles', [])
+
+    def _stop(self):
+        """Stop the current request's profiler and release the slot"""
+        profiling = g.pop('profiling', None)
+        if profiling is None:
+            return None
+
+        profiling[0].disable()
+        self._busy.release()
+        return profiling
+
+    def after_request(self, response):
+        """Store the profile of a profiled request"""
+        profiling = self._stop()
+        if profiling is None:
+            return response
+
+        profiler, trigger, started = profiling
+        metadata = {
+            'trigger': trigger,
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status_code': response.status_code,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 2),
+            'user_id': g.get('user_id'),
+            'input': {
+                'rows': g.get('rows_processed'),
+                'columns': g.get('input_columns'),
+                'request_bytes': request.content_length,
+                'files': {
+                    name: {'filename': file.filename, 'bytes': _file_size(file)}
+                    for name, file in request.files.items()
+                }
+            },
+            'stages_ms': {
+                stage: round(seconds * 1000, 2) for stage, seconds in g.get('stage_timings', {}).items()
+            }
+        }
+
+        try:
+            profile_id = self.store.save(profiler, metadata)
+        except OSError as e:
+            logger.warning(f"Could not store request profile: {str(e)}")
+            return response
+
+        if trigger == 'header':
+            response.headers['X-Profile-Id'] = profile_id
+
+        logger.info(
+            "Request profiled",
+            extra={'profile_id': profile_id, 'trigger': trigger, 'path': request.path}
+        )
+
+        return response
+
+    def teardown_request(self, exception=None):
+        """Stop profiling if the request ended without a response"""
+        self._stop()
+
+
+def _file_size(file):
+    """Get size of an uploaded file part"""
+    stream = file.stream
+    position = stream.tell()
+    stream.seek(0, 2)
+    size = stream.tell()
+    stream.seek(position)
+    return size
+
+
+def get_profile_store():
+    """Get the app's ProfileStore"""
+    return current_app.extensions['profiling'].store
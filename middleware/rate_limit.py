@@ -0,0 +1,55 @@
+"""
+Rate limit storage shared by the worker processes of one host
+Registers the local:// storage scheme for Flask-Limiter, e.g.
+RATELIMIT_STORAGE_URL=local:///tmp/arrears_manager_ratelimit.sqlite
+"""
+from limits.storage import Storage
+from utils.local_store import LocalStore
+import sqlite3
+import time
+
+
+class LocalRateLimitStorage(Storage):
+    """
+    Fixed-window rate limit counters in a LocalStore file
+
+    memory:// counts per process, so with N gunicorn workers each client
+    effectively gets N times its quota. All workers opening the same file
+    share exact counters, without Redis. Only the fixed-window strategy
+    (Flask-Limiter's default) is supported.
+    """
+
+    STORAGE_SCHEME = ['local']
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options):
+        path = uri.split('://', 1)[1]
+        if not path:
+            raise ValueError(f'Missing database path in rate limit storage URI: {uri}')
+
+        self.store = LocalStore(path, timeout=float(options.pop('timeout', 5.0)))
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        value, _ = self.store.incr(key, expiry, amount)
+        return value
+
+    def get(self, key: str) -> int:
+        value, _ = self.store.get_counter(key)
+        return value
+
+    def get_expiry(self, key: str) -> float:
+        _, expires_at = self.store.get_counter(key)
+        return expires_at if expires_at is not None else time.time()
+
+    def check(self) -> bool:
+        return self.store.ping()
+
+    def reset(self) -> int:
+        return self.store.clear_counters()
+
+    def clear(self, key: str) -> None:
+        self.store.delete_counter(key)
@@ -10,6 +10,29 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+# Alternatives sharing a prefix are factored so the regex engine tries
+# fewer branches at each position (same matches as one pattern per rule)
+SQL_INJECTION_PATTERNS = [
+    r"\b(?:union\b.*\bselect|select\b.*\bfrom|insert\b.*\binto|delete\b.*\bfrom|drop\b.*\btable)\b",
+    r"--|\#|/\*",
+    r"\b(?:or|and)\b.*="
+]
+
+XSS_PATTERNS = [
+    r"<script[^>]*>.*?</script>",
+    r"javascript:",
+    r"on(?:error|load|click)\s*="
+]
+
+# Patterns are compiled once into single alternations, so each value is
+# scanned in one pass (case-insensitive instead of lowercasing a copy)
+SQL_INJECTION_SCREEN = re.compile('|'.join(SQL_INJECTION_PATTERNS), re.IGNORECASE)
+QUERY_SCREEN = re.compile(
+    f"(?P<sql>{'|'.join(SQL_INJECTION_PATTERNS)})|(?P<xss>{'|'.join(XSS_PATTERNS)})",
+    re.IGNORECASE
+)
+
+
 class SecurityMiddleware:
     """Security middleware for Flask application"""
     
@@ -36,11 +59,9 @@ class SecurityMiddleware:
                 from middleware.error_handler import ValidationError
                 raise ValidationError('HTTPS required')
         
-        # SQL injection pattern detection (basic)
-        self._check_sql_injection()
-        
-        # XSS pattern detection (basic)
-        self._check_xss()
+        # SQL injection and XSS pattern detection (basic)
+        self._screen_query_params()
+        self._screen_json_body()
     
     def after_request(self, response):
         """Add security headers to response"""
@@ -89,75 +110,55 @@ class SecurityMiddleware:
         
         return response
     
-    def _check_sql_injection(self):
-        """Basic SQL injection pattern detection"""
-        sql_patterns = [
-            r"(\bunion\b.*\bselect\b)",
-            r"(\bselect\b.*\bfrom\b)",
-            r"(\binsert\b.*\binto\b)",
-            r"(\bdelete\b.*\bfrom\b)",
-            r"(\bdrop\b.*\btable\b)",
-            r"(--|\#|\/\*)",
-            r"(\bor\b.*=.*)",
-            r"(\band\b.*=.*)"
-        ]
-        
-        # Check query parameters
+    def _screen_query_params(self):
+        """Check each query value once against the SQL injection and XSS patterns"""
+        max_length = self.app.config.get('SECURITY_SCREEN_MAX_LENGTH', 4096)
+        
         for key, value in request.args.items():
-            if isinstance(value, str):
-                for pattern in sql_patterns:
-                    if re.search(pattern, value.lower()):
-                        logger.warning(
-                            f"Potential SQL injection detected in query param: {key}",
-                            extra={'param': key, 'value': value[:100]}
-                        )
-                        from middleware.error_handler import ValidationError
-                        raise ValidationError('Invalid input detected')
-        
-        # Check JSON body
-        if request.is_json:
-            self._check_dict_for_sql_injection(request.get_json(silent=True) or {}, sql_patterns)
-    
-    def _check_dict_for_sql_injection(self, data, patterns):
-        """Recursively check dictionary for SQL injection patterns"""
-        if isinstance(data, dict):
-            for key, value in data.items():
-                if isinstance(value, str):
-                    for pattern in patterns:
-                        if re.search(pattern, value.lower()):
-                            logger.warning(
-                                f"Potential SQL injection detected in JSON field: {key}",
-                                extra={'field': key, 'value': value[:100]}
-                            )
-                            from middleware.error_handler import ValidationError
-                            raise ValidationError('Invalid input detected')
-                elif isinstance(value, (dict, list)):
-                    self._check_dict_for_sql_injection(value, patterns)
-        elif isinstance(data, list):
-            for item in data:
-                self._check_dict_for_sql_injection(item, patterns)
+            match = QUERY_SCREEN.search(value, 0, max_length)
+            if match:
+                kind = 'SQL injection' if match.lastgroup == 'sql' else 'XSS'
+                logger.warning(
+                    f"Potential {kind} detected in query param: {key}",
+                    extra={'param': key, 'value': value[:100]}
+                )
+                from middleware.error_handler import ValidationError
+                raise ValidationError('Invalid input detected')
     
-    def _check_xss(self):
-        """Basic XSS pattern detection"""
-        xss_patterns = [
-            r"<script[^>]*>.*?</script>",
-            r"javascript:",
-            r"onerror\s*=",
-            r"onload\s*=",
-            r"onclick\s*="
-        ]
-        
-        # Check query parameters
-        for key, value in request.args.items():
+    def _screen_json_body(self):
+        """
+        Check string values of a JSON body for SQL injection patterns
+        
+        Inspection is bounded: at most SECURITY_SCREEN_MAX_VALUES values are
+        visited and strings are checked up to SECURITY_SCREEN_MAX_LENGTH
+        characters, so large or deeply nested bodies cost a fixed amount of
+        work.
+        """
+        # Multipart uploads and raw chunk bodies are skipped without being read
+        if not request.is_json:
+            return
+        
+        max_values = self.app.config.get('SECURITY_SCREEN_MAX_VALUES', 1000)
+        max_length = self.app.config.get('SECURITY_SCREEN_MAX_LENGTH', 4096)
+        
+        # Iterative walk (no recursion limit on deeply nested bodies)
+        pending = [(None, request.get_json(silent=True))]
+        while pending and max_values > 0:
+            key, value = pending.pop()
+            max_values -= 1
+            
             if isinstance(value, str):
-                for pattern in xss_patterns:
-                    if re.search(pattern, value.lower()):
-                        logger.warning(
-                            f"Potential XSS detected in query param: {key}",
-                            extra={'param': key, 'value': value[:100]}
-                        )
-                        from middleware.error_handler import ValidationError
-                        raise ValidationError('Invalid input detected')
+                if SQL_INJECTION_SCREEN.search(value, 0, max_length):
+                    logger.warning(
+                        f"Potential SQL injection detected in JSON field: {key}",
+                        extra={'field': key, 'value': value[:100]}
+                    )
+                    from middleware.error_handler import ValidationError
+                    raise ValidationError('Invalid input detected')
+            elif isinstance(value, dict):
+                pending.extend(value.items())
+            elif isinstance(value, list):
+                pending.extend((key, item) for item in value)
 
 
 def configure_secure_cookies(app):
@@ -2,5 +2,7 @@
 from models.user import User
 from models.device import Device
 from models.upload_session import UploadSession
+from models.upload_chunk import UploadChunk
+from models.analysis_result import AnalysisResultSet, AnalysisResultRow
 
-__all__ = ['User', 'Device', 'UploadSession']
+__all__ = ['User', 'Device', 'UploadSession', 'UploadChunk', 'AnalysisResultSet', 'AnalysisResultRow']
@@ -0,0 +1,192 @@
+"""
+Persisted analysis results
+Result frames are written once to analysis_result_rows with multi-row
+inserts, so their pages can be browsed, filtered by officer and re-read
+with index scans after the in-memory result store has dropped them
+"""
+from database import db
+from datetime import datetime, timedelta
+from typing import Optional
+from utils.json_encoder import encode_frame_rows, dumps
+import json
+import threading
+import time
+
+import pandas as pd
+
+
+# Columns naming the officer of a result row, in order of preference
+OFFICER_COLUMNS = ('FieldOfficer', 'SalesRep', 'Officer')
+
+# Seconds between deletions of expired results
+PURGE_INTERVAL = 300.0
+
+_last_purge = 0.0
+_purge_lock = threading.Lock()
+
+
+class AnalysisResultSet(db.Model):
+    """Persisted analysis result (one per result handle)"""
+
+    __tablename__ = 'analysis_results'
+
+    id = db.Column(db.Integer, primary_key=True)
+    result_id = db.Column(db.String(36), unique=True, nullable=False, index=True)
+    # No foreign key: with AUTH_BYPASS the owner is a placeholder user id
+    user_id = db.Column(db.Integer, index=True)
+
+    analysis = db.Column(db.String(100))
+    summary = db.Column(db.JSON, default=dict)
+    officer_column = db.Column(db.String(255))  # Result column copied to AnalysisResultRow.officer
+    total_count = db.Column(db.Integer, nullable=False, default=0)
+
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def is_expired(self) -> bool:
+        """Check if result has outlived its TTL"""
+        return datetime.utcnow() > self.expires_at
+
+    def rows(self, officer: Optional[str] = None):
+        """
+        Query rows of this result
+
+        Args:
+            officer: Only rows of this officer
+
+        Returns:
+            AnalysisResultRow query, to be ordered by position (the
+            result/officer/position index serves both filters and order)
+        """
+        query = AnalysisResultRow.query.filter_by(result_id=self.result_id)
+        if officer is not None:
+            query = query.filter_by(officer=officer)
+        return query
+
+    def to_dict(self):
+        """Handle information for API responses"""
+        return {
+            'result_id': self.result_id,
+            'total_count': self.total_count,
+            'expires_at': self.expires_at.isoformat() + 'Z'
+        }
+
+    def __repr__(self):
+        return f'<AnalysisResultSet {self.result_id} {self.analysis}>'
+
+
+class AnalysisResultRow(db.Model):
+    """Row of a persisted analysis result"""
+
+    __tablename__ = 'analysis_result_rows'
+    __table_args__ = (
+        db.UniqueConstraint('result_id', 'position', name='uq_analysis_result_rows_result_position'),
+        db.Index('ix_analysis_result_rows_result_officer_position', 'result_id', 'officer', 'position'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    result_id = db.Column(db.String(36), db.ForeignKey('analysis_results.result_id'), nullable=False)
+    position = db.Column(db.Integer, nullable=False)  # Sort key: row position in the result frame
+    officer = db.Column(db.String(255))
+    data = db.Column(db.Text, nullable=False)  # Row as a JSON object
+
+    def to_dict(self):
+        """Convert to dictionary"""
+        return json.loads(self.data)
+
+    def __repr__(self):
+        return f'<AnalysisResultRow {self.result_id}#{self.position}>'
+
+
+def persist_result(stored, ttl_seconds: int = 604800, batch_rows: int = 200) -> AnalysisResultSet:
+    """
+    Write a stored result and its rows in one transaction
+
+    Rows are inserted batch_rows at a time as multi-row INSERT statements.
+    Readers only see the result once all of its rows are written.
+
+    Args:
+        stored: StoredResult from the in-memory result store
+        ttl_seconds: Lifetime of the persisted result in seconds
+        batch_rows: Rows per INSERT statement
+
+    Returns:
+        AnalysisResultSet instance (not attached to a session)
+    """
+    frame = stored.frame
+    officer_column = next((column for column in OFFICER_COLUMNS if column in frame.columns), None)
+
+    if officer_column:
+        officers = [None if pd.isna(value) else str(value) for value in frame[officer_column].tolist()]
+    else:
+        officers = [None] * len(frame)
+
+    now = datetime.utcnow()
+    header = {
+        'result_id': stored.result_id,
+        'user_id': stored.user_id,
+        'analysis': stored.metadata.get('analysis'),
+        'summary': json.loads(dumps(stored.summary)),
+        'officer_column': officer_column,
+        'total_count': len(frame),
+        'created_at': now,
+        'expires_at': now + timedelta(seconds=ttl_seconds)
+    }
+
+    rows = [
+        {'result_id': stored.result_id, 'position': position, 'officer': officer, 'data': data}
+        for position, (officer, data) in enumerate(zip(officers, encode_frame_rows(frame)))
+    ]
+    batch_rows = max(batch_rows, 1)
+
+    with db.engine.begin() as connection:
+        connection.execute(AnalysisResultSet.__table__.insert().values(**header))
+        for start in range(0, len(rows), batch_rows):
+            connection.execute(AnalysisResultRow.__table__.insert().values(rows[start:start + batch_rows]))
+
+    return AnalysisResultSet(**header)
+
+
+def get_persisted_result(result_id: str) -> Optional[AnalysisResultSet]:
+    """
+    Get persisted result by handle
+
+    Returns:
+        AnalysisResultSet or None if unknown or expired
+    """
+    result_set = AnalysisResultSet.query.filter_by(result_id=result_id).first()
+    if result_set is None or result_set.is_expired():
+        return None
+    return result_set
+
+
+def purge_expired_results(force: bool = False) -> bool:
+    """
+    Delete expired results and their rows (at most once per PURGE_INTERVAL)
+
+    Runs in its own transaction, so result writes never wait for it.
+
+    Args:
+        force: Purge even if the last purge was recent
+
+    Returns:
+        True if a purge ran
+    """
+    global _last_purge
+
+    with _purge_lock:
+        if not force and time.time() - _last_purge < PURGE_INTERVAL:
+            return False
+        _last_purge = time.time()
+
+    results = AnalysisResultSet.__table__
+    rows = AnalysisResultRow.__table__
+    now = datetime.utcnow()
+    expired = db.select(results.c.result_id).where(results.c.expires_at <= now)
+
+    with db.engine.begin() as connection:
+        connection.execute(rows.delete().where(rows.c.result_id.in_(expired)))
+        connection.execute(results.delete().where(results.c.expires_at <= now))
+
+    return True
@@ -0,0 +1,96 @@
+"""
+Upload chunk model for chunked file uploads
+One row per received chunk, unique per session and chunk number
+"""
+from database import db
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from typing import Dict, List
+from utils.group_commit import GroupCommitter
+
+
+class UploadChunk(db.Model):
+    """Received chunk of an upload session"""
+
+    __tablename__ = 'upload_chunks'
+    __table_args__ = (
+        db.UniqueConstraint('session_id', 'chunk_number', name='uq_upload_chunks_session_chunk'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.String(255), db.ForeignKey('upload_sessions.session_id'), nullable=False)
+    chunk_number = db.Column(db.Integer, nullable=False)
+    size = db.Column(db.Integer)  # Chunk size in bytes
+    checksum = db.Column(db.String(200))  # "<algorithm>=<hex digest>" verified on upload
+
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'chunk_number': self.chunk_number,
+            'size': self.size,
+            'checksum': self.checksum,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    def __repr__(self):
+        return f'<UploadChunk {self.session_id}#{self.chunk_number}>'
+
+
+def _insert_ignore_statement(dialect_name: str):
+    """Build INSERT that skips rows violating the unique constraint"""
+    table = UploadChunk.__table__
+
+    if dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert(table).on_conflict_do_nothing(index_elements=['session_id', 'chunk_number'])
+
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert(table).on_conflict_do_nothing(index_elements=['session_id', 'chunk_number'])
+
+    if dialect_name in ('mysql', 'mariadb'):
+        return table.insert().prefix_with('IGNORE')
+
+    return None
+
+
+def _write_chunk_batch(rows: List[Dict]):
+    """
+    Insert chunk rows and touch their sessions in one transaction
+
+    Duplicate chunks (retries, racing uploads of the same chunk) are
+    ignored by the unique constraint instead of failing the batch.
+    """
+    from models.upload_session import UploadSession
+
+    sessions = UploadSession.__table__
+    now = datetime.utcnow()
+    for row in rows:
+        row.setdefault('created_at', now)
+
+    with db.engine.begin() as connection:
+        statement = _insert_ignore_statement(connection.dialect.name)
+
+        if statement is not None:
+            connection.execute(statement, rows)
+        else:
+            for row in rows:
+                try:
+                    with connection.begin_nested():
+                        connection.execute(UploadChunk.__table__.insert(), row)
+                except IntegrityError:
+                    pass  # Chunk already recorded
+
+        connection.execute(
+            sessions.update()
+            .where(sessions.c.session_id.in_({row['session_id'] for row in rows}))
+            .where(sessions.c.status.in_(['initiated', 'uploading']))
+            .values(status='uploading', updated_at=now)
+        )
+
+
+# Shared by all request threads of this process
+chunk_committer = GroupCommitter(_write_chunk_batch)
@@ -3,6 +3,7 @@ Upload session model for chunked file uploads
 """
 from database import db
 from datetime import datetime, timedelta
+from models.upload_chunk import UploadChunk, chunk_committer
 import json
 
 
@@ -22,9 +23,8 @@ class UploadSession(db.Model):
     file_size = db.Column(db.BigInteger)  # Total file size in bytes
     content_type = db.Column(db.String(100))
     
-    # Chunk tracking
+    # Chunk tracking (received chunks are rows in upload_chunks)
     total_chunks = db.Column(db.Integer)
-    uploaded_chunks = db.Column(db.JSON, default=list)  # List of uploaded chunk numbers
     chunk_size = db.Column(db.Integer, default=1048576)  # 1MB default
     
     # Storage
@@ -57,23 +57,53 @@ class UploadSession(db.Model):
         self.chunk_size = kwargs.get('chunk_size', 1048576)
         self.upload_metadata = kwargs.get('metadata', {})
     
-    def add_chunk(self, chunk_number):
-        """Mark chunk as uploaded"""
-        if not self.uploaded_chunks:
-            self.uploaded_chunks = []
+    def add_chunk(self, chunk_number, size=None, checksum=None):
+        """
+        Mark chunk as uploaded
         
-        if chunk_number not in self.uploaded_chunks:
-            self.uploaded_chunks.append(chunk_number)
-            self.status = 'uploading'
-            self.updated_at = datetime.utcnow()
-            db.session.commit()
-    
-    def is_complete(self):
+        Safe for concurrent uploads to the same session: the chunk is
+        inserted (or ignored if already present) and committed together
+        with chunks from other requests in progress.
+        """
+        chunk_committer.submit({
+            'session_id': self.session_id,
+            'chunk_number': chunk_number,
+            'size': size,
+            'checksum': checksum
+        })
+        
+        # Status was updated outside this session's transaction
+        db.session.expire(self, ['status', 'updated_at'])
+    
+    def uploaded_chunk_count(self):
+        """Get number of uploaded chunks"""
+        return UploadChunk.query.filter_by(session_id=self.session_id).count()
+    
+    def has_chunk(self, chunk_number):
+        """Check if a chunk was already recorded"""
+        return db.session.query(
+            UploadChunk.query.filter_by(session_id=self.session_id, chunk_number=chunk_number).exists()
+        ).scalar()
+    
+    def uploaded_chunk_numbers(self):
+        """Get sorted list of uploaded chunk numbers"""
+        rows = (
+            db.session.query(UploadChunk.chunk_number)
+            .filter_by(session_id=self.session_id)
+            .order_by(UploadChunk.chunk_number)
+            .all()
+        )
+        return [row.chunk_number for row in rows]
+    
+    def is_complete(self, uploaded_count=None):
         """Check if all chunks are uploaded"""
-        if not self.total_chunks or not self.uploaded_chunks:
+        if not self.total_chunks:
             return False
         
-        return len(self.uploaded_chunks) >= self.total_chunks
+        if uploaded_count is None:
+            uploaded_count = self.uploaded_chunk_count()
+        
+        return uploaded_count >= self.total_chunks
     
     def mark_completed(self, storage_path):
         """Mark upload as completed"""
@@ -91,22 +121,28 @@ class UploadSession(db.Model):
         """Check if session is expired"""
         return datetime.utcnow() > self.expires_at
     
-    def get_progress(self):
+    def get_progress(self, uploaded_count=None):
         """Get upload progress percentage"""
         if not self.total_chunks:
             return 0
         
-        return (len(self.uploaded_chunks or []) / self.total_chunks) * 100
+        if uploaded_count is None:
+            uploaded_count = self.uploaded_chunk_count()
+        
+        return (uploaded_count / self.total_chunks) * 100
     
     def to_dict(self):
         """Convert to dictionary"""
+        uploaded_count = self.uploaded_chunk_count()
+        
         return {
             'session_id': self.session_id,
             'filename': self.filename,
             'file_size': self.file_size,
             'total_chunks': self.total_chunks,
-            'uploaded_chunks': len(self.uploaded_chunks or []),
-            'progress': self.get_progress(),
+            'chunk_size': self.chunk_size,
+            'uploaded_chunks': uploaded_count,
+            'progress': self.get_progress(uploaded_count),
             'status': self.status,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'expires_at': self.expires_at.isoformat() if self.expires_at else None
@@ -1,9 +1,14 @@
 """
 Health check endpoint for monitoring and Android app connectivity
 """
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, current_app, request
 from datetime import datetime
 from database import get_db_health
+from middleware.compression import compression_stats
+from middleware.error_handler import NotFoundError, AuthenticationError, AuthorizationError
+from utils.logging_pipeline import get_logging_pipeline
+from utils.metrics import metrics, get_metrics_publisher
+import hmac
 
 health_bp = Blueprint('health', __name__)
 
@@ -20,6 +25,7 @@ def health_check():
     - Timestamp
     - API version
     - Available endpoints
+    - Response compression counters
     """
     # Check database health
     db_health = get_db_health()
@@ -40,10 +46,94 @@ def health_check():
             'devices': '/api/v1/devices',
             'loans': '/api/v1/loans',
             'uploads': '/api/v1/uploads'
-        }
+        },
+        'compression': compression_stats.snapshot()
     }
     
     # Return 503 if database is down
     status_code = 200 if overall_status == 'healthy' else 503
     
     return jsonify(response), status_code
+
+
+def process_metric_lines():
+    """Prometheus lines for compression and logging pipeline counters"""
+    lines = []
+    compression = compression_stats.snapshot()
+    
+    for name, key, help_text in (
+        ('compression_input_bytes_total', 'bytes_in', 'Bytes before compression'),
+        ('compression_output_bytes_total', 'bytes_out', 'Bytes after compression'),
+        ('compression_seconds_total', 'seconds', 'Time spent compressing responses')
+    ):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for encoding, totals in sorted(compression['encodings'].items()):
+            lines.append(f'{name}{{encoding="{encoding}"}} {totals[key]}')
+    
+    lines += [
+        '# HELP compression_precompressed_hits_total Responses served from a cached compressed body',
+        '# TYPE compression_precompressed_hits_total counter',
+        f'compression_precompressed_hits_total {compression["precompressed_hits"]}'
+    ]
+    
+    pipeline = get_logging_pipeline()
+    if pipeline is not None:
+        stats = pipeline.stats()
+        lines += [
+            '# HELP log_queue_depth Log records waiting for the writer',
+            '# TYPE log_queue_depth gauge',
+            f'log_queue_depth {stats["queued"]}',
+            '# HELP log_records_dropped_total Log records dropped because the queue was full',
+            '# TYPE log_records_dropped_total counter',
+            f'log_records_dropped_total {stats["dropped"]}'
+        ]
+    
+    return lines
+
+
+def check_metrics_access():
+    """
+    Allow scrapers with METRICS_TOKEN or from METRICS_ALLOWED_IPS
+    
+    With neither configured, only loopback addresses may scrape.
+    
+    Raises:
+        AuthenticationError: If the token is missing or wrong
+        AuthorizationError: If the client address is not allowed
+    """
+    token = current_app.config.get('METRICS_TOKEN')
+    allowed_ips = current_app.config.get('METRICS_ALLOWED_IPS') or []
+    
+    if token:
+        scheme, _, sent = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not hmac.compare_digest(sent.encode(), token.encode()):
+            raise AuthenticationError('Metrics token required')
+    elif not allowed_ips:
+        allowed_ips = ['127.0.0.1', '::1']
+    
+    if allowed_ips and request.remote_addr not in allowed_ips:
+        raise AuthorizationError('Metrics are not available from this address')
+
+
+@health_bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """
+    Prometheus metrics of all worker processes on this host
+    
+    Request counts, latency histograms per endpoint and per stage (parse,
+    clean, compute, excel, serialize, compress), rows processed, bytes in
+    and out, compression and log queue counters. Every series carries a
+    worker label.
+    """
+    if not current_app.config.get('METRICS_ENABLED', True):
+        raise NotFoundError('Metrics are disabled')
+    
+    check_metrics_access()
+    
+    publisher = get_metrics_publisher()
+    if publisher is not None:
+        body = publisher.render()
+    else:
+        body = metrics.render(process_metric_lines())
+    
+    return current_app.response_class(body, mimetype='text/plain; version=0.0.4')
@@ -3,7 +3,7 @@ Authentication endpoints for mobile API
 Provides JWT-based authentication with device binding
 """
 from flask import Blueprint, request, jsonify, g
-from middleware.auth import AuthMiddleware, require_auth
+from middleware.auth import get_auth, require_auth
 from middleware.error_handler import ValidationError, AuthenticationError
 from database import db
 from models.user import User
@@ -60,8 +60,7 @@ def register():
     logger.info(f"New user registered: {user.username}")
     
     # Generate tokens
-    from flask import current_app
-    auth = AuthMiddleware(current_app)
+    auth = get_auth()
     device_id = request.headers.get('X-Device-Id')
     
     access_token = auth.generate_access_token(user.id, device_id, user.roles)
@@ -137,8 +136,7 @@ def login():
     user.update_last_login()
     
     # Generate tokens
-    from flask import current_app
-    auth = AuthMiddleware(current_app)
+    auth = get_auth()
     device_id = request.headers.get('X-Device-Id')
     
     access_token = auth.generate_access_token(user.id, device_id, user.roles)
@@ -178,8 +176,7 @@ def refresh():
     if not data.get('refresh_token'):
         raise ValidationError('Refresh token is required')
     
-    from flask import current_app
-    auth = AuthMiddleware(current_app)
+    auth = get_auth()
     
     # Verify refresh token
     payload = auth.verify_token(data['refresh_token'], 'refresh')
@@ -207,9 +204,15 @@ def logout():
     """
     Logout user (client should discard tokens)
     
-    Note: JWT tokens are stateless, so logout is handled client-side.
-    This endpoint is for logging purposes and future token blacklisting.
+    The access token sent with the request is revoked until it expires
+    (in this process; see AuthMiddleware.add_revocation_check for shared
+    denylists).
     """
+    auth = get_auth()
+    token = auth.get_token_from_request()
+    if token:
+        auth.revoke_token(token)
+    
     logger.info(f"User logged out: {g.user_id}")
     
     return jsonify({
@@ -264,6 +267,9 @@ def change_password():
     user.set_password(data['new_password'])
     db.session.commit()
     
+    # Tokens issued with the old password stop working
+    get_auth().revoke_user_tokens(user.id)
+    
     logger.info(f"Password changed for user: {user.username}")
     
     return jsonify({
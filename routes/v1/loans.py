@@ -2,38 +2,657 @@
 Loan processing endpoints with mobile optimizations
 Refactored from original app.py with pagination, caching, and field selection
 """
-from flask import Blueprint, request, current_app, g
+from flask import Blueprint, request, current_app, g, jsonify, url_for
 from middleware.auth import require_auth
-from middleware.error_handler import ValidationError
-from utils.response import mobile_optimized_response, success_response
-from utils.pagination import get_pagination_params, create_pagination_response
-from utils.validators import validate_file, get_file_extension
+from middleware.error_handler import APIError, ValidationError, NotFoundError, AuthorizationError
+from middleware.compression import negotiated_encoding, precompressed_response, cache_compressed_body
+from utils.response import (
+    mobile_optimized_response, success_response, get_requested_fields, select_fields,
+    generate_input_etag, generate_result_etag, etag_result_ids, etag_matches, not_modified_response
+)
+from utils.pagination import get_pagination_params, paginate_dataframe, paginate_query, PaginationCursor
+from utils.result_store import store_result, get_result
+from utils.streaming import get_stream_format, stream_frame_response, progress_event_stream_response
+from utils.progress import get_progress_status, wait_for_progress, waiter_slots, StageProgress
+from utils.deadline import get_deadline
+from utils.jobs import get_job_executor, run_until_deadline, continue_as_job
+from utils.ingest import get_upload_source
+from utils.loan_analyses import LoanFrame, AnalysisResult, ANALYSES, input_columns
+from utils.metrics import metrics, timed_stage, record_stage, record_rows
+from models.analysis_result import AnalysisResultRow, persist_result, get_persisted_result, purge_expired_results
+from routes.v1.mtd_parameters_handler import process_mtd_parameters_endpoint
+from concurrent.futures import wait
 import pandas as pd
-import os
-import tempfile
+import json
 import logging
+import time
 
 # Import original processing modules
 from Arreas_collected import ArrearsProcessorAPI as ArrearsProcessor
-from arrange_Dues import generate_loan_report as generate_arranged_report
-from arrange_arrears import create_enterprise_dashboard
-from MTD_unpaid_dues import main as process_unpaid_dues
-from MTD_parameters_branch_comparison import BranchPerformanceAnalyzer
 
 logger = logging.getLogger(__name__)
 
 loans_bp = Blueprint('loans', __name__)
 
+# What happens to analyses still running at the request deadline (?on_timeout=)
+TIMEOUT_MODES = ('async', 'partial')
 
-def save_uploaded_file(file, filename=None):
-    """Save uploaded file to temp directory"""
-    if not filename:
-        filename = file.filename
+
+def result_page_response(stored, etag=None):
+    """
+    Build paginated response for a stored result
+    
+    With ?output=stream the full result is streamed as NDJSON or CSV
+    instead of returning a single page.
+    
+    Args:
+        stored: StoredResult instance
+        etag: Input-fingerprint ETag of the request that produced the result;
+            defaults to one derived from the result handle and query params
+    
+    Returns:
+        Mobile-optimized response with one page of the stored result
+    """
+    stream_format = get_stream_format()
+    if stream_format:
+        # Unrequested columns are never encoded
+        response = stream_frame_response(
+            select_fields(stored.frame, get_requested_fields()),
+            stream_format,
+            filename=stored.metadata.get('analysis')
+        )
+        response.headers['X-Result-Id'] = stored.result_id
+        return response
+    
+    if etag is not None:
+        return mobile_optimized_response(result_page(stored), cacheable=False, etag=etag)
+    
+    # Stored results never change, so the handle plus params identify the page
+    etag = generate_input_etag()
+    if etag_matches(etag):
+        return not_modified_response(etag)
+    
+    # Repeat page requests are answered with the body compressed the first time
+    encoding = negotiated_encoding()
+    if encoding:
+        body = stored.get_encoded(f'{etag}:{encoding}')
+        if body is not None:
+            return precompressed_response(body, encoding, etag)
+    
+    # The body is replayed to later requests, so it carries nothing request-specific
+    response, status_code = mobile_optimized_response(
+        result_page(stored), cacheable=False, etag=etag, request_fields=False
+    )
+    cache_compressed_body(response, stored, etag)
+    
+    return response, status_code
+
+
+def result_page(stored):
+    """
+    Get the requested page of a stored result with its summary and handle
+    
+    Args:
+        stored: StoredResult instance
+    
+    Returns:
+        Pagination dict with 'summary' and 'result' added
+    """
+    limit, after_cursor, _ = get_pagination_params()
+    
+    # Only the requested page is serialized (straight from its columns)
+    result = paginate_dataframe(
+        stored.frame,
+        limit=limit,
+        after_cursor=after_cursor,
+        cursor_fields=stored.metadata.get('cursor_fields'),
+        as_records=False
+    )
+    result['summary'] = stored.summary
+    result['result'] = stored.to_dict()
+    
+    # The handle stays valid while the persisted copy lives
+    persisted_until = stored.metadata.get('persisted_until')
+    if persisted_until:
+        result['result']['expires_at'] = persisted_until.isoformat() + 'Z'
+    
+    return result
+
+
+def persisted_page_response(result_set, officer=None):
+    """
+    Build paginated response for a persisted result
+    
+    Args:
+        result_set: AnalysisResultSet instance
+        officer: Only rows of this officer
+    
+    Returns:
+        Mobile-optimized response with one page of the persisted result
+    """
+    stream_format = get_stream_format()
+    if stream_format:
+        rows = result_set.rows(officer).order_by(AnalysisResultRow.position)
+        frame = pd.DataFrame([row.to_dict() for row in rows])
+        response = stream_frame_response(
+            select_fields(frame, get_requested_fields()),
+            stream_format,
+            filename=result_set.analysis
+        )
+        response.headers['X-Result-Id'] = result_set.result_id
+        return response
+    
+    # Persisted results never change, so the handle plus params identify the page
+    etag = generate_input_etag()
+    if etag_matches(etag):
+        return not_modified_response(etag)
+    
+    return mobile_optimized_response(persisted_page(result_set, officer), cacheable=False, etag=etag)
+
+
+def persisted_page(result_set, officer=None):
+    """
+    Get the requested page of a persisted result with its summary and handle
+    
+    Rows are read in position order from the result/officer index.
+    Cursors of in-memory pages (row offsets) continue where they left off.
+    
+    Args:
+        result_set: AnalysisResultSet instance
+        officer: Only rows of this officer
+    
+    Returns:
+        Pagination dict with 'summary' and 'result' added
+    """
+    limit, after_cursor, _ = get_pagination_params()
+    
+    cursor_data = PaginationCursor.decode_cursor(after_cursor) if after_cursor else {}
+    if officer is None and 'position' not in cursor_data and 'offset' in cursor_data:
+        try:
+            after_cursor = PaginationCursor.encode_cursor({'position': int(cursor_data['offset']) - 1})
+        except (TypeError, ValueError):
+            after_cursor = None
+    
+    rows = result_set.rows(officer)
+    items, next_cursor, has_more = paginate_query(rows, limit, after_cursor, order_by_field='position')
+    
+    return {
+        'data': [row.to_dict() for row in items],
+        'pagination': {
+            'next_cursor': next_cursor,
+            'has_more': has_more,
+            'limit': limit,
+            'total_count': result_set.total_count if officer is None else rows.count()
+        },
+        'summary': result_set.summary,
+        'result': result_set.to_dict()
+    }
+
+
+def input_etag_or_not_modified(*sources):
+    """
+    Compute input-fingerprint ETag for analysis input files
+    
+    Responses carry this ETag bound to their result handles, so a client's
+    copy is only revalidated while the results it points to can be read.
+    
+    Args:
+        *sources: UploadSource objects
+    
+    Returns:
+        Tuple of (etag, 304 response or None); the response is set when the
+        client already holds the result for these exact inputs
+    """
+    etag = generate_input_etag(*[source.fingerprint() for source in sources])
+    
+    for result_ids in etag_result_ids(etag):
+        if all(result_available(result_id) for result_id in result_ids):
+            return etag, not_modified_response(generate_result_etag(etag, *result_ids))
+    
+    return etag, None
+
+
+def result_available(result_id):
+    """Check if a result of the current user can still be read by its handle"""
+    stored = get_result(result_id, max_entries=current_app.config.get('RESULT_STORE_MAX_ENTRIES', 64))
+    if stored is None and current_app.config.get('PERSIST_RESULTS', False):
+        stored = get_persisted_result(result_id)
+    
+    return stored is not None and stored.user_id == g.user_id
+
+
+def store_and_respond(frame, summary, analysis, cursor_fields=None, etag=None):
+    """
+    Store processed result under a new handle and return its first page
+    
+    Later pages are read via GET /results/<result_id> without re-uploading.
+    
+    Args:
+        frame: Result frame to paginate
+        summary: Summary block for the result
+        analysis: Analysis name (stored as metadata)
+        cursor_fields: Sort key columns of the frame, used for keyset cursors
+        etag: Input-fingerprint ETag sent (bound to the handle) with the first page
+    
+    Returns:
+        Mobile-optimized response with the first page
+    """
+    stored = store_analysis_result(frame, summary, analysis, cursor_fields=cursor_fields)
+    
+    if etag is not None:
+        etag = generate_result_etag(etag, stored.result_id)
     
-    upload_folder = current_app.config['UPLOAD_FOLDER']
-    filepath = os.path.join(upload_folder, filename)
-    file.save(filepath)
-    return filepath
+    return result_page_response(stored, etag=etag)
+
+
+def store_analysis_result(frame, summary, analysis, cursor_fields=None):
+    """
+    Store processed result for the current user under a new handle
+    
+    Args:
+        frame: Result frame to paginate
+        summary: Summary block for the result
+        analysis: Analysis name (stored as metadata)
+        cursor_fields: Sort key columns of the frame, used for keyset cursors
+    
+    Returns:
+        StoredResult instance
+    """
+    stored = store_result(
+        frame.reset_index(drop=True),
+        summary=summary,
+        analysis=analysis,
+        cursor_fields=cursor_fields,
+        **result_store_options()
+    )
+    persist_analysis_result(stored)
+    
+    return stored
+
+
+def persist_analysis_result(stored, endpoint=None):
+    """
+    Write a stored result to the database in the background (if PERSIST_RESULTS)
+    
+    The write runs on the job pool, so the response never waits for it; its
+    duration is recorded as the endpoint's 'persist' stage. The persisted
+    copy serves pages once the worker's store has dropped the result, and
+    officer-filtered pages. A failed write only loses that copy.
+    
+    Args:
+        stored: StoredResult instance
+        endpoint: Endpoint the result belongs to (default: the current request's)
+    """
+    app = current_app._get_current_object()
+    config = app.config
+    if not config.get('PERSIST_RESULTS', False):
+        return
+    
+    endpoint = endpoint or request.endpoint
+    
+    def write():
+        started = time.perf_counter()
+        with app.app_context():
+            try:
+                result_set = persist_result(
+                    stored,
+                    ttl_seconds=config.get('RESULT_PERSIST_TTL', 604800),
+                    batch_rows=config.get('RESULT_INSERT_BATCH_ROWS', 200)
+                )
+            except Exception as e:
+                logger.error(f"Error persisting result {stored.result_id}: {str(e)}")
+                return None
+            finally:
+                metrics.observe_stage(endpoint, 'persist', time.perf_counter() - started)
+            
+            try:
+                purge_expired_results()
+            except Exception as e:
+                logger.error(f"Error purging expired results: {str(e)}")
+        
+        stored.metadata['persisted_until'] = result_set.expires_at
+        return result_set.expires_at
+    
+    stored.metadata['persisting'] = get_job_executor(config.get('JOB_MAX_WORKERS', 4)).submit(write)
+
+
+def wait_until_persisted(stored):
+    """
+    Wait for the background write of a stored result, within the request deadline
+    
+    Raises:
+        APIError: RESULT_NOT_READY (503) if the write has not finished in time
+    """
+    writing = stored.metadata.get('persisting')
+    if writing is None:
+        return
+    
+    with timed_stage('persist'):
+        wait([writing], timeout=get_deadline().remaining())
+    
+    if not writing.done():
+        raise APIError('Result is still being saved; retry shortly', code='RESULT_NOT_READY', status_code=503)
+
+
+def result_store_options():
+    """Get store_result options for the current user (usable outside the request)"""
+    return {
+        'user_id': g.user_id,
+        'ttl_seconds': current_app.config.get('RESULT_STORE_TTL', 900),
+        'max_entries': current_app.config.get('RESULT_STORE_MAX_ENTRIES', 64)
+    }
+
+
+def get_timeout_mode():
+    """
+    Get what happens to analyses still running at the request deadline
+    
+    Query params:
+        on_timeout: 'async' (default) to continue them as a job, or
+            'partial' to stop them and return what finished
+    """
+    mode = request.args.get('on_timeout', 'async')
+    if mode not in TIMEOUT_MODES:
+        raise ValidationError(
+            f"Invalid on_timeout '{mode}'. Allowed: {', '.join(TIMEOUT_MODES)}",
+            details={'field': 'on_timeout'}
+        )
+    return mode
+
+
+def processing_deadline(mode):
+    """
+    Get the deadline processors check between stages
+    
+    Only partial mode stops overdue work; in async mode it continues as a job.
+    """
+    return get_deadline() if mode == 'partial' else None
+
+
+def run_analyses_until_deadline(computations):
+    """
+    Run analyses on the job pool and wait for them until the request deadline
+    
+    Args:
+        computations: Callables returning an AnalysisResult, by analysis name
+    
+    Returns:
+        Tuple of (finished results, unfinished futures), both by name
+    """
+    return run_until_deadline(computations, get_deadline(), current_app.config.get('JOB_MAX_WORKERS', 4))
+
+
+def overdue_response(pending, mode, cursor_fields=None, data=None):
+    """
+    Respond for analyses still running at the request deadline
+    
+    In async mode they continue as a job whose progress (and finally the
+    result handles) is served by GET /progress/<operation_id>; in partial
+    mode they stop at their next deadline check.
+    
+    Args:
+        pending: Unfinished futures by analysis name
+        mode: 'async' or 'partial'
+        cursor_fields: Cursor fields of the stored results, by analysis name
+        data: Finished part of the response (results or input summary)
+    
+    Returns:
+        202 response with the job's operation ID, or 200 partial response
+    """
+    data = dict(data or {})
+    data.update({'partial': True, 'deadline_exceeded': True, 'pending': list(pending)})
+    headers = {'Cache-Control': 'no-store'}
+    
+    if mode == 'partial':
+        # Queued analyses never start; running ones stop at their next stage or row-block check
+        for future in pending.values():
+            future.cancel()
+        
+        logger.info(f"Deadline exceeded, stopped: {', '.join(pending)}")
+        return success_response(data, message='Deadline exceeded; unfinished analyses were stopped', headers=headers)
+    
+    app = current_app._get_current_object()
+    endpoint = request.endpoint
+    options = result_store_options()
+    cursor_fields = cursor_fields or {}
+    
+    def store(name, result):
+        stored = store_result(
+            result.frame.reset_index(drop=True),
+            summary=result.summary,
+            analysis=name,
+            cursor_fields=cursor_fields.get(name),
+            **options
+        )
+        with app.app_context():
+            persist_analysis_result(stored, endpoint)
+        return {'result_id': stored.result_id, 'total_count': len(stored.frame)}
+    
+    operation_id = continue_as_job(pending, store, user_id=g.user_id)
+    data['operation_id'] = operation_id
+    data['progress_url'] = url_for('loans.get_progress', operation_id=operation_id)
+    
+    logger.info(f"Deadline exceeded, continuing as job {operation_id}: {', '.join(pending)}")
+    
+    return success_response(
+        data,
+        message='Still processing; the result handles will be published at progress_url',
+        status_code=202,
+        headers=headers
+    )
+
+
+def input_summary(loans):
+    """Summary-only description of the parsed input"""
+    return {'total_records': len(loans), 'columns': list(loans.frame.columns)}
+
+
+def record_analysis_timings(loans, seconds):
+    """
+    Record clean and compute stages of analyses run on a LoanFrame
+    
+    Columns are converted lazily while the analyses run, so the conversion
+    time is moved from the compute stage to the clean stage.
+    
+    Args:
+        loans: LoanFrame the analyses ran on
+        seconds: Time spent running the analyses
+    """
+    record_stage('clean', loans.clean_seconds)
+    record_stage('compute', max(seconds - loans.clean_seconds, 0.0))
+    record_rows(len(loans), len(loans.frame.columns))
+
+
+def run_portfolio_analysis(analysis):
+    """
+    Run a registered portfolio analysis on the request's input file
+    
+    Args:
+        analysis: Analysis name (key of ANALYSES)
+    
+    Returns:
+        Response with the first page of the result (or 304)
+    """
+    spec = ANALYSES[analysis]
+    mode = get_timeout_mode()
+    source = get_upload_source('file', allowed_extensions=spec.allowed_extensions)
+    
+    etag, not_modified = input_etag_or_not_modified(source)
+    if not_modified:
+        return not_modified
+    
+    # Parse only the analysis' columns straight from the upload spool or stored upload
+    with timed_stage('parse'):
+        loans = LoanFrame(source.read_frame(columns=spec.input_columns), deadline=processing_deadline(mode))
+    
+    started = time.perf_counter()
+    results, pending = run_analyses_until_deadline({analysis: lambda: spec.compute(loans)})
+    if pending:
+        return overdue_response(pending, mode, {analysis: spec.cursor_fields}, {'summary': input_summary(loans)})
+    
+    result = results[analysis]
+    record_analysis_timings(loans, time.perf_counter() - started)
+    
+    return store_and_respond(result.frame, result.summary, analysis, cursor_fields=spec.cursor_fields, etag=etag)
+
+
+@loans_bp.route('/results/<result_id>', methods=['GET'])
+@require_auth
+def get_result_page(result_id):
+    """
+    Get a page of a previously processed result
+    
+    Query params:
+        limit: Page size (default: 20)
+        after: Pagination cursor from the previous page
+        officer: Only rows of this officer (FieldOfficer or SalesRep)
+        fields: Comma-separated field names for partial response
+        output: 'stream' to stream the full result instead of one page
+        format: Stream format, 'ndjson' (default) or 'csv'
+    
+    Returns:
+        One page of the stored result (no re-upload or re-processing)
+    """
+    persist = current_app.config.get('PERSIST_RESULTS', False)
+    officer = request.args.get('officer')
+    if officer is not None and not persist:
+        raise ValidationError('officer filter requires persisted results', details={'field': 'officer'})
+    
+    after_cursor = request.args.get('after')
+    persisted_cursor = bool(after_cursor) and 'position' in PaginationCursor.decode_cursor(after_cursor)
+    
+    stored = get_result(result_id, max_entries=current_app.config.get('RESULT_STORE_MAX_ENTRIES', 64))
+    if stored:
+        # Verify ownership
+        if stored.user_id != g.user_id:
+            raise AuthorizationError('Not authorized to view this result')
+        
+        if officer is None and not persisted_cursor:
+            return result_page_response(stored)
+        
+        # Officer filters and cursors of persisted pages are served from the database
+        wait_until_persisted(stored)
+    
+    result_set = get_persisted_result(result_id) if persist else None
+    
+    if not result_set:
+        raise NotFoundError('Result not found or expired')
+    
+    # Verify ownership
+    if result_set.user_id != g.user_id:
+        raise AuthorizationError('Not authorized to view this result')
+    
+    return persisted_page_response(result_set, officer)
+
+
+def get_owned_progress(operation_id):
+    """
+    Get progress of an operation owned by the current user
+    
+    Raises:
+        NotFoundError: If the operation is unknown or its progress expired
+        AuthorizationError: If the operation belongs to another user
+    """
+    status = get_progress_status(operation_id)
+    
+    if not status:
+        raise NotFoundError('Operation not found or expired')
+    
+    if status.get('user_id') not in (None, g.user_id):
+        raise AuthorizationError('Not authorized to view this operation')
+    
+    return status
+
+
+def get_progress_version():
+    """Get the progress version the client already has (?version= or Last-Event-ID)"""
+    version = request.args.get('version', request.headers.get('Last-Event-ID'))
+    if version in (None, ''):
+        return None
+    
+    try:
+        return int(version)
+    except ValueError:
+        raise ValidationError('version must be an integer', details={'field': 'version'})
+
+
+def take_waiter_slot():
+    """
+    Take one of this worker's PROGRESS_MAX_WAITERS slots for a waiting client
+    
+    Raises:
+        APIError: PROGRESS_BUSY (503) if all slots are taken
+    """
+    if not waiter_slots.acquire(current_app.config.get('PROGRESS_MAX_WAITERS', 4)):
+        raise APIError(
+            'Too many clients waiting for progress; poll without wait or retry shortly',
+            code='PROGRESS_BUSY',
+            status_code=503
+        )
+
+
+@loans_bp.route('/progress/<operation_id>', methods=['GET'])
+@require_auth
+def get_progress(operation_id):
+    """
+    Get progress of a long-running operation
+    
+    Query params:
+        version: Progress version the client already has
+        wait: Seconds to wait for a newer version (long poll, default: 0,
+            at most PROGRESS_LONG_POLL_MAX)
+    
+    Returns:
+        Latest progress (unchanged version if the wait timed out)
+    """
+    status = get_owned_progress(operation_id)
+    
+    try:
+        wait = float(request.args.get('wait', 0))
+    except ValueError:
+        raise ValidationError('wait must be a number of seconds', details={'field': 'wait'})
+    wait = min(max(wait, 0.0), current_app.config.get('PROGRESS_LONG_POLL_MAX', 30))
+    
+    version = get_progress_version()
+    if wait and version is not None:
+        take_waiter_slot()
+        try:
+            status = wait_for_progress(operation_id, version, timeout=wait)
+        finally:
+            waiter_slots.release()
+        if not status:
+            raise NotFoundError('Operation not found or expired')
+    
+    response = jsonify(status)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+@loans_bp.route('/progress/<operation_id>/stream', methods=['GET'])
+@require_auth
+def stream_progress(operation_id):
+    """
+    Stream progress of a long-running operation as Server-Sent Events
+    
+    Sends a 'progress' event per change (coalesced to one per flush
+    interval), then 'end' once the operation finished or was cancelled.
+    Reconnecting clients resume after Last-Event-ID.
+    
+    Query params:
+        version: Progress version the client already has
+    """
+    get_owned_progress(operation_id)
+    version = get_progress_version()
+    
+    take_waiter_slot()
+    try:
+        response = progress_event_stream_response(operation_id, version)
+    except Exception:
+        waiter_slots.release()
+        raise
+    # The slot is held until the stream is closed (finished or disconnected)
+    response.call_on_close(waiter_slots.release)
+    return response
 
 
 @loans_bp.route('/dormant-arrangement', methods=['POST'])
@@ -44,94 +663,42 @@ def process_dormant():
     
     Form data:
         file: Excel file with branch data
+        upload_session_id: Completed chunked upload to use instead of file
     
     Query params:
         limit: Page size (default: 20)
         after: Pagination cursor
-        fields: Comma-separated field names for partial response
+        fields: Comma-separated columns to load; the stored result only
+            holds these columns
     
     Returns:
         Processed dormant arrangement data with pagination
     """
-    filepath = None
     try:
         # Validate file upload
-        if 'file' not in request.files:
-            raise ValidationError('No file provided', field='file')
-        
-        file = request.files['file']
-        validate_file(
-            file,
-            allowed_extensions=['xlsx', 'xls'],
-            max_size=current_app.config['MAX_CONTENT_LENGTH']
-        )
-        
-        # Save file temporarily with unique name to prevent collisions
-        import uuid
-        unique_id = str(uuid.uuid4())
-        filename = f"{unique_id}_{file.filename}"
-        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        
-        # Process with existing code
-        df = pd.read_excel(filepath)
-        
-        # Get pagination params
-        limit, after_cursor, _ = get_pagination_params()
-        
-        # Get total count
-        total_count = len(df)
+        source = get_upload_source('file', allowed_extensions=['xlsx', 'xls'])
         
-        # Apply pagination to dataframe BEFORE converting to dict
-        start_idx = 0
-        if after_cursor:
-            from utils.pagination import PaginationCursor
-            cursor_data = PaginationCursor.decode_cursor(after_cursor)
-            start_idx = cursor_data.get('offset', 0)
+        etag, not_modified = input_etag_or_not_modified(source)
+        if not_modified:
+            return not_modified
         
-        end_idx = start_idx + limit + 1  # +1 to check has_more
-        paginated_df = df.iloc[start_idx:end_idx]
+        # Requested fields are the only columns loaded and stored
+        with timed_stage('parse'):
+            df = source.read_frame(columns=get_requested_fields())
+        record_rows(len(df), len(df.columns))
         
-        # Convert paginated data to records
-        records = paginated_df.to_dict(orient='records')
-        has_more = len(records) > limit
-        page_records = records[:limit]
-        
-        # Generate next cursor
-        next_cursor = None
-        if has_more:
-            from utils.pagination import PaginationCursor
-            next_cursor = PaginationCursor.encode_cursor({'offset': end_idx - 1})
-        
-        result = {
-            'data': page_records,
-            'pagination': {
-                'next_cursor': next_cursor,
-                'has_more': has_more,
-                'limit': limit,
-                'total_count': total_count
-            },
-            'summary': {
-                'total_records': total_count,
-                'columns': list(df.columns)
-            }
+        summary = {
+            'total_records': len(df),
+            'columns': list(df.columns)
         }
         
-        logger.info(f"Processed dormant arrangement: {total_count} records")
+        logger.info(f"Processed dormant arrangement: {len(df)} records")
         
-        return mobile_optimized_response(result, cacheable=False)
+        return store_and_respond(df, summary, 'dormant-arrangement', etag=etag)
     
     except Exception as e:
         logger.error(f"Error processing dormant arrangement: {str(e)}")
         raise
-    
-    finally:
-        # Always clean up temp file
-        if filepath and os.path.exists(filepath):
-            try:
-                os.remove(filepath)
-            except OSError as e:
-                logger.warning(f"Failed to cleanup temp file {filepath}: {e}")
 
 
 @loans_bp.route('/arrears-collected', methods=['POST'])
@@ -143,83 +710,141 @@ def process_arrears():
     Form data:
         sod_file: SOD arrears file (CSV)
         current_file: Current arrears file (CSV)
+        sod_file_upload_session_id: Completed chunked upload to use instead of sod_file
+        current_file_upload_session_id: Completed chunked upload to use instead of current_file
+        officer_targets: Optional JSON object of collection targets by officer
+    
+    Query params:
+        on_timeout: 'async' (default) or 'partial'; what happens when the
+            processing is still running at the request deadline
     
     Returns:
         Arrears collection analysis with officer summaries
     """
-    sod_path = None
-    cur_path = None
-    
     try:
-        # Validate files
-        if 'sod_file' not in request.files or 'current_file' not in request.files:
-            raise ValidationError('Both SOD and Current files are required')
+        mode = get_timeout_mode()
         
-        sod_file = request.files['sod_file']
-        current_file = request.files['current_file']
-        
-        # Validate file types
-        for file in [sod_file, current_file]:
-            validate_file(
-                file,
-                allowed_extensions=['csv'],
-                max_size=current_app.config['MAX_CONTENT_LENGTH']
-            )
+        # Validate files
+        sod_source = get_upload_source('sod_file', allowed_extensions=['csv'])
+        current_source = get_upload_source('current_file', allowed_extensions=['csv'])
+        officer_targets = get_officer_targets()
         
-        # Save files temporarily with unique names to prevent collisions
-        import uuid
-        session_id = str(uuid.uuid4())
-        sod_path = os.path.join(current_app.config['UPLOAD_FOLDER'], f'{session_id}_sod_data.csv')
-        cur_path = os.path.join(current_app.config['UPLOAD_FOLDER'], f'{session_id}_current_data.csv')
+        etag, not_modified = input_etag_or_not_modified(sod_source, current_source)
+        if not_modified:
+            return not_modified
         
-        sod_file.save(sod_path)
-        current_file.save(cur_path)
+        with timed_stage('parse'):
+            sod_content = sod_source.read_bytes()
+            current_content = current_source.read_bytes()
         
-        # Use ArrearsProcessor
+        # Use ArrearsProcessor on the uploaded content (parses the files itself);
+        # it checks the deadline between its stages and row blocks
         processor = ArrearsProcessor()
-        result = processor.process_data(sod_path, cur_path)
-        
-        if result is None:
-            raise ValidationError('Processing failed - invalid data format')
-        
-        df_collected, df_merged, officers = result
-        
-        # Get pagination params
-        limit, after_cursor, _ = get_pagination_params()
+        progress = StageProgress(None, [], deadline=processing_deadline(mode))
+        merged_shape = []
+        
+        def compute():
+            result = processor.process_data(
+                sod_content, sod_source.filename,
+                current_content, current_source.filename,
+                progress
+            )
+            
+            if result is None:
+                raise ValidationError('Processing failed - invalid data format')
+            
+            df_collected, df_merged, officers = result
+            merged_shape.extend(df_merged.shape)
+            
+            summary = {
+                'total_collected': float(df_collected['Collected'].sum()) if not df_collected.empty else 0,
+                'officer_count': len(officers),
+                'collection_by_officer': df_collected.groupby('SalesRep')['Collected'].sum().to_dict() if not df_collected.empty else {}
+            }
+            if officer_targets is not None:
+                summary['officer_targets'] = target_progress(processor, df_collected, officers, officer_targets)
+            return AnalysisResult(df_collected, summary)
         
-        # Create response with pagination
-        collection_records = df_collected.to_dict(orient='records')
+        with timed_stage('compute'):
+            results, pending = run_analyses_until_deadline({'arrears-collected': compute})
         
-        paginated_data = create_pagination_response(
-            collection_records,
-            total_count=len(df_collected),
-            limit=limit,
-            after_cursor=after_cursor
-        )
+        if pending:
+            return overdue_response(pending, mode, data={'summary': {'last_stage': progress.current}})
         
-        # Add summary
-        paginated_data['summary'] = {
-            'total_collected': float(df_collected['Collected'].sum()) if not df_collected.empty else 0,
-            'officer_count': len(officers),
-            'collection_by_officer': df_collected.groupby('SalesRep')['Collected'].sum().to_dict() if not df_collected.empty else {}
-        }
+        df_collected, summary = results['arrears-collected']
+        record_rows(*merged_shape)
         
         logger.info(f"Processed arrears collection: {len(df_collected)} records")
         
-        return mobile_optimized_response(paginated_data, cacheable=False)
+        return store_and_respond(df_collected, summary, 'arrears-collected', etag=etag)
     
     except Exception as e:
         logger.error(f"Error processing arrears: {str(e)}")
         raise
+
+
+def get_officer_targets():
+    """
+    Get collection targets by officer from the officer_targets form field
+    
+    Returns:
+        Dictionary of target amounts by officer, or None if not sent
+    
+    Raises:
+        ValidationError: If the field is not a JSON object
+    """
+    raw = request.form.get('officer_targets')
+    if not raw:
+        return None
+    
+    try:
+        targets = json.loads(raw)
+    except ValueError:
+        targets = None
+    
+    if not isinstance(targets, dict):
+        raise ValidationError(
+            'officer_targets must be a JSON object of target amounts by officer',
+            details={'field': 'officer_targets'}
+        )
+    
+    return targets
+
+
+def target_progress(processor, df_collected, officers, officer_targets):
+    """Target, collected, remaining and achievement % per officer"""
+    table = processor.create_formatted_table(df_collected, officers, officer_targets)
+    table = table.drop(index='GRAND TOTAL')
+    
+    return {
+        officer: {
+            'target': float(row['Target']),
+            'collected': float(row['Grand Total']),
+            'remaining': float(row['Remaining']),
+            'achievement': float(row['Achievement %'])
+        }
+        for officer, row in table.iterrows()
+    }
+
+
+@loans_bp.route('/mtd-parameters', methods=['POST'])
+@require_auth
+def mtd_parameters():
+    """
+    Compare branches on MTD income, collection rate and disbursement
+    
+    Form data:
+        income_file: MTD income data (CSV/Excel)
+        cr_file: MTD collection rate data (CSV/Excel)
+        disb_file: MTD disbursement data (CSV/Excel)
+    
+    Query params:
+        sort: Ranking order (default: score_desc)
     
-    finally:
-        # Always clean up temp files
-        for path in [sod_path, cur_path]:
-            if path and os.path.exists(path):
-                try:
-                    os.remove(path)
-                except OSError as e:
-                    logger.warning(f"Failed to cleanup temp file {path}: {e}")
+    Returns:
+        Branch rankings, summary and the download URL of the Excel report
+    """
+    return process_mtd_parameters_endpoint()
 
 
 @loans_bp.route('/arrange-dues', methods=['POST'])
@@ -230,95 +855,17 @@ def arrange_dues():
     
     Form data:
         file: CSV file with loan data
+        upload_session_id: Completed chunked upload to use instead of file
     
     Returns:
         Organized dues by field officer with pagination
     """
-    filepath = None
-    
     try:
-        if 'file' not in request.files:
-            raise ValidationError('No file provided', field='file')
-        
-        file = request.files['file']
-        validate_file(
-            file,
-            allowed_extensions=['csv'],
-            max_size=current_app.config['MAX_CONTENT_LENGTH']
-        )
-        
-        # Save with unique filename to prevent collisions
-        import uuid
-        unique_id = str(uuid.uuid4())
-        filename = f"{unique_id}_{file.filename}"
-        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        
-        # Process data
-        df = pd.read_csv(filepath)
-        
-        # Check for required columns
-        required_columns = ['FullNames', 'FieldOfficer', 'Amount Due', 'Arrears']
-        missing = [col for col in required_columns if col not in df.columns]
-        if missing:
-            raise ValidationError(f'Missing columns: {", ".join(missing)}')
-        
-        # Clean numeric columns
-        df_processed = df.copy()
-        numeric_cols = ['Amount Due', 'Arrears']
-        
-        for col in numeric_cols:
-            if col in df_processed.columns:
-                df_processed[col] = pd.to_numeric(
-                    df_processed[col].astype(str).str.replace(r'[^\d\.\-]', '', regex=True),
-                    errors='coerce'
-                ).fillna(0)
-        
-        # Group by Field Officer
-        grouped = df_processed.groupby('FieldOfficer').agg({
-            'FullNames': 'count',
-            'Amount Due': 'sum',
-            'Arrears': 'sum'
-        }).reset_index()
-        
-        grouped.columns = ['FieldOfficer', 'ClientCount', 'TotalAmountDue', 'TotalArrears']
-        
-        # Get pagination params
-        limit, after_cursor, _ = get_pagination_params()
-        
-        # Create paginated response
-        officer_records = grouped.to_dict(orient='records')
-        
-        result = create_pagination_response(
-            officer_records,
-            total_count=len(grouped),
-            limit=limit,
-            after_cursor=after_cursor
-        )
-        
-        # Add summary
-        result['summary'] = {
-            'total_clients': len(df_processed),
-            'officer_count': len(grouped),
-            'total_amount_due': float(df_processed['Amount Due'].sum()),
-            'total_arrears': float(df_processed['Arrears'].sum())
-        }
-        
-        logger.info(f"Arranged dues: {len(df_processed)} clients, {len(grouped)} officers")
-        
-        return mobile_optimized_response(result, cacheable=False)
+        return run_portfolio_analysis('arrange-dues')
     
     except Exception as e:
         logger.error(f"Error arranging dues: {str(e)}")
         raise
-    
-    finally:
-        # Always clean up temp file
-        if filepath and os.path.exists(filepath):
-            try:
-                os.remove(filepath)
-            except OSError as e:
-                logger.warning(f"Failed to cleanup temp file {filepath}: {e}")
 
 
 @loans_bp.route('/arrange-arrears', methods=['POST'])
@@ -329,113 +876,17 @@ def arrange_arrears():
     
     Form data:
         file: CSV/Excel file with arrears data
+        upload_session_id: Completed chunked upload to use instead of file
     
     Returns:
         Arrears arranged by bucket with sales rep summaries
     """
-    filepath = None
-    
     try:
-        if 'file' not in request.files:
-            raise ValidationError('No file provided', field='file')
-        
-        file = request.files['file']
-        
-        # Save with unique filename to prevent collisions
-        import uuid
-        unique_id = str(uuid.uuid4())
-        filename = f"{unique_id}_{file.filename}"
-        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        
-        # Read data
-        ext = get_file_extension(file.filename)
-        if ext == 'csv':
-            df = pd.read_csv(filepath)
-        else:
-            df = pd.read_excel(filepath)
-        
-        # Clean column names
-        df.columns = [c.strip() for c in df.columns]
-        
-        # Required columns
-        required_cols = ['FullNames', 'PhoneNumber', 'Arrears Amount', 'DaysInArrears', 'LoanBalance', 'SalesRep']
-        
-        # Create missing columns if needed
-        for col in required_cols:
-            if col not in df.columns:
-                if 'Amount' in col or 'Days' in col or 'Balance' in col:
-                    df[col] = 0
-                else:
-                    df[col] = 'Unknown'
-        
-        df_clean = df[required_cols].copy()
-        
-        # Ensure numeric columns
-        numeric_cols = ['Arrears Amount', 'DaysInArrears', 'LoanBalance']
-        for col in numeric_cols:
-            df_clean[col] = pd.to_numeric(df_clean[col], errors='coerce').fillna(0)
-        
-        # Bucketing logic
-        def get_bucket(days):
-            if days < 1: return "Current"
-            if 1 <= days <= 3: return "1-3 Days"
-            if 4 <= days <= 5: return "4-5 Days"
-            if 6 <= days <= 9: return "6-9 Days"
-            if 10 <= days <= 30: return "10-30 Days"
-            return "31+ Days"
-        
-        df_clean['Bucket'] = df_clean['DaysInArrears'].apply(get_bucket)
-        
-        # Sort
-        df_clean.sort_values(['SalesRep', 'DaysInArrears'], ascending=[True, True], inplace=True)
-        
-        # Group by SalesRep and Bucket
-        summary = df_clean.groupby(['SalesRep', 'Bucket']).agg({
-            'FullNames': 'count',
-            'Arrears Amount': 'sum',
-            'LoanBalance': 'sum'
-        }).reset_index()
-        
-        summary.columns = ['SalesRep', 'Bucket', 'ClientCount', 'TotalArrears', 'TotalPortfolio']
-        
-        # Get pagination params
-        limit, after_cursor, _ = get_pagination_params()
-        
-        # Paginate summary
-        summary_records = summary.to_dict(orient='records')
-        
-        result = create_pagination_response(
-            summary_records,
-            total_count=len(summary),
-            limit=limit,
-            after_cursor=after_cursor
-        )
-        
-        # Overall summary
-        result['summary'] = {
-            'total_clients': len(df_clean),
-            'total_arrears': float(df_clean['Arrears Amount'].sum()),
-            'total_portfolio': float(df_clean['LoanBalance'].sum()),
-            'sales_reps': df_clean['SalesRep'].nunique(),
-            'bucket_distribution': df_clean['Bucket'].value_counts().to_dict()
-        }
-        
-        logger.info(f"Arranged arrears: {len(df_clean)} clients")
-        
-        return mobile_optimized_response(result, cacheable=False)
+        return run_portfolio_analysis('arrange-arrears')
     
     except Exception as e:
         logger.error(f"Error arranging arrears: {str(e)}")
         raise
-    
-    finally:
-        # Always clean up temp file
-        if filepath and os.path.exists(filepath):
-            try:
-                os.remove(filepath)
-            except OSError as e:
-                logger.warning(f"Failed to cleanup temp file {filepath}: {e}")
 
 
 @loans_bp.route('/mtd-unpaid-dues', methods=['POST'])
@@ -446,114 +897,116 @@ def mtd_unpaid_dues():
     
     Form data:
         file: CSV/Excel file with loan data
+        upload_session_id: Completed chunked upload to use instead of file
     
     Returns:
         Risk analysis by field officer
     """
-    filepath = None
+    try:
+        return run_portfolio_analysis('mtd-unpaid-dues')
+    
+    except Exception as e:
+        logger.error(f"Error processing MTD unpaid dues: {str(e)}")
+        raise
+
+
+@loans_bp.route('/batch', methods=['POST'])
+@require_auth
+def process_batch():
+    """
+    Run several portfolio analyses on one file
+    
+    The file is loaded, cleaned and typed once; the analyses then run
+    concurrently on the shared frame. Each result is stored under its own
+    handle, so further pages come from GET /results/<result_id>.
     
+    Form data:
+        file: CSV/Excel file with portfolio data
+        upload_session_id: Completed chunked upload to use instead of file
+        analyses: Comma-separated analyses (default: all of
+            arrange-dues, arrange-arrears, mtd-unpaid-dues)
+    
+    Query params:
+        limit: Page size of each first page (default: 20)
+        fields: Comma-separated field names for partial response
+        on_timeout: 'async' (default) or 'partial'; what happens to
+            analyses still running at the request deadline
+    
+    Returns:
+        First page, summary and result handle per analysis (flagged
+        'partial' with the unfinished analyses past the deadline)
+    """
     try:
-        if 'file' not in request.files:
-            raise ValidationError('No file provided', field='file')
-        
-        file = request.files['file']
-        
-        # Save with unique filename to prevent collisions
-        import uuid
-        unique_id = str(uuid.uuid4())
-        filename = f"{unique_id}_{file.filename}"
-        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        
-        # Load data
-        ext = get_file_extension(file.filename)
-        if ext == 'csv':
-            df = pd.read_csv(filepath)
+        mode = get_timeout_mode()
+        requested = request.form.get('analyses') or request.args.get('analyses')
+        if requested:
+            analyses = list(dict.fromkeys(name.strip() for name in requested.split(',') if name.strip()))
         else:
-            df = pd.read_excel(filepath)
-        
-        # Standardize columns
-        df.columns = [c.strip() for c in df.columns]
-        
-        # Ensure required columns exist
-        required = ["FullNames", "PhoneNumber", "Arrears", "LoanBalance", "FieldOfficer"]
-        for col in required:
-            if col not in df.columns:
-                if col in ["Arrears", "LoanBalance"]:
-                    df[col] = 0
-                else:
-                    df[col] = "Unknown"
+            analyses = list(ANALYSES)
         
-        df_clean = df[required].copy()
-        
-        # Convert numeric columns
-        numeric_cols = ["Arrears", "LoanBalance"]
-        for col in numeric_cols:
-            df_clean[col] = pd.to_numeric(df_clean[col], errors='coerce').fillna(0)
-        
-        # Risk categorization
-        def categorize_risk(row):
-            arrears = row['Arrears']
-            balance = row['LoanBalance']
-            
-            if balance == 0:
-                return "Unknown"
-            
-            risk_ratio = arrears / balance if balance > 0 else 0
-            
-            if risk_ratio > 0.3:
-                return "High Risk"
-            elif risk_ratio > 0.1:
-                return "Medium Risk"
-            else:
-                return "Low Risk"
-        
-        df_clean['RiskCategory'] = df_clean.apply(categorize_risk, axis=1)
+        unknown = [name for name in analyses if name not in ANALYSES]
+        if unknown or not analyses:
+            raise ValidationError(
+                f"Invalid analyses: {', '.join(unknown) or 'none given'}. Allowed: {', '.join(ANALYSES)}",
+                details={'field': 'analyses'}
+            )
         
-        # Group by officer and risk
-        summary = df_clean.groupby(['FieldOfficer', 'RiskCategory']).agg({
-            'FullNames': 'count',
-            'Arrears': 'sum',
-            'LoanBalance': 'sum'
-        }).reset_index()
+        # The file has to satisfy every requested analysis
+        allowed_extensions = None
+        for name in analyses:
+            spec_extensions = ANALYSES[name].allowed_extensions
+            if spec_extensions:
+                allowed_extensions = [
+                    ext for ext in (allowed_extensions or spec_extensions) if ext in spec_extensions
+                ]
         
-        summary.columns = ['FieldOfficer', 'RiskCategory', 'ClientCount', 'TotalArrears', 'TotalPortfolio']
+        source = get_upload_source('file', allowed_extensions=allowed_extensions)
         
-        # Get pagination params
-        limit, after_cursor, _ = get_pagination_params()
+        etag, not_modified = input_etag_or_not_modified(source)
+        if not_modified:
+            return not_modified
         
-        # Paginate
-        risk_records = summary.to_dict(orient='records')
+        # Shared load, clean and type steps (only columns some analysis reads)
+        with timed_stage('parse'):
+            loans = LoanFrame(source.read_frame(columns=input_columns(analyses)), deadline=processing_deadline(mode))
         
-        result = create_pagination_response(
-            risk_records,
-            total_count=len(summary),
-            limit=limit,
-            after_cursor=after_cursor
+        started = time.perf_counter()
+        results, pending = run_analyses_until_deadline(
+            {name: (lambda spec=ANALYSES[name]: spec.compute(loans)) for name in analyses}
         )
+        record_analysis_timings(loans, time.perf_counter() - started)
+        
+        fields = get_requested_fields()
+        pages = {}
+        result_ids = []
+        for name in results:
+            stored = store_analysis_result(
+                results[name].frame,
+                results[name].summary,
+                name,
+                cursor_fields=ANALYSES[name].cursor_fields
+            )
+            result_ids.append(stored.result_id)
+            page = result_page(stored)
+            if fields:
+                page['data'] = select_fields(page['data'], fields)
+            pages[name] = page
+        
+        if pending:
+            return overdue_response(
+                pending,
+                mode,
+                {name: ANALYSES[name].cursor_fields for name in pending},
+                {'analyses': analyses, 'results': pages, 'summary': input_summary(loans)}
+            )
         
-        # Overall statistics
-        result['summary'] = {
-            'total_clients': len(df_clean),
-            'total_arrears': float(df_clean['Arrears'].sum()),
-            'total_portfolio': float(df_clean['LoanBalance'].sum()),
-            'high_risk_clients': len(df_clean[df_clean['RiskCategory'] == 'High Risk']),
-            'medium_risk_clients': len(df_clean[df_clean['RiskCategory'] == 'Medium Risk']),
-            'low_risk_clients': len(df_clean[df_clean['RiskCategory'] == 'Low Risk'])
-        }
-        
-        logger.info(f"MTD unpaid dues analysis: {len(df_clean)} clients")
+        logger.info(f"Processed batch of {len(analyses)} analyses: {len(loans)} records")
         
-        return mobile_optimized_response(result, cacheable=False)
+        return success_response(
+            {'analyses': analyses, 'results': pages},
+            headers={'ETag': generate_result_etag(etag, *result_ids), 'Cache-Control': 'private, no-cache'}
+        )
     
     except Exception as e:
-        logger.error(f"Error processing MTD unpaid dues: {str(e)}")
+        logger.error(f"Error processing analysis batch: {str(e)}")
         raise
-    
-    finally:
-        # Always clean up temp file
-        if filepath and os.path.exists(filepath):
-            try:
-                os.remove(filepath)
-            except OSError as e:
-                logger.warning(f"Failed to cleanup temp file {filepath}: {e}")
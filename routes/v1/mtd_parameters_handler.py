@@ -4,8 +4,7 @@ Handles processing of MTD income, CR, and disbursement files
 """
 
 import os
-import io
-from flask import request, jsonify
+from flask import request, jsonify, current_app
 from werkzeug.utils import secure_filename
 import logging
 import tempfile
@@ -15,6 +14,8 @@ from datetime import datetime
 import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 from MTD_parameters_branch_comparison import MTDParametersAPI
+from utils.ingest import open_upload_stream
+from utils.metrics import timed_stage
 
 logger = logging.getLogger(__name__)
 
@@ -70,16 +71,17 @@ def process_mtd_parameters_endpoint():
         
         logger.info(f"Processing MTD parameters: income={income_file.filename}, cr={cr_file.filename}, disb={disb_file.filename}")
         
-        # Read files into BytesIO objects
-        income_stream = io.BytesIO(income_file.read())
-        cr_stream = io.BytesIO(cr_file.read())
-        disb_stream = io.BytesIO(disb_file.read())
+        # Parse straight from the upload spools
+        income_stream = open_upload_stream(income_file)
+        cr_stream = open_upload_stream(cr_file)
+        disb_stream = open_upload_stream(disb_file)
         
         # Initialize analyzer
         analyzer = MTDParametersAPI()
         
         # Load data
-        load_result = analyzer.load_data(income_stream, cr_stream, disb_stream)
+        with timed_stage('parse'):
+            load_result = analyzer.load_data(income_stream, cr_stream, disb_stream)
         if load_result['status'] == 'error':
             return jsonify({
                 'success': False,
@@ -89,7 +91,8 @@ def process_mtd_parameters_endpoint():
         
         # Analyze data (sort by performance score descending)
         sort_option = request.args.get('sort', 'score_desc')
-        analysis_result = analyzer.analyze_data(sort_option)
+        with timed_stage('compute'):
+            analysis_result = analyzer.analyze_data(sort_option)
         
         if analysis_result['status'] == 'error':
             return jsonify({
@@ -100,13 +103,14 @@ def process_mtd_parameters_endpoint():
         
         # Generate Excel report
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        static_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'static', 'reports')
+        static_dir = os.path.join(current_app.static_folder, 'reports')
         os.makedirs(static_dir, exist_ok=True)
         
         excel_filename = f"branch_performance_{timestamp}.xlsx"
         excel_path = os.path.join(static_dir, excel_filename)
         
-        excel_result = analyzer.export_to_excel(excel_path)
+        with timed_stage('excel'):
+            excel_result = analyzer.export_to_excel(excel_path)
         
         if excel_result['status'] == 'error':
             logger.error(f"Failed to generate Excel: {excel_result.get('error', '')}")
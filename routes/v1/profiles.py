@@ -0,0 +1,76 @@
+"""
+Request profile endpoints (admin only)
+Lists and downloads profiles recorded by ProfilingMiddleware
+"""
+from flask import Blueprint, request, current_app, send_file
+from middleware.auth import require_auth, require_role
+from middleware.error_handler import ValidationError, NotFoundError
+from middleware.profiling import get_profile_store
+from utils.response import success_response
+import logging
+
+logger = logging.getLogger(__name__)
+
+profiles_bp = Blueprint('profiles', __name__)
+
+# pstats sort keys accepted for text reports
+REPORT_SORT_KEYS = ('cumulative', 'tottime', 'calls')
+
+
+@profiles_bp.route('', methods=['GET'])
+@require_auth
+@require_role('admin')
+def list_profiles():
+    """
+    List stored request profiles, newest first
+    
+    Returns:
+        Metadata of each profile (request, trigger, duration, input shape)
+    """
+    profiles = get_profile_store().list()
+    
+    return success_response({'profiles': profiles, 'count': len(profiles)})
+
+
+@profiles_bp.route('/<profile_id>', methods=['GET'])
+@require_auth
+@require_role('admin')
+def get_profile(profile_id):
+    """
+    Download a request profile
+    
+    Query params:
+        format: 'pstats' (default, for pstats/snakeviz), 'text' for a
+            report, or 'json' for the metadata with the hottest functions
+        sort: Sort key of the text report ('cumulative', 'tottime', 'calls')
+    
+    Returns:
+        Profile file, text report or metadata
+    """
+    store = get_profile_store()
+    output_format = request.args.get('format', 'pstats')
+    
+    if output_format not in ('pstats', 'text', 'json'):
+        raise ValidationError("Invalid format. Allowed: pstats, text, json", details={'field': 'format'})
+    
+    metadata = store.get(profile_id)
+    stats_path = store.stats_path(profile_id)
+    if metadata is None or stats_path is None:
+        raise NotFoundError('Profile not found or pruned')
+    
+    if output_format == 'json':
+        return success_response(metadata)
+    
+    if output_format == 'text':
+        sort = request.args.get('sort', 'cumulative')
+        if sort not in REPORT_SORT_KEYS:
+            raise ValidationError(f"Invalid sort. Allowed: {', '.join(REPORT_SORT_KEYS)}", details={'field': 'sort'})
+        
+        return current_app.response_class(store.text_report(profile_id, sort=sort), mimetype='text/plain')
+    
+    return send_file(
+        stats_path,
+        mimetype='application/octet-stream',
+        as_attachment=True,
+        download_name=f'{profile_id}.prof'
+    )
@@ -8,6 +8,13 @@ from middleware.error_handler import ValidationError, NotFoundError
 from utils.validators import validate_file, sanitize_filename
 from database import db
 from models.upload_session import UploadSession
+from utils.chunk_storage import (
+    part_file_path, has_fixed_layout, expected_chunk_length,
+    preallocate_part_file, write_chunk_at, write_chunk_file, append_file,
+    parse_chunk_checksum, new_hasher, verify_checksum, missing_chunk_ranges,
+    contiguous_bytes, CHECKSUM_ALGORITHMS
+)
+from utils.incremental_csv import parse_dir_path, schedule_parse, get_parse_state, remove_parse_dir
 import os
 import uuid
 import logging
@@ -17,6 +24,19 @@ logger = logging.getLogger(__name__)
 uploads_bp = Blueprint('uploads', __name__)
 
 
+def parses_incrementally(session):
+    """Check if a session's CSV rows are parsed while chunks arrive"""
+    return bool(session.storage_path) and session.filename.lower().endswith('.csv')
+
+
+def upload_protocol_info():
+    """Get chunk protocol capabilities advertised to clients"""
+    return {
+        'max_parallel_streams': current_app.config.get('UPLOAD_MAX_PARALLEL_STREAMS', 4),
+        'checksum_algorithms': list(CHECKSUM_ALGORITHMS)
+    }
+
+
 @uploads_bp.route('/initiate', methods=['POST'])
 @require_auth
 def initiate_upload():
@@ -28,10 +48,15 @@ def initiate_upload():
         "filename": "string",
         "file_size": integer,
         "total_chunks": integer,
+        "chunk_size": integer (optional, default: CHUNK_SIZE),
         "content_type": "string" (optional),
         "metadata": object (optional)
     }
     
+    When every chunk but the last is chunk_size bytes, chunks are written
+    directly at their offset in one preallocated file. Other layouts fall
+    back to one file per chunk, merged on completion.
+    
     Returns:
         Upload session information
     """
@@ -49,6 +74,16 @@ def initiate_upload():
         max_mb = max_size / (1024 * 1024)
         raise ValidationError(f'File too large. Maximum size: {max_mb:.1f}MB')
     
+    chunk_size = data.get('chunk_size', current_app.config['CHUNK_SIZE'])
+    if not isinstance(chunk_size, int) or chunk_size <= 0:
+        raise ValidationError('chunk_size must be a positive integer', details={'field': 'chunk_size'})
+    
+    if 'chunk_size' in data and not has_fixed_layout(data['file_size'], data['total_chunks'], chunk_size):
+        raise ValidationError(
+            'file_size, total_chunks and chunk_size do not match',
+            details={'field': 'chunk_size'}
+        )
+    
     # Sanitize filename
     filename = sanitize_filename(data['filename'])
     
@@ -62,10 +97,18 @@ def initiate_upload():
         filename=filename,
         file_size=data['file_size'],
         total_chunks=data['total_chunks'],
+        chunk_size=chunk_size,
         content_type=data.get('content_type'),
         metadata=data.get('metadata', {})
     )
     
+    # Preallocate the part file that chunks are written into
+    if has_fixed_layout(session.file_size, session.total_chunks, chunk_size):
+        session.storage_path = part_file_path(current_app.config['UPLOAD_FOLDER'], session_id)
+        preallocate_part_file(session.storage_path, session.file_size)
+    else:
+        session.chunk_size = None  # Chunks of any size, merged on completion
+    
     db.session.add(session)
     db.session.commit()
     
@@ -73,7 +116,7 @@ def initiate_upload():
     
     return jsonify({
         'success': True,
-        'data': session.to_dict(),
+        'data': {**session.to_dict(), **upload_protocol_info()},
         'message': 'Upload session initiated'
     }), 201
 
@@ -84,12 +127,19 @@ def upload_chunk():
     """
     Upload file chunk
     
+    Chunks of a session may be sent concurrently (up to max_parallel_streams)
+    and in any order; a chunk failing its checksum is not recorded. Re-sends
+    of a chunk already recorded in the part file are ignored.
+    
     Headers:
         X-Upload-Id: Upload session ID
         X-Chunk-Number: Chunk number (1-indexed)
+        X-Chunk-Checksum: Optional "<algorithm>=<hex digest>" of the chunk,
+            verified while the chunk streams to disk
     
-    Form data:
-        chunk: File chunk data
+    Body:
+        Raw chunk bytes (Content-Type: application/octet-stream), or
+        form data with the chunk in the "chunk" field
     """
     # Get session ID and chunk number from headers
     session_id = request.headers.get('X-Upload-Id')
@@ -103,6 +153,9 @@ def upload_chunk():
     except ValueError:
         raise ValidationError('X-Chunk-Number must be an integer')
     
+    if chunk_number < 1:
+        raise ValidationError('X-Chunk-Number must be 1 or greater')
+    
     # Get upload session
     session = UploadSession.query.filter_by(session_id=session_id).first()
     
@@ -118,25 +171,78 @@ def upload_chunk():
     if session.is_expired():
         raise ValidationError('Upload session has expired')
     
-    # Get chunk file
-    if 'chunk' not in request.files:
-        raise ValidationError('No chunk file provided')
-    
-    chunk_file = request.files['chunk']
-    
-    # Create session directory if it doesn't exist
-    upload_folder = current_app.config['UPLOAD_FOLDER']
-    session_dir = os.path.join(upload_folder, session_id)
-    
-    if not os.path.exists(session_dir):
-        os.makedirs(session_dir)
+    expected_checksum = parse_chunk_checksum(request.headers.get('X-Chunk-Checksum'))
+    hasher = new_hasher(expected_checksum)
+    
+    # Get chunk data
+    if request.mimetype == 'application/octet-stream':
+        chunk_stream = request.stream
+    else:
+        if 'chunk' not in request.files:
+            raise ValidationError('No chunk file provided')
+        chunk_stream = request.files['chunk'].stream
+    
+    if session.storage_path:
+        # Write chunk directly at its offset in the part file
+        if session.total_chunks and chunk_number > session.total_chunks:
+            raise ValidationError(f'X-Chunk-Number must not exceed {session.total_chunks}')
+        
+        expected_length = expected_chunk_length(session.file_size, session.chunk_size, chunk_number)
+        
+        if session.has_chunk(chunk_number):
+            # Its bytes may already be parsed; never overwrite a recorded chunk
+            logger.info(f"Chunk {chunk_number} already recorded for session {session_id}, ignoring re-send")
+            uploaded_count = session.uploaded_chunk_count()
+            return jsonify({
+                'success': True,
+                'data': {
+                    'session_id': session_id,
+                    'chunk_number': chunk_number,
+                    'progress': session.get_progress(uploaded_count),
+                    'is_complete': session.is_complete(uploaded_count)
+                },
+                'message': f'Chunk {chunk_number} already uploaded'
+            })
+        
+        chunk_size = write_chunk_at(
+            session.storage_path,
+            chunk_stream,
+            offset=(chunk_number - 1) * session.chunk_size,
+            expected_length=expected_length,
+            hasher=hasher,
+            expected_checksum=expected_checksum
+        )
+    else:
+        # Create session directory if it doesn't exist
+        upload_folder = current_app.config['UPLOAD_FOLDER']
+        session_dir = os.path.join(upload_folder, session_id)
+        
+        if not os.path.exists(session_dir):
+            os.makedirs(session_dir)
+        
+        # Save chunk
+        chunk_path = os.path.join(session_dir, f'chunk_{chunk_number}')
+        chunk_size = write_chunk_file(chunk_path, chunk_stream, hasher=hasher)
     
-    # Save chunk
-    chunk_path = os.path.join(session_dir, f'chunk_{chunk_number}')
-    chunk_file.save(chunk_path)
+    checksum = verify_checksum(hasher, expected_checksum)
     
     # Mark chunk as uploaded
-    session.add_chunk(chunk_number)
+    session.add_chunk(chunk_number, size=chunk_size, checksum=checksum)
+    
+    if parses_incrementally(session):
+        # Parse rows that became contiguous in the background
+        uploaded = session.uploaded_chunk_numbers()
+        uploaded_count = len(uploaded)
+        available = contiguous_bytes(session.file_size, session.chunk_size, uploaded)
+        if available:
+            schedule_parse(
+                parse_dir_path(current_app.config['UPLOAD_FOLDER'], session_id),
+                session.storage_path,
+                available,
+                final=available == session.file_size
+            )
+    else:
+        uploaded_count = session.uploaded_chunk_count()
     
     logger.info(f"Chunk {chunk_number} uploaded for session {session_id}")
     
@@ -145,8 +251,8 @@ def upload_chunk():
         'data': {
             'session_id': session_id,
             'chunk_number': chunk_number,
-            'progress': session.get_progress(),
-            'is_complete': session.is_complete()
+            'progress': session.get_progress(uploaded_count),
+            'is_complete': session.is_complete(uploaded_count)
         },
         'message': f'Chunk {chunk_number} uploaded successfully'
     })
@@ -156,7 +262,10 @@ def upload_chunk():
 @require_auth
 def complete_upload():
     """
-    Complete chunked upload and merge chunks
+    Complete chunked upload
+    
+    Offset-written uploads are renamed into place; per-chunk uploads are
+    merged with a kernel-level copy.
     
     Request body:
     {
@@ -185,9 +294,10 @@ def complete_upload():
         raise AuthorizationError('Not authorized to complete this upload')
     
     # Check if all chunks are uploaded
-    if not session.is_complete():
+    uploaded_count = session.uploaded_chunk_count()
+    if not session.is_complete(uploaded_count):
         raise ValidationError(
-            f'Upload incomplete. {len(session.uploaded_chunks or [])}/{session.total_chunks} chunks uploaded'
+            f'Upload incomplete. {uploaded_count}/{session.total_chunks} chunks uploaded'
         )
     
     # Merge chunks
@@ -196,15 +306,20 @@ def complete_upload():
     final_path = os.path.join(upload_folder, f'{session_id}_{session.filename}')
     
     try:
-        with open(final_path, 'wb') as final_file:
-            for chunk_num in sorted(session.uploaded_chunks):
-                chunk_path = os.path.join(session_dir, f'chunk_{chunk_num}')
-                with open(chunk_path, 'rb') as chunk_file:
-                    final_file.write(chunk_file.read())
-        
-        # Clean up chunk files
-        import shutil
-        shutil.rmtree(session_dir)
+        if session.storage_path:
+            # All chunks are already in place
+            os.replace(session.storage_path, final_path)
+            
+            if parses_incrementally(session):
+                schedule_parse(parse_dir_path(upload_folder, session_id), final_path, session.file_size, final=True)
+        else:
+            with open(final_path, 'wb') as final_file:
+                for chunk_num in session.uploaded_chunk_numbers():
+                    append_file(final_file, os.path.join(session_dir, f'chunk_{chunk_num}'))
+            
+            # Clean up chunk files
+            import shutil
+            shutil.rmtree(session_dir)
         
         # Mark session as completed
         session.mark_completed(final_path)
@@ -228,6 +343,46 @@ def complete_upload():
         raise ValidationError(f'Failed to complete upload: {str(e)}')
 
 
+@uploads_bp.route('/<session_id>/missing', methods=['GET'])
+@require_auth
+def get_missing_chunks(session_id):
+    """
+    Get chunks still missing from an upload session
+    
+    Lets clients resume after a dropped connection by re-sending only the
+    missing chunks.
+    
+    Returns:
+        Missing chunk number ranges (inclusive) and protocol capabilities
+    """
+    session = UploadSession.query.filter_by(session_id=session_id).first()
+    
+    if not session:
+        raise NotFoundError('Upload session not found')
+    
+    # Verify ownership
+    if session.user_id != g.user_id:
+        from middleware.error_handler import AuthorizationError
+        raise AuthorizationError('Not authorized to view this upload')
+    
+    uploaded = session.uploaded_chunk_numbers()
+    missing_ranges = missing_chunk_ranges(session.total_chunks or 0, uploaded)
+    
+    return jsonify({
+        'success': True,
+        'data': {
+            'session_id': session_id,
+            'total_chunks': session.total_chunks,
+            'chunk_size': session.chunk_size,
+            'received_chunks': len(uploaded),
+            'missing_chunks': sum(last - first + 1 for first, last in missing_ranges),
+            'missing_ranges': missing_ranges,
+            'status': session.status,
+            **upload_protocol_info()
+        }
+    })
+
+
 @uploads_bp.route('/<session_id>', methods=['DELETE'])
 @require_auth
 def cancel_upload(session_id):
@@ -252,6 +407,11 @@ def cancel_upload(session_id):
         import shutil
         shutil.rmtree(session_dir)
     
+    if session.storage_path and session.status != 'completed' and os.path.exists(session.storage_path):
+        os.remove(session.storage_path)
+    
+    remove_parse_dir(parse_dir_path(upload_folder, session_id))
+    
     # Mark as failed
     session.mark_failed()
     
@@ -279,7 +439,17 @@ def get_upload_status(session_id):
         from middleware.error_handler import AuthorizationError
         raise AuthorizationError('Not authorized to view this upload')
     
+    data = session.to_dict()
+    
+    parse_state = get_parse_state(parse_dir_path(current_app.config['UPLOAD_FOLDER'], session_id))
+    if parse_state:
+        data['parse'] = {
+            'status': parse_state['status'],
+            'parsed_bytes': parse_state['parsed_bytes'],
+            'parsed_rows': parse_state['rows']
+        }
+    
     return jsonify({
         'success': True,
-        'data': session.to_dict()
+        'data': data
     })
@@ -0,0 +1,83 @@
+"""
+Unit tests for persisted analysis results
+Tests bulk-inserted result rows read back with keyset pagination
+"""
+import pandas as pd
+import pytest
+from flask import Flask
+from database import db
+from models.analysis_result import (
+    AnalysisResultSet, AnalysisResultRow, persist_result, get_persisted_result, purge_expired_results
+)
+from utils.pagination import paginate_query
+from utils.result_store import StoredResult
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///:memory:')
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+def stored_result(result_id='result-1'):
+    frame = pd.DataFrame({
+        'FieldOfficer': [f'Agent {i % 3}' for i in range(10)],
+        'ClientCount': range(10),
+        'TotalArrears': [i * 1.5 for i in range(10)]
+    })
+    return StoredResult(result_id, frame, {'total_clients': 10}, user_id=1, analysis='arrange-dues')
+
+
+class TestPersistedResults:
+    """Test result rows written in batches and paged by key"""
+
+    def test_pages_follow_result_order(self, app):
+        """Test every row is read back once, in position order"""
+        persist_result(stored_result(), batch_rows=3)
+        result_set = get_persisted_result('result-1')
+        assert result_set.total_count == 10
+        assert result_set.officer_column == 'FieldOfficer'
+
+        seen = []
+        cursor = None
+        while True:
+            items, cursor, has_more = paginate_query(result_set.rows(), 4, cursor, order_by_field='position')
+            seen.extend(row.to_dict()['ClientCount'] for row in items)
+            if not has_more:
+                break
+
+        assert seen == list(range(10))
+
+    def test_officer_filter(self, app):
+        """Test filtered pages only hold the officer's rows"""
+        persist_result(stored_result())
+        rows = get_persisted_result('result-1').rows('Agent 1')
+
+        items, _, has_more = paginate_query(rows, 10, order_by_field='position')
+
+        assert [row.to_dict()['ClientCount'] for row in items] == [1, 4, 7]
+        assert has_more is False
+
+    def test_expired_results_are_deleted(self, app):
+        """Test expired results are hidden and removed by the purge"""
+        persist_result(stored_result('old'), ttl_seconds=-1)
+        persist_result(stored_result('new'))
+        assert get_persisted_result('old') is None
+
+        assert purge_expired_results(force=True)
+        assert AnalysisResultSet.query.filter_by(result_id='old').count() == 0
+        assert AnalysisResultRow.query.filter_by(result_id='old').count() == 0
+        assert AnalysisResultRow.query.filter_by(result_id='new').count() == 10
+
+    def test_owner_is_optional(self, app):
+        """Test results without a known owner are still written"""
+        stored = stored_result()
+        stored.user_id = None
+
+        persist_result(stored)
+        assert get_persisted_result('result-1').user_id is None
@@ -0,0 +1,141 @@
+"""
+Unit tests for verified token caching and revocation
+"""
+import time
+from datetime import timedelta
+import jwt
+import pytest
+from flask import Flask
+from middleware.auth import AuthMiddleware, VerifiedTokenCache
+from middleware.error_handler import AuthenticationError
+
+
+def make_auth(path, check_interval=1.0):
+    app = Flask(__name__)
+    app.config.update(
+        JWT_SECRET_KEY='test-secret',
+        JWT_ACCESS_TOKEN_EXPIRES=timedelta(hours=1),
+        JWT_REFRESH_TOKEN_EXPIRES=timedelta(days=1),
+        AUTH_TOKEN_CACHE_SIZE=2,
+        AUTH_REVOCATION_STORE_PATH=str(path),
+        AUTH_REVOCATION_CHECK_INTERVAL=check_interval
+    )
+    return AuthMiddleware(app)
+
+
+@pytest.fixture
+def auth(tmp_path):
+    auth = make_auth(tmp_path / 'revocations.sqlite')
+    with auth.app.test_request_context('/', headers={'X-Device-Id': 'device-1'}):
+        yield auth
+
+
+def issued_earlier(auth, user_id, seconds=10):
+    """Access token issued some seconds ago"""
+    now = int(time.time())
+    payload = {'user_id': user_id, 'type': 'access', 'iat': now - seconds, 'exp': now + 3600, 'device_id': 'device-1'}
+    return jwt.encode(payload, auth.secret_key, algorithm=auth.algorithm)
+
+
+class TestVerifiedTokenCache:
+    """Test cache expiry and eviction"""
+
+    def test_expired_entries_are_dropped(self):
+        """Test entries are not returned after the token's exp"""
+        cache = VerifiedTokenCache()
+        cache.put('a', {'user_id': 1, 'exp': time.time() - 1})
+        cache.put('b', {'user_id': 1, 'exp': time.time() + 60})
+        assert cache.get('a') is None
+        assert cache.get('b')['user_id'] == 1
+
+    def test_least_recently_used_evicted(self):
+        """Test the cache stays within max_entries"""
+        cache = VerifiedTokenCache(max_entries=2)
+        exp = time.time() + 60
+        cache.put('a', {'exp': exp})
+        cache.put('b', {'exp': exp})
+        cache.get('a')
+        cache.put('c', {'exp': exp})
+        assert cache.get('b') is None
+        assert cache.get('a') is not None
+        assert len(cache) == 2
+
+
+class TestVerifyToken:
+    """Test cached verification in AuthMiddleware"""
+
+    def test_signature_checked_once(self, auth, monkeypatch):
+        """Test repeat verification of a token is served from the cache"""
+        token = auth.generate_access_token(1, 'device-1')
+        calls = []
+        decode = jwt.decode
+        monkeypatch.setattr(jwt, 'decode', lambda *args, **kwargs: calls.append(1) or decode(*args, **kwargs))
+
+        for _ in range(3):
+            assert auth.verify_token(token)['user_id'] == 1
+        assert len(calls) == 1
+
+    def test_claims_checked_on_cache_hit(self, auth):
+        """Test token type is still checked for cached tokens"""
+        token = auth.generate_access_token(1, 'device-1')
+        auth.verify_token(token)
+        with pytest.raises(AuthenticationError):
+            auth.verify_token(token, 'refresh')
+
+    def test_revoked_token_rejected(self, auth):
+        """Test revoking one token leaves the user's other tokens valid"""
+        token = auth.generate_access_token(1, 'device-1')
+        other = auth.generate_refresh_token(1, 'device-1')
+        auth.verify_token(token)
+        auth.revoke_token(token)
+        with pytest.raises(AuthenticationError, match='revoked'):
+            auth.verify_token(token)
+        assert auth.verify_token(other, 'refresh')['user_id'] == 1
+
+    def test_user_revocation_and_hooks(self, auth):
+        """Test user-wide revocation and registered revocation hooks"""
+        token = issued_earlier(auth, 1)
+        auth.verify_token(token)
+        auth.revoke_user_tokens(1)
+        with pytest.raises(AuthenticationError, match='revoked'):
+            auth.verify_token(token)
+        # A login right after the revocation (same iat second) is not affected
+        assert auth.verify_token(auth.generate_access_token(1, 'device-1'))['user_id'] == 1
+
+        token = auth.generate_access_token(2, 'device-1')
+        auth.add_revocation_check(lambda payload, digest: payload['user_id'] == 2)
+        with pytest.raises(AuthenticationError, match='revoked'):
+            auth.verify_token(token)
+
+    def test_revocations_read_once_per_generation(self, auth, monkeypatch):
+        """Test a cached token is not looked up again until revocations change"""
+        token = auth.generate_access_token(1, 'device-1')
+        lookups = []
+        get_values = auth.revocations.get_values
+        monkeypatch.setattr(
+            auth.revocations, 'get_values', lambda keys: lookups.append(keys) or get_values(keys)
+        )
+
+        for _ in range(3):
+            auth.verify_token(token)
+        assert len(lookups) == 1
+
+        auth.revoke_user_tokens(2)
+        auth.verify_token(token)
+        assert len(lookups) == 2
+
+    def test_revocation_seen_by_other_workers(self, auth, tmp_path):
+        """Test tokens revoked through one worker are rejected by another within its check interval"""
+        other = make_auth(tmp_path / 'revocations.sqlite', check_interval=0.05)
+        token = auth.generate_access_token(1, 'device-1')
+        earlier = issued_earlier(auth, 2)
+        other.verify_token(token)
+        other.verify_token(earlier)
+
+        auth.revoke_token(token)
+        auth.revoke_user_tokens(2)
+        time.sleep(0.06)
+
+        for revoked in (token, earlier):
+            with pytest.raises(AuthenticationError, match='revoked'):
+                other.verify_token(revoked)
@@ -0,0 +1,129 @@
+"""
+Unit tests for chunked upload storage
+Tests chunks written at their offsets in the preallocated part file
+"""
+import hashlib
+import io
+import os
+import threading
+import pytest
+from middleware.error_handler import ValidationError
+from utils.chunk_storage import (
+    preallocate_part_file, write_chunk_at, expected_chunk_length, contiguous_bytes, missing_chunk_ranges,
+    new_hasher
+)
+
+CHUNK_SIZE = 4
+DATA = b'0123456789abcdefghi'  # Five chunks, the last one 3 bytes
+
+
+@pytest.fixture
+def part_file(tmp_path):
+    path = str(tmp_path / 'session.part')
+    preallocate_part_file(path, len(DATA))
+    return path
+
+
+def write(path, chunk_number, data=None, checksum=None):
+    offset = (chunk_number - 1) * CHUNK_SIZE
+    if data is None:
+        data = DATA[offset:offset + CHUNK_SIZE]
+    return write_chunk_at(
+        path, io.BytesIO(data), offset, expected_chunk_length(len(DATA), CHUNK_SIZE, chunk_number),
+        hasher=new_hasher(checksum), expected_checksum=checksum
+    )
+
+
+def read(path):
+    with open(path, 'rb') as part_file:
+        return part_file.read()
+
+
+class TestWriteChunkAt:
+    """Test offset writes into the part file"""
+
+    def test_out_of_order_chunks_assemble(self, part_file):
+        """Test chunks written in any order and concurrently give the original file"""
+        assert os.path.getsize(part_file) == len(DATA)
+
+        write(part_file, 5)
+        write(part_file, 2)
+        threads = [threading.Thread(target=write, args=(part_file, number)) for number in (4, 1, 3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert read(part_file) == DATA
+
+    def test_retried_chunk_overwrites_its_range(self, part_file):
+        """Test a chunk sent twice replaces its own bytes and nothing else"""
+        for number in range(1, 6):
+            write(part_file, number)
+        write(part_file, 3, b'XXXX')
+        write(part_file, 3)
+
+        assert read(part_file) == DATA
+
+    def test_oversized_chunk_does_not_overlap_next(self, part_file):
+        """Test a chunk longer than its slot is rejected without touching the next chunk"""
+        write(part_file, 3)
+        with pytest.raises(ValidationError, match='too large'):
+            write(part_file, 2, b'ZZZZZZ')
+        with pytest.raises(ValidationError, match='mismatch'):
+            write(part_file, 4, b'jk')
+
+        assert read(part_file)[8:12] == DATA[8:12]
+
+    def test_bad_checksum_leaves_chunk_in_place(self, part_file):
+        """Test a chunk failing its checksum is rejected before any byte is written"""
+        write(part_file, 3)
+        with pytest.raises(ValidationError, match='checksum'):
+            write(part_file, 3, b'XXXX', checksum=('sha256', hashlib.sha256(DATA[8:12]).hexdigest()))
+
+        assert read(part_file)[8:12] == DATA[8:12]
+
+
+class TestUploadChunkRoute:
+    """Test chunks sent to the upload endpoint"""
+
+    def test_recorded_chunk_not_overwritten(self, app, client, tmp_path):
+        """Test a re-send of a recorded chunk is ignored instead of rewriting its bytes"""
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        response = client.post('/api/v1/uploads/initiate', json={
+            'filename': 'loans.csv', 'file_size': len(DATA), 'total_chunks': 5, 'chunk_size': CHUNK_SIZE
+        })
+        session_id = response.json['data']['session_id']
+
+        def send(chunk_number, data):
+            return client.post(
+                '/api/v1/uploads/chunk', data=data, content_type='application/octet-stream',
+                headers={'X-Upload-Id': session_id, 'X-Chunk-Number': str(chunk_number)}
+            )
+
+        for number in range(1, 6):
+            offset = (number - 1) * CHUNK_SIZE
+            assert send(number, DATA[offset:offset + CHUNK_SIZE]).status_code == 200
+
+        response = send(3, b'XXXX')
+        assert response.status_code == 200
+        assert response.json['message'] == 'Chunk 3 already uploaded'
+
+        response = client.post('/api/v1/uploads/complete', json={'session_id': session_id})
+        assert read(response.json['data']['storage_path']) == DATA
+
+
+class TestChunkLayout:
+    """Test progress derived from out-of-order chunk numbers"""
+
+    def test_gaps_reported_as_ranges(self):
+        """Test missing chunks are reported as inclusive ranges"""
+        assert missing_chunk_ranges(5, [1, 2, 4]) == [[3, 3], [5, 5]]
+        assert missing_chunk_ranges(5, [3]) == [[1, 2], [4, 5]]
+        assert missing_chunk_ranges(5, [1, 2, 3, 4, 5]) == []
+
+    def test_contiguous_prefix(self):
+        """Test only the gap-free prefix of received chunks counts"""
+        assert contiguous_bytes(len(DATA), CHUNK_SIZE, [1, 2, 4]) == 8
+        assert contiguous_bytes(len(DATA), CHUNK_SIZE, [1, 2, 3, 4, 5]) == len(DATA)
+        assert contiguous_bytes(len(DATA), CHUNK_SIZE, [2, 3]) == 0
@@ -0,0 +1,61 @@
+"""
+Unit tests for adaptive response compression
+"""
+import gzip
+from flask import Flask, jsonify
+from middleware.compression import CompressionMiddleware, choose_encoding, compression_level
+
+
+def make_app():
+    app = Flask(__name__)
+    app.config.update(
+        COMPRESS_MIMETYPES=['application/json'],
+        COMPRESS_MIN_SIZE=500,
+        COMPRESS_ALGORITHM=['gzip'],
+        COMPRESS_HIGH_LOAD=1.0
+    )
+    CompressionMiddleware(app)
+
+    @app.route('/rows')
+    def rows():
+        response = jsonify([{'FieldOfficer': f'Officer {i}', 'ClientCount': i} for i in range(200)])
+        response.headers['ETag'] = '"abc"'
+        return response
+
+    return app
+
+
+class TestAdaptiveCompression:
+    """Test encoding negotiation, level tiers and the middleware"""
+
+    def test_choose_encoding(self):
+        """Test client quality factors and server preference"""
+        enabled = ('br', 'gzip')
+
+        assert choose_encoding('gzip, br', enabled) == 'br'
+        assert choose_encoding('gzip;q=1.0, br;q=0.5', enabled) == 'gzip'
+        assert choose_encoding('br;q=0, *', enabled) == 'gzip'
+        assert choose_encoding('identity', enabled) is None
+
+    def test_levels_drop_with_size_and_load(self):
+        """Test larger bodies and high load get cheaper levels"""
+        with make_app().app_context():
+            small = compression_level('br', 10 * 1024, load=0)
+            large = compression_level('br', 20 * 1024 * 1024, load=0)
+            loaded = compression_level('br', 10 * 1024, load=4)
+
+        assert small > large > loaded == 1
+
+    def test_middleware_compresses_and_times(self):
+        """Test gzip body, encoded ETag and Server-Timing header"""
+        client = make_app().test_client()
+
+        response = client.get('/rows', headers={'Accept-Encoding': 'gzip'})
+
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert response.headers['ETag'] == '"abc:gzip"'
+        assert response.headers['Server-Timing'].startswith('compress;dur=')
+        assert gzip.decompress(response.data).startswith(b'[')
+
+        plain = client.get('/rows')
+        assert 'Content-Encoding' not in plain.headers
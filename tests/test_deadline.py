@@ -0,0 +1,91 @@
+"""
+Unit tests for request deadlines and analyses run until them
+"""
+import time
+import pandas as pd
+import pytest
+from utils.deadline import Deadline, DeadlineExceeded
+from utils.jobs import run_until_deadline
+from utils.loan_analyses import LoanFrame, mtd_unpaid_dues
+from utils.progress import ProgressTracker, StageProgress
+
+
+class TestDeadline:
+    """Test deadline checks in processors"""
+
+    def test_check_raises_once_spent(self):
+        """Test checks pass within the budget and raise after it"""
+        deadline = Deadline(0.02)
+        deadline.check('parse')
+
+        time.sleep(0.03)
+        with pytest.raises(DeadlineExceeded) as error:
+            deadline.check('compute')
+        assert error.value.stage == 'compute'
+        assert Deadline(None).remaining() is None
+
+    def test_stage_hooks_stop_between_blocks(self):
+        """Test stage hooks without a tracker still enforce the deadline"""
+        hooks = StageProgress(None, [], block_rows=10, deadline=Deadline(0.02))
+        hooks.stage('bucket')
+        processed = []
+
+        with pytest.raises(DeadlineExceeded):
+            for block in hooks.blocks(pd.Series(range(100))):
+                processed.append(len(block))
+                time.sleep(0.01)
+
+        assert 0 < len(processed) < 10
+
+    def test_row_reports_stop_with_tracker(self):
+        """Test row reports check the deadline when a tracker is attached too"""
+        tracker = ProgressTracker(100)
+        hooks = StageProgress(tracker, [('arrange', 1)], deadline=Deadline(0.02))
+        hooks.stage('arrange', rows_total=100)
+        hooks.rows(10)
+
+        time.sleep(0.03)
+        with pytest.raises(DeadlineExceeded):
+            hooks.rows(20)
+        assert tracker.metadata['rows_processed'] == 10
+
+    def test_analysis_stops_in_row_wise_stage(self):
+        """Test an analysis past its deadline stops before its row-wise stage"""
+        loans = LoanFrame(pd.DataFrame({
+            'FullNames': ['A', 'B'],
+            'Arrears': [10, 50],
+            'LoanBalance': [100, 100],
+            'FieldOfficer': ['O1', 'O2']
+        }))
+        # Columns already converted, so only the stage checks remain
+        loans.numeric('Arrears')
+        loans.numeric('LoanBalance')
+        loans.deadline = Deadline(0)
+
+        with pytest.raises(DeadlineExceeded) as error:
+            mtd_unpaid_dues(loans)
+        assert error.value.stage == 'risk'
+
+
+class TestRunUntilDeadline:
+    """Test waiting for analyses until the deadline"""
+
+    def test_unfinished_analyses_are_pending(self):
+        """Test finished results are returned and slow ones left pending"""
+        results, pending = run_until_deadline(
+            {'fast': lambda: 1, 'slow': lambda: time.sleep(0.2) or 2},
+            Deadline(0.05)
+        )
+
+        assert results == {'fast': 1}
+        assert list(pending) == ['slow']
+        assert pending['slow'].result() == 2
+
+    def test_deadline_stop_counts_as_pending(self):
+        """Test an analysis stopped by its deadline check is not an error"""
+        deadline = Deadline(0)
+
+        results, pending = run_until_deadline({'stopped': lambda: deadline.check('compute')}, deadline)
+
+        assert results == {}
+        assert list(pending) == ['stopped']
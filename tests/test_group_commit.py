@@ -0,0 +1,38 @@
+"""
+Unit tests for group-committed writes
+"""
+import threading
+import time
+import pytest
+from utils.group_commit import GroupCommitter
+
+
+class TestGroupCommitter:
+    """Test batching of concurrent writes"""
+
+    def test_concurrent_writes_are_batched(self):
+        """Test every item is written once, in fewer transactions than writers"""
+        batches = []
+
+        def write_batch(items):
+            time.sleep(0.01)  # Simulate commit latency
+            batches.append(list(items))
+
+        committer = GroupCommitter(write_batch)
+        threads = [threading.Thread(target=committer.submit, args=(i,)) for i in range(50)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        written = [item for batch in batches for item in batch]
+        assert sorted(written) == list(range(50))
+        assert len(batches) < 50
+
+    def test_batch_error_is_raised_to_caller(self):
+        """Test a failed batch raises in the submitting caller"""
+        def write_batch(items):
+            raise RuntimeError('database is locked')
+
+        with pytest.raises(RuntimeError):
+            GroupCommitter(write_batch).submit('chunk')
@@ -0,0 +1,145 @@
+"""
+Unit tests for upload ingestion
+Tests multipart files spooled in memory and parsed from the spool, and
+completed upload sessions used as analysis input
+"""
+import io
+from datetime import datetime
+import pytest
+from flask import Flask, g, jsonify, request
+from database import db
+from middleware.error_handler import AuthorizationError, NotFoundError, ValidationError
+from models.upload_session import UploadSession
+from utils.ingest import SessionUploadSource, SpoolingRequest, UploadSource, get_upload_source, read_upload_frame
+
+
+def make_app(tmp_path):
+    app = Flask(__name__)
+    app.request_class = SpoolingRequest
+    app.config.update(UPLOAD_SPOOL_MAX_MEMORY=1024, UPLOAD_FOLDER=str(tmp_path))
+
+    @app.route('/upload', methods=['POST'])
+    def upload():
+        file = request.files['file']
+        frame = read_upload_frame(file, usecols=['Name', 'Arrears'])
+        return jsonify({
+            'on_disk': file.stream._rolled,
+            'columns': list(frame.columns),
+            'rows': len(frame),
+            'total': float(frame['Arrears'].sum())
+        })
+
+    return app
+
+
+def csv_upload(rows):
+    lines = ['Name,Arrears,Notes'] + [f'Client {i},{i},note {i}' for i in range(rows)]
+    return io.BytesIO('\n'.join(lines).encode())
+
+
+class TestSpoolingRequest:
+    """Test file parts kept in memory below UPLOAD_SPOOL_MAX_MEMORY"""
+
+    def test_small_upload_parsed_from_memory(self, tmp_path):
+        """Test a small part stays in memory and only requested columns are parsed"""
+        response = make_app(tmp_path).test_client().post(
+            '/upload', data={'file': (csv_upload(10), 'loans.csv')}
+        )
+
+        assert response.json == {'on_disk': False, 'columns': ['Name', 'Arrears'], 'rows': 10, 'total': 45.0}
+        assert list(tmp_path.iterdir()) == []
+
+    def test_large_upload_rolls_over(self, tmp_path):
+        """Test a part beyond the threshold rolls over to a temp file and parses the same"""
+        response = make_app(tmp_path).test_client().post(
+            '/upload', data={'file': (csv_upload(500), 'loans.csv')}
+        )
+
+        assert response.json['on_disk'] is True
+        assert response.json['rows'] == 500
+        assert response.json['total'] == float(sum(range(500)))
+
+
+@pytest.fixture
+def session_app(tmp_path):
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI='sqlite:///:memory:',
+        UPLOAD_FOLDER=str(tmp_path),
+        MAX_CONTENT_LENGTH=1024 * 1024
+    )
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+def add_session(tmp_path, session_id, user_id=1, status='completed', filename='loans.csv'):
+    path = tmp_path / f'{session_id}.part'
+    path.write_bytes(csv_upload(4).getvalue())
+    session = UploadSession(session_id, user_id, filename, file_size=path.stat().st_size, total_chunks=1)
+    session.status = status
+    session.storage_path = str(path)
+    session.completed_at = datetime.utcnow() if status == 'completed' else None
+    db.session.add(session)
+    db.session.commit()
+    return session
+
+
+def upload_source(app, session_id, **kwargs):
+    with app.test_request_context(f'/?upload_session_id={session_id}'):
+        g.user_id = 1
+        return get_upload_source(**kwargs)
+
+
+class TestSessionUploadSource:
+    """Test completed upload sessions read in place"""
+
+    def test_completed_session_read_in_place(self, session_app, tmp_path):
+        """Test an own completed session is parsed from its file"""
+        add_session(tmp_path, 'own')
+
+        source = upload_source(session_app, 'own', allowed_extensions=['csv'])
+
+        assert isinstance(source, SessionUploadSource)
+        frame = source.read_frame(usecols=['Name', 'Arrears'])
+        assert list(frame.columns) == ['Name', 'Arrears']
+        assert frame['Arrears'].tolist() == [0, 1, 2, 3]
+        assert source.fingerprint().startswith('upload:own:')
+
+    def test_incomplete_session_rejected(self, session_app, tmp_path):
+        """Test a session still receiving chunks cannot be used"""
+        add_session(tmp_path, 'uploading', status='uploading')
+
+        with pytest.raises(ValidationError, match='not completed'):
+            upload_source(session_app, 'uploading')
+
+    def test_foreign_or_unknown_session_rejected(self, session_app, tmp_path):
+        """Test sessions of other users and unknown sessions cannot be used"""
+        add_session(tmp_path, 'foreign', user_id=2)
+
+        with pytest.raises(AuthorizationError):
+            upload_source(session_app, 'foreign')
+        with pytest.raises(NotFoundError):
+            upload_source(session_app, 'missing')
+
+    def test_extension_checked(self, session_app, tmp_path):
+        """Test the session file must have an allowed extension"""
+        add_session(tmp_path, 'text', filename='loans.txt')
+
+        with pytest.raises(ValidationError, match='Invalid file type'):
+            upload_source(session_app, 'text', allowed_extensions=['csv', 'xlsx'])
+
+
+class TestUploadSource:
+    """Test the interface analysis input files implement"""
+
+    def test_sources_must_implement_interface(self):
+        """Test a source missing part of the UploadSource interface cannot be created"""
+        class FingerprintOnly(UploadSource):
+            def fingerprint(self):
+                return 'static'
+
+        with pytest.raises(TypeError, match='read_bytes'):
+            FingerprintOnly()
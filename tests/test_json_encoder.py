@@ -0,0 +1,74 @@
+"""
+Unit tests for the column-wise DataFrame JSON encoder
+"""
+import json
+import numpy as np
+import pandas as pd
+from utils.json_encoder import encode_frame_records, dumps
+
+
+class TestEncodeFrameRecords:
+    """Test DataFrame to JSON records encoding"""
+
+    def test_matches_records_output(self):
+        """Test output equals the to_dict(orient='records') representation"""
+        df = pd.DataFrame({
+            'FullNames': ['John Doe', 'Jane "JJ" Smith'],
+            'Arrears Amount': [5000.5, 3000.0],
+            'DaysInArrears': [15, 10],
+            'Active': [True, False]
+        })
+
+        assert json.loads(encode_frame_records(df)) == df.to_dict(orient='records')
+
+    def test_missing_values_become_null(self):
+        """Test NaN, NaT, infinity and nullable NA encode as null"""
+        df = pd.DataFrame({
+            'Arrears': [np.nan, np.inf],
+            'ClearedOn': pd.to_datetime([None, '2024-03-01']),
+            'LoanCount': pd.array([None, 2], dtype='Int64'),
+            'SalesRep': [None, 'Agent A']
+        })
+
+        records = json.loads(encode_frame_records(df))
+
+        assert records[0] == {'Arrears': None, 'ClearedOn': None, 'LoanCount': None, 'SalesRep': None}
+        assert records[1] == {'Arrears': None, 'ClearedOn': '2024-03-01T00:00:00', 'LoanCount': 2, 'SalesRep': 'Agent A'}
+
+    def test_datetimes_match_isoformat(self):
+        """Test datetimes are written like Timestamp.isoformat, whatever the column's precision"""
+        stamps = pd.to_datetime(
+            ['2024-03-01', '2024-03-01 08:30:15.5', '2024-03-01 08:30:15.000000001'], format='ISO8601'
+        )
+        df = pd.DataFrame({'ClearedOn': stamps})
+
+        records = json.loads(encode_frame_records(df))
+
+        assert [record['ClearedOn'] for record in records] == [stamp.isoformat() for stamp in stamps]
+
+    def test_numpy_floats_in_object_column(self):
+        """Test numpy floats mixed into an object column encode as plain numbers"""
+        df = pd.DataFrame({'Collected': pd.Series([np.float64(1.5), 'n/a', np.float32(2.5)], dtype=object)})
+
+        assert encode_frame_records(df) == '[{"Collected":1.5},{"Collected":"n/a"},{"Collected":2.5}]'
+
+    def test_empty_frame(self):
+        """Test empty frame encodes as an empty array"""
+        assert encode_frame_records(pd.DataFrame({'a': []})) == '[]'
+
+
+class TestDumps:
+    """Test response payload serialization"""
+
+    def test_embedded_frame_and_numpy_scalars(self):
+        """Test frames are spliced in and numpy scalars are converted"""
+        df = pd.DataFrame({'SalesRep': ['Agent A'], 'Collected': [1500.0]})
+        payload = {
+            'data': df,
+            'summary': {'total': np.float64(1500.0), 'count': np.int64(1), 'average': float('nan')}
+        }
+
+        decoded = json.loads(dumps(payload))
+
+        assert decoded['data'] == [{'SalesRep': 'Agent A', 'Collected': 1500.0}]
+        assert decoded['summary'] == {'total': 1500.0, 'count': 1, 'average': None}
@@ -3,6 +3,7 @@ Integration tests for loan processing endpoints
 Tests all legacy processors with the new API routes
 """
 import pytest
+import gzip
 import io
 import os
 import json
@@ -12,20 +13,21 @@ from app import create_app
 from database import db
 from models.user import User
 from models.device import Device
+from utils.progress import create_progress_tracker, get_progress_publisher, waiter_slots
+from utils.result_store import remove_result
 
 
 @pytest.fixture
 def app():
     """Create and configure test Flask app"""
     app = create_app('testing')
+    app.config['AUTH_BYPASS'] = False
     
     with app.app_context():
         db.create_all()
         
         # Create test user
-        user = User(username='testuser', email='test@example.com')
-        user.set_password('testpass123')
-        user.add_role('user')
+        user = User(username='testuser', email='test@example.com', password='testpass123')
         db.session.add(user)
         db.session.commit()
         
@@ -51,11 +53,12 @@ def auth_headers(client):
     })
     
     assert response.status_code == 200
-    token = response.json['access_token']
+    token = response.json['data']['access_token']
     
+    # No Content-Type: the test client sets multipart/form-data for uploads
     return {
         'Authorization': f'Bearer {token}',
-        'Content-Type': 'application/json'
+        'X-Device-Id': 'test-device-001'
     }
 
 
@@ -71,6 +74,23 @@ Alice Brown,0745678901,2000,5,30000,Agent B"""
     return io.BytesIO(csv_content.encode('utf-8'))
 
 
+@pytest.fixture
+def arrears_files():
+    """Create SOD and current arrears files for arrears collection"""
+    sod_content = """LoanId,SalesRep,ArrearsAmount,DaysInArrears
+L1,Agent A,5000,10
+L2,Agent A,3000,20
+L3,Agent B,8000,40
+L4,Agent B,2000,5"""
+    current_content = """LoanId,ArrearsAmount
+L1,1000
+L2,3000
+L3,2000
+L4,0"""
+    
+    return io.BytesIO(sod_content.encode('utf-8')), io.BytesIO(current_content.encode('utf-8'))
+
+
 @pytest.fixture
 def sample_excel_file():
     """Create sample Excel file for testing"""
@@ -96,35 +116,35 @@ def sample_excel_file():
 class TestDormantArrangementEndpoint:
     """Test dormant arrangement processing"""
     
-    def test_dormant_arrangement_success(self, client, auth_headers, sample_csv_file):
+    def test_dormant_arrangement_success(self, client, auth_headers, sample_excel_file):
         """Test successful dormant arrangement processing"""
         response = client.post(
             '/api/v1/loans/dormant-arrangement',
             headers=auth_headers,
-            data={'file': (sample_csv_file, 'test.csv')}
+            data={'file': (sample_excel_file, 'test.xlsx')}
         )
         
         assert response.status_code == 200
         data = response.json
         
-        assert data['status'] == 'success'
-        assert 'data' in data
-        assert 'pagination' in data
-        assert isinstance(data['data'], list)
+        assert data['success'] is True
+        assert 'pagination' in data['data']
+        assert isinstance(data['data']['data'], list)
+        assert data['data']['summary']['total_records'] == 3
     
-    def test_dormant_arrangement_pagination(self, client, auth_headers, sample_csv_file):
+    def test_dormant_arrangement_pagination(self, client, auth_headers, sample_excel_file):
         """Test pagination in dormant arrangement"""
         response = client.post(
             '/api/v1/loans/dormant-arrangement?limit=2',
             headers=auth_headers,
-            data={'file': (sample_csv_file, 'test.csv')}
+            data={'file': (sample_excel_file, 'test.xlsx')}
         )
         
         assert response.status_code == 200
-        data = response.json
+        data = response.json['data']
         
         assert len(data['data']) <= 2
-        assert 'next_cursor' in data['pagination']
+        assert data['pagination']['next_cursor']
     
     def test_dormant_arrangement_no_file(self, client, auth_headers):
         """Test error when no file is provided"""
@@ -152,30 +172,28 @@ class TestDormantArrangementEndpoint:
 class TestArrearsCollectedEndpoint:
     """Test arrears collected processing"""
     
-    def test_arrears_collected_success(self, client, auth_headers, sample_csv_file):
+    def test_arrears_collected_success(self, client, auth_headers, arrears_files):
         """Test successful arrears collection processing"""
-        sod_file = sample_csv_file
-        cur_file = io.BytesIO(sample_csv_file.getvalue())
+        sod_file, cur_file = arrears_files
         
         response = client.post(
             '/api/v1/loans/arrears-collected',
             headers=auth_headers,
             data={
                 'sod_file': (sod_file, 'sod.csv'),
-                'cur_file': (cur_file, 'current.csv')
+                'current_file': (cur_file, 'current.csv')
             }
         )
         
         assert response.status_code == 200
         data = response.json
         
-        assert data['status'] == 'success'
-        assert 'summary' in data
+        assert data['success'] is True
+        assert data['data']['summary']['total_collected'] == 12000
     
-    def test_arrears_collected_with_targets(self, client, auth_headers, sample_csv_file):
+    def test_arrears_collected_with_targets(self, client, auth_headers, arrears_files):
         """Test arrears collection with officer targets"""
-        sod_file = sample_csv_file
-        cur_file = io.BytesIO(sample_csv_file.getvalue())
+        sod_file, current_file = arrears_files
         
         targets = {
             'Agent A': 10000,
@@ -187,7 +205,7 @@ class TestArrearsCollectedEndpoint:
             headers=auth_headers,
             data={
                 'sod_file': (sod_file, 'sod.csv'),
-                'cur_file': (cur_file, 'current.csv'),
+                'current_file': (current_file, 'current.csv'),
                 'officer_targets': json.dumps(targets)
             }
         )
@@ -195,14 +213,36 @@ class TestArrearsCollectedEndpoint:
         assert response.status_code == 200
         data = response.json
         
-        assert 'officer_targets' in data
+        officer_targets = data['data']['summary']['officer_targets']
+        assert officer_targets['Agent A']['target'] == 10000
+        assert officer_targets['Agent B']['collected'] == 8000
+        assert officer_targets['Agent B']['remaining'] == 7000
+    
+    def test_arrears_collected_invalid_targets(self, client, auth_headers, arrears_files):
+        """Test officer targets must be a JSON object"""
+        sod_file, current_file = arrears_files
+        
+        response = client.post(
+            '/api/v1/loans/arrears-collected',
+            headers=auth_headers,
+            data={
+                'sod_file': (sod_file, 'sod.csv'),
+                'current_file': (current_file, 'current.csv'),
+                'officer_targets': '[10000]'
+            }
+        )
+        
+        assert response.status_code == 400
+        assert response.json['error']['details']['field'] == 'officer_targets'
     
-    def test_arrears_collected_missing_file(self, client, auth_headers, sample_csv_file):
+    def test_arrears_collected_missing_file(self, client, auth_headers, arrears_files):
         """Test error when one file is missing"""
+        sod_file, _ = arrears_files
+        
         response = client.post(
             '/api/v1/loans/arrears-collected',
             headers=auth_headers,
-            data={'sod_file': (sample_csv_file, 'sod.csv')}
+            data={'sod_file': (sod_file, 'sod.csv')}
         )
         
         assert response.status_code == 400
@@ -211,29 +251,35 @@ class TestArrearsCollectedEndpoint:
 class TestArrangeDuesEndpoint:
     """Test arrange dues processing"""
     
-    def test_arrange_dues_success(self, client, auth_headers, sample_csv_file):
+    def test_arrange_dues_success(self, client, auth_headers):
         """Test successful dues arrangement"""
+        dues_file = io.BytesIO(
+            b"FullNames,FieldOfficer,Amount Due,Arrears\n"
+            b"John Doe,Officer A,1000,200\nJane Smith,Officer A,500,0\nBob Johnson,Officer B,800,100"
+        )
+        
         response = client.post(
             '/api/v1/loans/arrange-dues',
             headers=auth_headers,
-            data={'file': (sample_csv_file, 'test.csv')}
+            data={'file': (dues_file, 'dues.csv')}
         )
         
         assert response.status_code == 200
         data = response.json
         
-        assert data['status'] == 'success'
-        assert 'summary' in data
+        assert data['success'] is True
+        assert data['data']['summary']['officer_count'] == 2
+        assert data['data']['summary']['total_amount_due'] == 2300
     
     def test_arrange_dues_excel_format(self, client, auth_headers, sample_excel_file):
-        """Test with Excel file"""
+        """Test Excel files are rejected (arrange-dues takes CSV only)"""
         response = client.post(
             '/api/v1/loans/arrange-dues',
             headers=auth_headers,
             data={'file': (sample_excel_file, 'test.xlsx')}
         )
         
-        assert response.status_code == 200
+        assert response.status_code == 400
 
 
 class TestArrangeArrearsEndpoint:
@@ -250,15 +296,18 @@ class TestArrangeArrearsEndpoint:
         assert response.status_code == 200
         data = response.json
         
-        assert data['status'] == 'success'
-        assert 'metadata' in data
+        assert data['success'] is True
+        assert data['data']['summary']['total_clients'] == 4
+        assert data['data']['summary']['sales_reps'] == 2
 
 
 class TestMTDParametersEndpoint:
     """Test MTD parameters processing"""
     
-    def test_mtd_parameters_success(self, client, auth_headers):
+    def test_mtd_parameters_success(self, app, client, auth_headers, tmp_path):
         """Test successful MTD parameters analysis"""
+        app.static_folder = str(tmp_path)
+        
         # Create sample files for MTD
         income_csv = io.BytesIO(b"Branch,Income (KES)\nBranch A,100000\nBranch B,150000")
         cr_csv = io.BytesIO(b"Branch,CR %,Collected,Uncollected\nBranch A,85,85000,15000\nBranch B,90,135000,15000")
@@ -277,8 +326,13 @@ class TestMTDParametersEndpoint:
         assert response.status_code == 200
         data = response.json
         
-        assert data['status'] == 'success'
-        assert 'summary' in data
+        assert data['success'] is True
+        assert data['data']['summary']['total_branches'] == 2
+        assert (tmp_path / data['data']['download_url'].split('/static/')[1]).exists()
+        
+        # Report building is reported as its own stage
+        stages = [entry.split(';')[0] for entry in response.headers['Server-Timing'].split(', ')]
+        assert {'parse', 'compute', 'excel'} <= set(stages)
 
 
 class TestMTDUnpaidDuesEndpoint:
@@ -295,8 +349,123 @@ class TestMTDUnpaidDuesEndpoint:
         assert response.status_code == 200
         data = response.json
         
-        assert data['status'] == 'success'
-        assert 'summary' in data
+        assert data['success'] is True
+        assert data['data']['summary']['total_clients'] == 4
+
+
+class TestBatchEndpoint:
+    """Test several analyses run on one uploaded file"""
+    
+    def test_batch_runs_requested_analyses(self, client, auth_headers, sample_csv_file):
+        """Test each analysis gets its own first page and result handle"""
+        response = client.post(
+            '/api/v1/loans/batch?limit=2',
+            headers=auth_headers,
+            data={
+                'file': (sample_csv_file, 'test.csv'),
+                'analyses': 'arrange-arrears,mtd-unpaid-dues'
+            }
+        )
+        
+        assert response.status_code == 200
+        data = response.json['data']
+        
+        assert data['analyses'] == ['arrange-arrears', 'mtd-unpaid-dues']
+        for name in data['analyses']:
+            assert len(data['results'][name]['data']) <= 2
+            assert data['results'][name]['summary']['total_clients'] == 4
+        
+        result_id = data['results']['arrange-arrears']['result']['result_id']
+        page = client.get(f'/api/v1/loans/results/{result_id}', headers=auth_headers)
+        assert page.status_code == 200
+    
+    def test_batch_unknown_analysis(self, client, auth_headers, sample_csv_file):
+        """Test unknown analyses are rejected"""
+        response = client.post(
+            '/api/v1/loans/batch',
+            headers=auth_headers,
+            data={'file': (sample_csv_file, 'test.csv'), 'analyses': 'arrange-dues,unknown'}
+        )
+        
+        assert response.status_code == 400
+
+
+class TestResultPages:
+    """Test pages served from a stored result"""
+    
+    def test_replayed_page_has_no_request_fields(self, client, auth_headers):
+        """Test a page compressed for one request carries nothing of it into the next"""
+        rows = "\n".join(f"User {i},07{i:08d},{i * 10},{i % 40},50000,Agent {i % 7}" for i in range(200))
+        upload = io.BytesIO(("FullNames,PhoneNumber,Arrears Amount,DaysInArrears,LoanBalance,SalesRep\n" + rows).encode())
+        response = client.post(
+            '/api/v1/loans/arrange-arrears',
+            headers=auth_headers,
+            data={'file': (upload, 'test.csv')}
+        )
+        result_id = response.json['data']['result']['result_id']
+        
+        bodies = []
+        for correlation_id in ('first-request', 'second-request'):
+            page = client.get(
+                f'/api/v1/loans/results/{result_id}?limit=50',
+                headers={**auth_headers, 'Accept-Encoding': 'gzip', 'X-Correlation-Id': correlation_id}
+            )
+            assert page.headers['Content-Encoding'] == 'gzip'
+            assert page.headers['X-Correlation-Id'] == correlation_id
+            bodies.append(json.loads(gzip.decompress(page.data)))
+        
+        assert 'precompressed' in page.headers['Server-Timing']
+        assert bodies[0] == bodies[1]
+        assert 'correlation_id' not in bodies[1] and 'timestamp' not in bodies[1]
+    
+    def test_not_modified_only_while_result_exists(self, client, auth_headers, sample_excel_file):
+        """Test a first page is revalidated only while the result handle it carries can be read"""
+        excel = sample_excel_file.getvalue()
+        
+        def post(etag=None):
+            headers = {**auth_headers, 'If-None-Match': etag} if etag else auth_headers
+            return client.post(
+                '/api/v1/loans/dormant-arrangement?limit=2',
+                headers=headers,
+                data={'file': (io.BytesIO(excel), 'test.xlsx')}
+            )
+        
+        response = post()
+        etag = response.headers['ETag']
+        assert response.json['data']['result']['result_id'] in etag
+        
+        assert post(etag).status_code == 304
+        
+        remove_result(response.json['data']['result']['result_id'])
+        response = post(etag)
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+    
+    def test_pages_of_result_this_worker_evicted(self, app, client, auth_headers, sample_excel_file):
+        """Test later pages are served from the shared store once the result left this worker's memory"""
+        app.config['RESULT_STORE_MAX_ENTRIES'] = 1
+        excel = sample_excel_file.getvalue()
+        response = client.post(
+            '/api/v1/loans/dormant-arrangement?limit=2',
+            headers=auth_headers,
+            data={'file': (sample_excel_file, 'test.xlsx')}
+        )
+        data = response.json['data']
+        
+        # A second result evicts the first from this worker, as if another worker had computed it
+        client.post(
+            '/api/v1/loans/dormant-arrangement',
+            headers=auth_headers,
+            data={'file': (io.BytesIO(excel), 'test.xlsx')}
+        )
+        
+        response = client.get(
+            f"/api/v1/loans/results/{data['result']['result_id']}?limit=2&after={data['pagination']['next_cursor']}",
+            headers=auth_headers
+        )
+        
+        assert response.status_code == 200
+        assert [row['FullNames'] for row in response.json['data']['data']] == ['Bob Johnson']
 
 
 class TestProgressTracking:
@@ -311,31 +480,50 @@ class TestProgressTracking:
         
         # Should return 404 for non-existent operation
         assert response.status_code in [404, 200]
+    
+    def test_waiting_clients_are_capped(self, app, client, auth_headers):
+        """Test streams beyond PROGRESS_MAX_WAITERS are refused and slots freed on close"""
+        tracker = create_progress_tracker('capped-operation')
+        tracker.complete()
+        get_progress_publisher().flush()
+        app.config['PROGRESS_MAX_WAITERS'] = 1
+        
+        assert waiter_slots.acquire(1)
+        try:
+            response = client.get('/api/v1/loans/progress/capped-operation/stream', headers=auth_headers)
+            assert response.status_code == 503
+            assert response.json['error']['code'] == 'PROGRESS_BUSY'
+        finally:
+            waiter_slots.release()
+        
+        response = client.get('/api/v1/loans/progress/capped-operation/stream', headers=auth_headers)
+        assert b'event: end' in response.data
+        response.close()
+        assert waiter_slots.waiting == 0
 
 
 class TestErrorHandling:
     """Test error handling across all endpoints"""
     
-    def test_unauthorized_access(self, client, sample_csv_file):
+    def test_unauthorized_access(self, client, sample_excel_file):
         """Test that endpoints require authentication"""
         response = client.post(
             '/api/v1/loans/dormant-arrangement',
-            data={'file': (sample_csv_file, 'test.csv')}
+            data={'file': (sample_excel_file, 'test.xlsx')}
         )
         
         assert response.status_code == 401
     
-    def test_invalid_token(self, client, sample_csv_file):
+    def test_invalid_token(self, client, sample_excel_file):
         """Test with invalid authentication token"""
         headers = {
-            'Authorization': 'Bearer invalid-token-here',
-            'Content-Type': 'application/json'
+            'Authorization': 'Bearer invalid-token-here'
         }
         
         response = client.post(
             '/api/v1/loans/dormant-arrangement',
             headers=headers,
-            data={'file': (sample_csv_file, 'test.csv')}
+            data={'file': (sample_excel_file, 'test.xlsx')}
         )
         
         assert response.status_code == 401
@@ -344,7 +532,7 @@ class TestErrorHandling:
 class TestRateLimiting:
     """Test rate limiting on endpoints"""
     
-    def test_rate_limit_enforcement(self, client, auth_headers, sample_csv_file):
+    def test_rate_limit_enforcement(self, client, auth_headers, sample_excel_file):
         """Test that rate limiting is enforced"""
         # Make multiple rapid requests
         responses = []
@@ -352,7 +540,7 @@ class TestRateLimiting:
             response = client.post(
                 '/api/v1/loans/dormant-arrangement',
                 headers=auth_headers,
-                data={'file': (sample_csv_file, 'test.csv')}
+                data={'file': (io.BytesIO(sample_excel_file.getvalue()), 'test.xlsx')}
             )
             responses.append(response.status_code)
         
@@ -380,7 +568,7 @@ class TestPerformance:
         start_time = time.time()
         
         response = client.post(
-            '/api/v1/loans/dormant-arrangement',
+            '/api/v1/loans/arrange-arrears',
             headers=auth_headers,
             data={'file': (large_file, 'large.csv')}
         )
@@ -0,0 +1,56 @@
+"""
+Unit tests for the queued logging pipeline
+"""
+import io
+import json
+import logging
+import queue
+from utils.logging_pipeline import BatchStreamHandler, JsonFormatter, LogWriter, NonBlockingQueueHandler
+
+
+class CountingStream(io.StringIO):
+    """StringIO counting write calls"""
+
+    writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return super().write(text)
+
+
+class TestLoggingPipeline:
+    """Test queue handler and batched writer"""
+
+    def test_batch_written_once_as_json(self):
+        """Test queued records are written in one batch with extra fields"""
+        log_queue = queue.Queue()
+        queue_handler = NonBlockingQueueHandler(log_queue)
+        logger = logging.getLogger('test.pipeline')
+        logger.addHandler(queue_handler)
+        logger.propagate = False
+
+        stream = CountingStream()
+        handler = BatchStreamHandler(stream)
+        handler.setFormatter(JsonFormatter())
+
+        for i in range(5):
+            logger.warning('record %d', i, extra={'correlation_id': f'c{i}'})
+
+        writer = LogWriter(log_queue, [handler])
+        writer.start()
+        writer.stop()
+
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        assert [line['message'] for line in lines] == [f'record {i}' for i in range(5)]
+        assert lines[0]['correlation_id'] == 'c0'
+        assert stream.writes == 1
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        """Test records beyond the queue size are counted as dropped"""
+        queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=2))
+        record = logging.LogRecord('test', logging.INFO, __file__, 1, 'message', None, None)
+
+        for _ in range(5):
+            queue_handler.handle(record)
+
+        assert queue_handler.dropped == 3
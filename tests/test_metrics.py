@@ -0,0 +1,106 @@
+"""
+Unit tests for stage timing and Prometheus metrics
+"""
+import os
+from flask import Flask, jsonify
+from middleware.error_handler import register_error_handlers
+from middleware.metrics import MetricsMiddleware
+from routes.health import health_bp
+from utils.local_store import LocalStore
+from utils.metrics import MetricsPublisher, MetricsRegistry, metrics, record_rows, timed_stage
+
+
+def make_app():
+    app = Flask(__name__)
+    MetricsMiddleware(app)
+
+    @app.route('/process')
+    def process():
+        with timed_stage('parse'):
+            record_rows(10)
+        with timed_stage('compute'):
+            pass
+        return jsonify({'ok': True})
+
+    return app
+
+
+class TestMetrics:
+    """Test Server-Timing entries and the exposition format"""
+
+    def test_stages_in_server_timing(self):
+        """Test recorded stages and the total are reported in order"""
+        response = make_app().test_client().get('/process')
+        names = [entry.split(';')[0].strip() for entry in response.headers['Server-Timing'].split(',')]
+
+        assert names == ['parse', 'compute', 'total']
+        assert 'rows_processed_total{endpoint="process"} 10' in metrics.render()
+
+    def test_histogram_exposition(self):
+        """Test cumulative buckets, sum and count per label set"""
+        registry = MetricsRegistry()
+        for seconds in (0.003, 0.2, 40):
+            registry.observe_request('loans.batch', 'POST', 200, seconds, {'parse': seconds / 2})
+
+        text = registry.render(['custom_metric 1'])
+
+        assert 'http_requests_total{endpoint="loans.batch",method="POST",status="200"} 3' in text
+        assert 'http_request_duration_seconds_bucket{endpoint="loans.batch",method="POST",le="0.005"} 1' in text
+        assert 'http_request_duration_seconds_bucket{endpoint="loans.batch",method="POST",le="0.25"} 2' in text
+        assert 'http_request_duration_seconds_bucket{endpoint="loans.batch",method="POST",le="+Inf"} 3' in text
+        assert 'request_stage_duration_seconds_count{endpoint="loans.batch",stage="parse"} 3' in text
+        assert text.endswith('custom_metric 1\n')
+
+    def test_workers_aggregated_with_labels(self, tmp_path):
+        """Test a scrape returns every worker's series, each family introduced once"""
+        store = LocalStore(str(tmp_path / 'metrics.sqlite'))
+        other = MetricsRegistry()
+        other.observe_request('loans.batch', 'POST', 200, 0.1, {})
+        store.set_values({'metrics:other': other.render(['log_queue_depth 2'])}, 60)
+
+        registry = MetricsRegistry()
+        registry.observe_request('loans.batch', 'POST', 200, 0.1, {})
+        text = MetricsPublisher(store, registry).render()
+
+        worker = os.getpid()
+        assert f'http_requests_total{{worker="{worker}",endpoint="loans.batch",method="POST",status="200"}} 1' in text
+        assert 'http_requests_total{worker="other",endpoint="loans.batch",method="POST",status="200"} 1' in text
+        assert 'log_queue_depth{worker="other"} 2' in text
+        assert text.count('# TYPE http_requests_total counter') == 1
+
+
+def make_metrics_app(**config):
+    app = Flask(__name__)
+    app.config.update(config)
+    register_error_handlers(app)
+    app.register_blueprint(health_bp)
+    return app
+
+
+class TestMetricsAccess:
+    """Test /metrics is limited to known scrapers"""
+
+    def test_loopback_only_by_default(self):
+        """Test without token or allow-list only loopback clients are served"""
+        client = make_metrics_app().test_client()
+
+        assert client.get('/metrics').status_code == 200
+        assert client.get('/metrics', environ_base={'REMOTE_ADDR': '203.0.113.9'}).status_code == 403
+
+    def test_token_required(self):
+        """Test a configured token is required from any address"""
+        client = make_metrics_app(METRICS_TOKEN='scrape-secret').test_client()
+        remote = {'REMOTE_ADDR': '203.0.113.9'}
+
+        assert client.get('/metrics', environ_base=remote).status_code == 401
+        assert client.get('/metrics', environ_base=remote, headers={'Authorization': 'Bearer wrong'}).status_code == 401
+        assert client.get(
+            '/metrics', environ_base=remote, headers={'Authorization': 'Bearer scrape-secret'}
+        ).status_code == 200
+
+    def test_allow_list(self):
+        """Test listed addresses are served without a token"""
+        client = make_metrics_app(METRICS_ALLOWED_IPS=['10.0.0.5']).test_client()
+
+        assert client.get('/metrics', environ_base={'REMOTE_ADDR': '10.0.0.5'}).status_code == 200
+        assert client.get('/metrics').status_code == 403
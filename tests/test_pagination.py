@@ -0,0 +1,96 @@
+"""
+Unit tests for DataFrame pagination
+Tests offset and keyset cursors over analysis result frames
+"""
+import pytest
+import pandas as pd
+from utils.pagination import paginate_dataframe, create_pagination_response, PaginationCursor
+
+
+@pytest.fixture
+def officer_frame():
+    """Create officer/bucket summary frame sorted by its keys"""
+    rows = [
+        {'SalesRep': f'Agent {rep}', 'Bucket': bucket, 'ClientCount': rep * 10 + i}
+        for rep in range(5)
+        for i, bucket in enumerate(['1-3 Days', '10-30 Days', '31+ Days'])
+    ]
+    return pd.DataFrame(rows)
+
+
+class TestPaginateDataFrame:
+    """Test DataFrame-aware paginator"""
+
+    def test_walks_all_pages(self, officer_frame):
+        """Test that following next_cursor visits every row exactly once"""
+        seen = []
+        cursor = None
+
+        while True:
+            page = paginate_dataframe(officer_frame, limit=4, after_cursor=cursor)
+            seen.extend(record['ClientCount'] for record in page['data'])
+            cursor = page['pagination']['next_cursor']
+            if not cursor:
+                break
+
+        assert seen == officer_frame['ClientCount'].tolist()
+        assert page['pagination']['has_more'] is False
+
+    def test_total_count(self, officer_frame):
+        """Test total count reflects the whole frame, not the page"""
+        page = paginate_dataframe(officer_frame, limit=4)
+
+        assert len(page['data']) == 4
+        assert page['pagination']['total_count'] == len(officer_frame)
+
+    def test_keyset_cursor_survives_reprocessing(self, officer_frame):
+        """Test keyset cursor resumes after the last key when rows shift"""
+        first = paginate_dataframe(officer_frame, limit=4, cursor_fields=['SalesRep', 'Bucket'])
+        last_seen = first['data'][-1]
+
+        # Same result re-processed with an extra leading row
+        extra = pd.DataFrame([{'SalesRep': 'Agent 0', 'Bucket': '0 Days', 'ClientCount': -1}])
+        shifted = pd.concat([extra, officer_frame], ignore_index=True)
+
+        second = paginate_dataframe(
+            shifted,
+            limit=4,
+            after_cursor=first['pagination']['next_cursor'],
+            cursor_fields=['SalesRep', 'Bucket']
+        )
+
+        first_key = (second['data'][0]['SalesRep'], second['data'][0]['Bucket'])
+        assert first_key > (last_seen['SalesRep'], last_seen['Bucket'])
+        assert second['data'][0]['ClientCount'] == officer_frame.iloc[4]['ClientCount']
+
+    def test_invalid_cursor_starts_from_beginning(self, officer_frame):
+        """Test that an undecodable cursor returns the first page"""
+        page = paginate_dataframe(officer_frame, limit=3, after_cursor='not-a-cursor')
+
+        assert page['data'][0]['ClientCount'] == officer_frame.iloc[0]['ClientCount']
+
+
+class TestCreatePaginationResponse:
+    """Test list pagination response helper"""
+
+    def test_cursor_advances_without_id_field(self):
+        """Test records without an 'id' field still get an advancing cursor"""
+        items = [{'FieldOfficer': f'Officer {i}'} for i in range(3)]
+
+        response = create_pagination_response(items, limit=2)
+        cursor_data = PaginationCursor.decode_cursor(response['pagination']['next_cursor'])
+
+        assert cursor_data == {'offset': 2}
+
+    def test_offset_cursor_read_back(self):
+        """Test offset cursors resume at the next item when decoded"""
+        items = [{'FieldOfficer': f'Officer {i}'} for i in range(5)]
+        cursor = create_pagination_response(items[:3], limit=2)['pagination']['next_cursor']
+
+        seen = ['Officer 0', 'Officer 1']
+        while cursor:
+            page = PaginationCursor.paginate(items, limit=2, after_cursor=cursor)
+            seen.extend(item['FieldOfficer'] for item in page['data'])
+            cursor = page['pagination']['next_cursor']
+
+        assert seen == [f'Officer {i}' for i in range(5)]
@@ -0,0 +1,52 @@
+"""
+Unit tests for request profiling
+"""
+from flask import Flask, jsonify
+from middleware.profiling import ProfilingMiddleware
+
+
+def make_app(profile_dir, sample_rate):
+    app = Flask(__name__)
+    app.config.update(
+        JWT_SECRET_KEY='test-secret',
+        PROFILE_DIR=str(profile_dir),
+        PROFILE_MAX_ENTRIES=2,
+        PROFILE_SAMPLE_RATE=sample_rate
+    )
+    profiling = ProfilingMiddleware(app)
+
+    @app.route('/work')
+    def work():
+        return jsonify(sum(range(1000)))
+
+    return app, profiling.store
+
+
+class TestProfiling:
+    """Test sampling, stored metadata and pruning"""
+
+    def test_sampled_requests_are_stored_and_pruned(self, tmp_path):
+        """Test sampled profiles keep request details and only the newest are kept"""
+        app, store = make_app(tmp_path, sample_rate=1.0)
+        client = app.test_client()
+
+        for _ in range(3):
+            assert client.get('/work').status_code == 200
+
+        profiles = store.list()
+        assert len(profiles) == 2
+        assert profiles[0]['trigger'] == 'sample'
+        assert profiles[0]['path'] == '/work'
+        assert store.get(profiles[0]['profile_id'])['top_functions']
+        assert 'work' in store.text_report(profiles[0]['profile_id'])
+
+    def test_not_profiled_without_trigger(self, tmp_path):
+        """Test requests are not profiled at rate 0 or with X-Profile from non-admins"""
+        app, store = make_app(tmp_path, sample_rate=0.0)
+        client = app.test_client()
+
+        response = client.get('/work', headers={'X-Profile': '1'})
+
+        assert 'X-Profile-Id' not in response.headers
+        assert store.list() == []
+        assert store.get('../../etc/passwd') is None
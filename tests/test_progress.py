@@ -0,0 +1,119 @@
+"""
+Unit tests for progress shared through the local store
+"""
+import threading
+import time
+import pandas as pd
+import pytest
+from utils.local_store import LocalStore
+from utils.progress import ProgressPublisher, ProgressTracker, ProgressCancelled, StageProgress
+
+
+@pytest.fixture
+def publishers(tmp_path):
+    """Two publishers on one file, standing in for two workers"""
+    path = str(tmp_path / 'progress.sqlite')
+    return ProgressPublisher(LocalStore(path), ttl=60), ProgressPublisher(LocalStore(path), ttl=60)
+
+
+def register(publisher, operation_id, total_steps=10):
+    tracker = ProgressTracker(total_steps, operation_id=operation_id)
+    publisher.register(tracker)
+    return tracker
+
+
+class TestProgressPublisher:
+    """Test progress visible and cancellable from another worker"""
+
+    def test_updates_published_in_batches(self, publishers):
+        """Test updates reach the store on flush, completion immediately"""
+        worker, other = publishers
+        tracker = register(worker, 'op')
+
+        tracker.update(3, 'Reading file...', rows=120)
+        assert other.status('op')['current_step'] == 0
+
+        worker.flush()
+        status = other.status('op')
+        assert status['current_step'] == 3
+        assert status['metadata'] == {'rows': 120}
+
+        tracker.complete()
+        assert other.status('op')['completed'] is True
+
+        worker.flush()
+        assert worker.get('op') is None
+        assert worker.status('op')['completed'] is True
+
+    def test_cancel_from_other_worker(self, publishers):
+        """Test a cancellation requested elsewhere stops the next update"""
+        worker, other = publishers
+        tracker = register(worker, 'op')
+
+        other.request_cancel('op')
+        worker.flush()
+
+        with pytest.raises(ProgressCancelled):
+            tracker.update(5)
+        assert other.status('op')['cancelled'] is True
+
+    def test_progress_expires(self, tmp_path):
+        """Test progress is forgotten after the TTL"""
+        publisher = ProgressPublisher(LocalStore(str(tmp_path / 'progress.sqlite')), ttl=0.01)
+        register(publisher, 'op').complete()
+        publisher.flush()
+
+        time.sleep(0.02)
+        assert publisher.status('op') is None
+
+    def test_wait_returns_on_change(self, publishers):
+        """Test a long poll returns the next published version, not every update"""
+        worker, other = publishers
+        tracker = register(worker, 'op', total_steps=1000)
+        version = other.status('op')['version']
+
+        for step in range(1, 500):
+            tracker.update(step)
+        timer = threading.Timer(0.05, worker.flush)
+        timer.start()
+
+        status = other.wait('op', version, timeout=5)
+        timer.join()
+        assert status['version'] == tracker.version == 499
+        assert status['current_step'] == 499
+
+        assert other.wait('op', status['version'], timeout=0.05)['version'] == 499
+
+
+class TestStageProgress:
+    """Test stage and row-block hooks"""
+
+    def test_blocks_report_rows_within_stage(self):
+        """Test row blocks advance the tracker through the stage's share"""
+        tracker = ProgressTracker(100)
+        hooks = StageProgress(tracker, [('load', 20), ('clean', 80)], block_rows=250)
+        frame = pd.DataFrame({'value': range(1000)})
+
+        hooks.stage('load')
+        hooks.stage('clean')
+        assert tracker.current_step == 20
+
+        result = hooks.apply(frame, lambda block: block * 2)
+        assert result['value'].tolist() == [value * 2 for value in range(1000)]
+        assert tracker.current_step == 100
+        assert tracker.metadata == {'stage': 'clean', 'rows_processed': 1000, 'rows_total': 1000}
+
+    def test_cancel_stops_at_next_block(self):
+        """Test a cancelled operation processes no further blocks"""
+        tracker = ProgressTracker(100)
+        hooks = StageProgress(tracker, [('clean', 1)], block_rows=10)
+        hooks.stage('clean')
+        processed = []
+
+        with pytest.raises(ProgressCancelled):
+            for block in hooks.blocks(pd.Series(range(100))):
+                processed.append(len(block))
+                if len(processed) == 3:
+                    tracker.cancel()
+
+        assert processed == [10, 10, 10]
@@ -0,0 +1,41 @@
+"""
+Unit tests for the shared local rate limit storage
+"""
+import time
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+from middleware.rate_limit import LocalRateLimitStorage
+
+
+class TestLocalRateLimitStorage:
+    """Test counters shared through the SQLite file"""
+
+    def test_limit_shared_between_workers(self, tmp_path):
+        """Test storages opening the same file enforce one quota"""
+        uri = f'local://{tmp_path / "ratelimit.sqlite"}'
+        workers = [FixedWindowRateLimiter(storage_from_string(uri)) for _ in range(2)]
+        limit = parse('5/minute')
+
+        allowed = sum(worker.hit(limit, 'client') for _ in range(4) for worker in workers)
+
+        assert isinstance(workers[0].storage, LocalRateLimitStorage)
+        assert allowed == 5
+        assert workers[1].get_window_stats(limit, 'client').remaining == 0
+
+    def test_window_expiry_and_clear(self, tmp_path):
+        """Test a new window starts after expiry and clear resets a key"""
+        storage = storage_from_string(f'local://{tmp_path / "ratelimit.sqlite"}')
+
+        storage.incr('key', 1, amount=3)
+        assert storage.get('key') == 3
+        assert storage.get_expiry('key') > time.time()
+
+        storage.store.incr('short', 0.01)
+        time.sleep(0.02)
+        assert storage.get('short') == 0
+        assert storage.incr('short', 60) == 1
+
+        storage.clear('key')
+        assert storage.get('key') == 0
+        assert storage.check()
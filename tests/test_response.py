@@ -0,0 +1,63 @@
+"""
+Unit tests for input-fingerprint ETags
+"""
+import io
+from flask import Flask
+from werkzeug.datastructures import FileStorage
+from utils.response import (
+    fingerprint_upload, generate_input_etag, generate_result_etag, etag_result_ids, etag_matches
+)
+
+
+def make_app():
+    app = Flask(__name__)
+    app.config['CODE_VERSION'] = 'test'
+    return app
+
+
+class TestInputEtag:
+    """Test ETags derived from request inputs"""
+
+    def test_same_inputs_same_etag(self):
+        """Test ETag depends on file content and query params only"""
+        app = make_app()
+        file = FileStorage(io.BytesIO(b'FullNames,Arrears\nJohn,100\n'), 'loans.csv')
+        fingerprint = fingerprint_upload(file)
+
+        assert file.stream.read() == b'FullNames,Arrears\nJohn,100\n'
+
+        with app.test_request_context('/loans?limit=20'):
+            first = generate_input_etag(fingerprint)
+        with app.test_request_context('/loans?limit=20'):
+            second = generate_input_etag(fingerprint)
+        with app.test_request_context('/loans?limit=50'):
+            other_params = generate_input_etag(fingerprint)
+        with app.test_request_context('/loans?limit=20'):
+            other_file = generate_input_etag('0' * 64)
+
+        assert first == second
+        assert len({first, other_params, other_file}) == 3
+
+    def test_etag_matches_compressed_and_weak(self):
+        """Test If-None-Match matching ignores W/ and encoding suffixes"""
+        app = make_app()
+        etag = '"abc123"'
+
+        for header in ['"abc123"', 'W/"abc123"', '"abc123:gzip"', '"x", "abc123:br"']:
+            with app.test_request_context('/', headers={'If-None-Match': header}):
+                assert etag_matches(etag)
+
+        with app.test_request_context('/', headers={'If-None-Match': '"abc124"'}):
+            assert not etag_matches(etag)
+        with app.test_request_context('/'):
+            assert not etag_matches(etag)
+
+    def test_result_ids_of_matching_etags(self):
+        """Test only ETags issued for the same inputs yield their result handles"""
+        app = make_app()
+        etag = generate_result_etag('"abc123"', 'r1', 'r2')
+
+        assert etag == '"abc123.r1.r2"'
+        header = f'W/{etag[:-1]}:gzip", "abc124.r3", "abc123"'
+        with app.test_request_context('/', headers={'If-None-Match': header}):
+            assert etag_result_ids('"abc123"') == [['r1', 'r2']]
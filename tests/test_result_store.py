@@ -0,0 +1,94 @@
+"""
+Unit tests for the result store
+Tests handle expiry, least recently used eviction and results shared
+between the workers of a host
+"""
+import pandas as pd
+import pytest
+from utils.result_store import (
+    configure_result_store, store_result, get_result, remove_result, purge_expired_results
+)
+
+
+@pytest.fixture(autouse=True)
+def in_process_store():
+    """Keep results in this process unless a test shares them"""
+    configure_result_store(None)
+    yield
+    configure_result_store(None)
+
+
+def frame():
+    return pd.DataFrame({'ClientCount': range(3)})
+
+
+class TestResultStore:
+    """Test results kept under opaque handles"""
+
+    def test_handle_expires(self):
+        """Test an expired handle is gone, and purged from the store"""
+        live = store_result(frame(), ttl_seconds=60)
+        expired = store_result(frame(), ttl_seconds=-1)
+
+        assert get_result(expired.result_id) is None
+        assert get_result(live.result_id) is live
+
+        stale = store_result(frame(), ttl_seconds=-1)
+        assert purge_expired_results() >= 1
+        assert get_result(stale.result_id) is None
+        remove_result(live.result_id)
+
+    def test_least_recently_used_evicted(self):
+        """Test reading a result keeps it while older results are evicted"""
+        first = store_result(frame(), max_entries=2)
+        second = store_result(frame(), max_entries=2)
+        assert get_result(first.result_id) is first
+
+        third = store_result(frame(), max_entries=2)
+
+        assert get_result(second.result_id) is None
+        assert get_result(first.result_id) is first
+        assert get_result(third.result_id) is third
+        remove_result(first.result_id)
+        remove_result(third.result_id)
+
+    def test_compressed_bodies_bounded(self):
+        """Test cached compressed bodies of a result are evicted least recently used first"""
+        result = store_result(frame())
+        for key in ('a', 'b'):
+            result.put_encoded(key, key.encode(), max_entries=2)
+        result.get_encoded('a')
+        result.put_encoded('c', b'c', max_entries=2)
+
+        assert result.get_encoded('b') is None
+        assert result.get_encoded('a') == b'a'
+        remove_result(result.result_id)
+
+
+class TestSharedResultStore:
+    """Test results written to the directory shared by the workers"""
+
+    def test_evicted_result_read_back(self, tmp_path):
+        """Test a result no longer in memory (as on another worker) is read from the shared directory"""
+        configure_result_store(str(tmp_path))
+        summary = {'total_clients': 3}
+        first = store_result(frame(), summary, user_id=7, max_entries=1, analysis='arrange-dues')
+        store_result(frame(), max_entries=1)
+
+        result = get_result(first.result_id)
+
+        assert result is not first
+        pd.testing.assert_frame_equal(result.frame, first.frame)
+        assert (result.summary, result.user_id, result.metadata) == (summary, 7, {'analysis': 'arrange-dues'})
+        assert result.expires_at == first.expires_at
+
+    def test_expired_and_removed_results_gone(self, tmp_path):
+        """Test expired or removed results are not read back and their files are deleted"""
+        configure_result_store(str(tmp_path))
+        expired = store_result(frame(), ttl_seconds=-1, max_entries=1)
+        removed = store_result(frame(), max_entries=1)
+        remove_result(removed.result_id)
+
+        assert get_result(expired.result_id) is None
+        assert get_result(removed.result_id) is None
+        assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,46 @@
+"""
+Unit tests for SecurityMiddleware request screening
+"""
+import io
+import pytest
+from flask import Flask
+from middleware.error_handler import ValidationError
+from middleware.security import SecurityMiddleware
+
+
+def screen(app, security, **context_kwargs):
+    with app.test_request_context(**context_kwargs):
+        security._screen_query_params()
+        security._screen_json_body()
+
+
+class TestRequestScreening:
+    """Test compiled SQL injection / XSS screening"""
+
+    def setup_method(self):
+        self.app = Flask(__name__)
+        self.app.config['SECURITY_SCREEN_MAX_VALUES'] = 50
+        self.security = SecurityMiddleware(self.app)
+
+    @pytest.mark.parametrize('query', [
+        'q=1 UNION all SELECT password', 'q=x or 1=1', 'q=a--', 'q=<Script>alert(1)</script>', 'q=JavaScript:go', 'q=x onLoad = y'
+    ])
+    def test_rejects_query_patterns(self, query):
+        """Test every rule matches case-insensitively in query params"""
+        with pytest.raises(ValidationError):
+            screen(self.app, self.security, path=f'/?{query}')
+
+    def test_json_body_nested_and_bounded(self):
+        """Test nested JSON strings are screened up to the value budget"""
+        with pytest.raises(ValidationError):
+            screen(self.app, self.security, path='/', method='POST', json={'a': [{'b': 'drop the table'}]})
+
+        # Clean values fill the budget before the bad value is reached
+        padded = {'items': ['bad or 1=1'] + ['fine'] * 100}
+        screen(self.app, self.security, path='/', method='POST', json=padded)
+
+    def test_skips_uploads_and_clean_input(self):
+        """Test multipart bodies are not inspected and clean params pass"""
+        screen(self.app, self.security, path='/?limit=20&fields=SalesRep,Bucket')
+        screen(self.app, self.security, path='/', method='POST', content_type='multipart/form-data',
+               data={'file': (io.BytesIO(b'name\nselect * from loans\n'), 'loans.csv')})
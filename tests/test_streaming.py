@@ -0,0 +1,75 @@
+"""
+Unit tests for streamed result exports
+Tests NDJSON and CSV generated in row blocks, with and without gzip
+"""
+import gzip
+import io
+import json
+import pandas as pd
+import pytest
+from flask import Flask
+from middleware.error_handler import ValidationError
+from utils.streaming import get_stream_format, stream_frame_response
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config.update(STREAM_BLOCK_ROWS=2)
+    return app
+
+
+def result_frame():
+    return pd.DataFrame({
+        'FieldOfficer': ['Agent 1', 'Agent 2', None, 'Agent 4', 'Agent 5'],
+        'TotalArrears': [10.5, 20.0, 30.25, 0.0, 5.0]
+    })
+
+
+class TestStreamExport:
+    """Test full results streamed block by block"""
+
+    def test_ndjson_rows(self, app):
+        """Test every row arrives as one JSON line, in blocks of STREAM_BLOCK_ROWS"""
+        with app.test_request_context('/?output=stream'):
+            response = stream_frame_response(result_frame(), get_stream_format(), filename='arrears')
+            chunks = list(response.response)
+
+        assert response.mimetype == 'application/x-ndjson'
+        assert response.headers['X-Total-Count'] == '5'
+        assert response.headers['Content-Disposition'] == 'attachment; filename="arrears.ndjson"'
+        assert len(chunks) == 3
+
+        rows = [json.loads(line) for line in b''.join(chunks).decode().splitlines()]
+        assert [row['TotalArrears'] for row in rows] == [10.5, 20.0, 30.25, 0.0, 5.0]
+        assert rows[2]['FieldOfficer'] is None
+
+    def test_gzip_csv_matches_frame(self, app):
+        """Test a gzipped CSV stream decodes to the whole frame with one header"""
+        frame = result_frame()
+        with app.test_request_context('/?output=stream&format=csv', headers={'Accept-Encoding': 'gzip'}):
+            response = stream_frame_response(frame, get_stream_format())
+            body = b''.join(response.response)
+
+        assert response.headers['Content-Encoding'] == 'gzip'
+        text = gzip.decompress(body).decode()
+        assert text.count('FieldOfficer') == 1
+        pd.testing.assert_frame_equal(pd.read_csv(io.StringIO(text)), frame)
+
+    def test_gzip_refused_by_client(self, app):
+        """Test a stream is sent uncompressed when the client gives gzip q=0"""
+        for accept_encoding in ('gzip;q=0', 'br, gzip;q=0, *;q=0.5'):
+            with app.test_request_context('/?output=stream', headers={'Accept-Encoding': accept_encoding}):
+                response = stream_frame_response(result_frame(), get_stream_format())
+                body = b''.join(response.response)
+
+            assert 'Content-Encoding' not in response.headers
+            assert len(body.decode().splitlines()) == 5
+
+    def test_unknown_format_rejected(self, app):
+        """Test only supported formats are streamed"""
+        with app.test_request_context('/?output=stream&format=xml'):
+            with pytest.raises(ValidationError):
+                get_stream_format()
+        with app.test_request_context('/?format=csv'):
+            assert get_stream_format() is None
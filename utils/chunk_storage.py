@@ -0,0 +1,319 @@
+"""
+File storage for chunked uploads
+Chunks are written straight to their byte offset in one preallocated part
+file, so completing an upload is a rename instead of a merge
+"""
+from middleware.error_handler import ValidationError
+from typing import IO, List, Optional, Tuple
+import hashlib
+import math
+import os
+import shutil
+import tempfile
+import uuid
+
+
+# Bytes copied per step when streaming a chunk to disk
+COPY_BUFFER_SIZE = 1048576
+
+# Chunk bytes staged in memory before spilling to a temp file
+STAGE_MAX_MEMORY = 8388608
+
+# Algorithms accepted in X-Chunk-Checksum
+CHECKSUM_ALGORITHMS = ('sha256', 'sha1', 'md5')
+
+
+def part_file_path(upload_folder: str, session_id: str) -> str:
+    """Get path of the part file an upload session writes into"""
+    return os.path.join(upload_folder, f'{session_id}.part')
+
+
+def has_fixed_layout(file_size: Optional[int], total_chunks: Optional[int], chunk_size: Optional[int]) -> bool:
+    """
+    Check if chunk offsets can be derived from the session parameters
+
+    Every chunk but the last must be exactly chunk_size bytes.
+
+    Args:
+        file_size: Total file size in bytes
+        total_chunks: Number of chunks
+        chunk_size: Size of each chunk in bytes
+
+    Returns:
+        True if file_size splits into total_chunks chunks of chunk_size
+    """
+    if not file_size or not total_chunks or not chunk_size or chunk_size <= 0:
+        return False
+
+    return math.ceil(file_size / chunk_size) == total_chunks
+
+
+def expected_chunk_length(file_size: int, chunk_size: int, chunk_number: int) -> int:
+    """Get expected length of a chunk (the last chunk may be shorter)"""
+    offset = (chunk_number - 1) * chunk_size
+    return min(chunk_size, file_size - offset)
+
+
+def preallocate_part_file(path: str, file_size: int):
+    """
+    Create part file with its final size
+
+    Uses posix_fallocate where available so chunk writes do not fail on a
+    full disk halfway through an upload; falls back to a sparse file.
+
+    Args:
+        path: Part file path
+        file_size: Total file size in bytes
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        if file_size and hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(fd, 0, file_size)
+                return
+            except OSError:
+                pass  # Not supported by the filesystem
+        os.ftruncate(fd, file_size or 0)
+    finally:
+        os.close(fd)
+
+
+def parse_chunk_checksum(header: Optional[str]) -> Optional[Tuple[str, str]]:
+    """
+    Parse X-Chunk-Checksum header
+
+    Format: "<algorithm>=<hex digest>", e.g. "sha256=9f86d0...";
+    a bare hex digest is taken as sha256.
+
+    Args:
+        header: Header value
+
+    Returns:
+        Tuple of (algorithm, lowercase hex digest), or None if not sent
+
+    Raises:
+        ValidationError: If the algorithm is not supported
+    """
+    if not header:
+        return None
+
+    algorithm, _, digest = header.strip().rpartition('=')
+    algorithm = algorithm.lower() or 'sha256'
+
+    if algorithm not in CHECKSUM_ALGORITHMS or not digest:
+        raise ValidationError(
+            f"Invalid X-Chunk-Checksum. Use <algorithm>=<hex digest> with one of: {', '.join(CHECKSUM_ALGORITHMS)}",
+            details={'field': 'X-Chunk-Checksum'}
+        )
+
+    return algorithm, digest.lower()
+
+
+def verify_checksum(hasher, expected: Optional[Tuple[str, str]]) -> Optional[str]:
+    """
+    Compare a streamed chunk's digest with the client's checksum
+
+    Args:
+        hasher: hashlib object fed with the chunk data (or None)
+        expected: Parsed X-Chunk-Checksum (or None)
+
+    Returns:
+        Checksum as "<algorithm>=<hex digest>", or None if none was sent
+
+    Raises:
+        ValidationError: If the digests differ
+    """
+    if hasher is None or expected is None:
+        return None
+
+    actual = hasher.hexdigest()
+    if actual != expected[1]:
+        raise ValidationError(
+            'Chunk checksum mismatch',
+            details={'field': 'X-Chunk-Checksum', 'expected': expected[1], 'actual': actual}
+        )
+
+    return f'{expected[0]}={actual}'
+
+
+def new_hasher(expected: Optional[Tuple[str, str]]):
+    """Create hashlib object for a parsed checksum (None if no checksum)"""
+    return hashlib.new(expected[0]) if expected else None
+
+
+def write_chunk_at(
+    path: str,
+    stream: IO[bytes],
+    offset: int,
+    expected_length: int,
+    hasher=None,
+    expected_checksum: Optional[Tuple[str, str]] = None
+) -> int:
+    """
+    Stream a chunk into the part file at its offset
+
+    The chunk is staged first and only written once its length (and
+    checksum, if sent) are verified, so a bad chunk never touches bytes
+    already in the part file. Different chunks may be written concurrently;
+    each write uses its own file descriptor and touches a disjoint byte range.
+
+    Args:
+        path: Part file path
+        stream: Chunk data stream
+        offset: Byte offset of the chunk
+        expected_length: Exact number of bytes the chunk must contain
+        hasher: Optional hashlib object updated with the data as it streams
+        expected_checksum: Parsed X-Chunk-Checksum to verify before writing
+
+    Returns:
+        Number of bytes written
+
+    Raises:
+        ValidationError: If the chunk size does not match the session layout
+            or the checksum differs
+    """
+    received = 0
+
+    with tempfile.SpooledTemporaryFile(max_size=STAGE_MAX_MEMORY) as staged:
+        while True:
+            block = stream.read(COPY_BUFFER_SIZE)
+            if not block:
+                break
+
+            received += len(block)
+            if received > expected_length:
+                raise ValidationError(
+                    f'Chunk too large. Expected {expected_length} bytes',
+                    details={'field': 'chunk'}
+                )
+            if hasher is not None:
+                hasher.update(block)
+            staged.write(block)
+
+        if received != expected_length:
+            raise ValidationError(
+                f'Chunk size mismatch. Expected {expected_length} bytes, received {received}',
+                details={'field': 'chunk'}
+            )
+
+        verify_checksum(hasher, expected_checksum)
+
+        staged.seek(0)
+        with open(path, 'r+b') as part_file:
+            part_file.seek(offset)
+            shutil.copyfileobj(staged, part_file, COPY_BUFFER_SIZE)
+
+    return received
+
+
+def write_chunk_file(path: str, stream: IO[bytes], hasher=None) -> int:
+    """
+    Stream a chunk into its own file
+
+    The chunk is written to a temporary name and renamed, so a concurrent
+    retry of the same chunk never leaves a mixed file behind.
+
+    Args:
+        path: Chunk file path
+        stream: Chunk data stream
+        hasher: Optional hashlib object updated with the data as it streams
+
+    Returns:
+        Number of bytes written
+    """
+    temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    written = 0
+
+    try:
+        with open(temp_path, 'wb') as chunk_file:
+            for block in iter(lambda: stream.read(COPY_BUFFER_SIZE), b''):
+                if hasher is not None:
+                    hasher.update(block)
+                chunk_file.write(block)
+                written += len(block)
+
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    return written
+
+
+def missing_chunk_ranges(total_chunks: int, uploaded: List[int]) -> List[List[int]]:
+    """
+    Compress missing chunk numbers into inclusive ranges
+
+    Args:
+        total_chunks: Number of chunks in the session
+        uploaded: Sorted uploaded chunk numbers
+
+    Returns:
+        List of [first, last] chunk number ranges not yet received
+    """
+    ranges = []
+    expected = 1
+
+    for chunk_number in uploaded + [total_chunks + 1]:
+        if chunk_number > expected:
+            ranges.append([expected, min(chunk_number, total_chunks + 1) - 1])
+        expected = max(expected, chunk_number + 1)
+        if expected > total_chunks:
+            break
+
+    return ranges
+
+
+def contiguous_bytes(file_size: int, chunk_size: int, uploaded: List[int]) -> int:
+    """
+    Get length of the file prefix covered by received chunks
+
+    Args:
+        file_size: Total file size in bytes
+        chunk_size: Size of each chunk in bytes
+        uploaded: Sorted uploaded chunk numbers
+
+    Returns:
+        Number of bytes from the start of the file that are in place
+    """
+    contiguous = 0
+    for chunk_number in uploaded:
+        if chunk_number != contiguous + 1:
+            break
+        contiguous = chunk_number
+
+    return min(contiguous * chunk_size, file_size)
+
+
+def append_file(destination: IO[bytes], source_path: str):
+    """
+    Append a file to an open destination file using a kernel-level copy
+
+    Uses os.sendfile where available, so data is not copied through
+    userspace; falls back to a buffered copy.
+
+    Args:
+        destination: Destination file opened for binary writing
+        source_path: File to append
+    """
+    with open(source_path, 'rb') as source:
+        if hasattr(os, 'sendfile'):
+            destination.flush()
+            remaining = os.fstat(source.fileno()).st_size
+            offset = 0
+            try:
+                while remaining > 0:
+                    sent = os.sendfile(destination.fileno(), source.fileno(), offset, remaining)
+                    if sent == 0:
+                        break
+                    offset += sent
+                    remaining -= sent
+                # os.sendfile does not move the destination's Python-level position
+                destination.seek(0, os.SEEK_END)
+                return
+            except OSError:
+                if offset:
+                    raise
+                # sendfile not supported between these files, copy instead
+
+        shutil.copyfileobj(source, destination, COPY_BUFFER_SIZE)
@@ -0,0 +1,82 @@
+"""
+Per-request deadlines
+Each request gets a Deadline from REQUEST_TIMEOUT (or a shorter budget the
+client sends in X-Request-Timeout). Processors check it between stages and
+row blocks, so work for a request the client has given up on stops early
+"""
+from flask import g, request, has_request_context
+from utils.progress import ProgressCancelled
+from typing import Optional
+import time
+
+
+class DeadlineExceeded(ProgressCancelled):
+    """Raised by a deadline check once the request's time budget is spent"""
+
+    def __init__(self, stage: str = ''):
+        super().__init__(f"Deadline exceeded before {stage}" if stage else "Deadline exceeded")
+        self.stage = stage
+
+
+class Deadline:
+    """Time budget of a request"""
+
+    def __init__(self, seconds: Optional[float]):
+        """
+        Args:
+            seconds: Time budget from now (None for no limit)
+        """
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds if seconds is not None else None
+
+    def remaining(self) -> Optional[float]:
+        """Get seconds left (None for no limit)"""
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        """Check whether the budget is spent"""
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def check(self, stage: str = ''):
+        """
+        Raise DeadlineExceeded if the budget is spent
+
+        Args:
+            stage: Stage about to start (reported in the error)
+        """
+        if self.expired():
+            raise DeadlineExceeded(stage)
+
+
+def start_request_deadline(timeout: float, reserve: float = 0.0) -> Deadline:
+    """
+    Start the current request's deadline
+
+    Args:
+        timeout: Longest budget (REQUEST_TIMEOUT); X-Request-Timeout can
+            only shorten it
+        reserve: Seconds kept back for building the response
+
+    Returns:
+        Deadline instance
+    """
+    try:
+        requested = float(request.headers.get('X-Request-Timeout', timeout))
+    except ValueError:
+        requested = timeout
+
+    if requested <= 0:
+        requested = timeout
+
+    g.deadline = Deadline(max(min(requested, timeout) - reserve, 0.0))
+    return g.deadline
+
+
+def get_deadline() -> Deadline:
+    """Get the current request's deadline (no limit outside a request)"""
+    if has_request_context() and 'deadline' in g:
+        return g.deadline
+    return Deadline(None)
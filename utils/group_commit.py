@@ -0,0 +1,85 @@
+"""
+Group commit for small, frequent database writes
+Concurrent callers queue their rows; whichever caller finds no write in
+flight becomes the leader and commits everything queued in one transaction
+"""
+from typing import Any, Callable, List, Optional
+import threading
+
+
+class _PendingWrite:
+    """Row waiting to be committed"""
+
+    __slots__ = ('item', 'done', 'error')
+
+    def __init__(self, item: Any):
+        self.item = item
+        self.done = False
+        self.error: Optional[BaseException] = None
+
+
+class GroupCommitter:
+    """
+    Batch concurrent writes into shared transactions
+
+    submit() blocks until the caller's item is committed. While one batch
+    is being written, new items queue up and are committed together by
+    the next leader, so N concurrent writers cost about one transaction
+    (and one fsync) per batch instead of one each.
+    """
+
+    def __init__(self, write_batch: Callable[[List[Any]], None], max_batch: int = 500):
+        """
+        Args:
+            write_batch: Function committing a list of items in one transaction
+            max_batch: Maximum items per transaction
+        """
+        self._write_batch = write_batch
+        self._max_batch = max_batch
+        self._queue: List[_PendingWrite] = []
+        self._writing = False
+        self._cond = threading.Condition()
+
+    def submit(self, item: Any):
+        """
+        Queue an item and wait until it is committed
+
+        Args:
+            item: Item passed to write_batch
+
+        Raises:
+            Exception: Whatever write_batch raised for the item's batch
+        """
+        entry = _PendingWrite(item)
+
+        with self._cond:
+            self._queue.append(entry)
+
+        while True:
+            with self._cond:
+                while not entry.done and self._writing:
+                    self._cond.wait()
+
+                if entry.done:
+                    break
+
+                # Become leader for everything queued so far
+                self._writing = True
+                batch = self._queue[:self._max_batch]
+                del self._queue[:self._max_batch]
+
+            error = None
+            try:
+                self._write_batch([pending.item for pending in batch])
+            except Exception as e:
+                error = e
+
+            with self._cond:
+                for pending in batch:
+                    pending.done = True
+                    pending.error = error
+                self._writing = False
+                self._cond.notify_all()
+
+        if entry.error is not None:
+            raise entry.error
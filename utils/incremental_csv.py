@@ -0,0 +1,336 @@
+"""
+Incremental CSV parsing for chunked uploads
+Each time the received chunks form a longer contiguous prefix of the file,
+the complete rows in it are parsed into a stored part and pre-aggregated
+(column types inferred, numeric columns converted), so an analysis on the
+finished upload only has to parse the tail, combine the per-part results
+and concatenate the columns it reads
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import io
+import json
+import logging
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: locks only cover threads of this process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Parsing runs off the request thread, one session at a time per process
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='csv-parse')
+_local_locks: Dict[str, threading.Lock] = {}
+_local_locks_guard = threading.Lock()
+
+# Boolean spellings read_csv infers as bool
+_BOOL_VALUES = {'True': True, 'TRUE': True, 'true': True, 'False': False, 'FALSE': False, 'false': False}
+
+
+def parse_dir_path(upload_folder: str, session_id: str) -> str:
+    """Get directory holding parsed parts and parser state of a session"""
+    return os.path.join(upload_folder, f'{session_id}.parsed')
+
+
+class _ParseLock:
+    """Exclusive lock on a session's parse directory (across processes where supported)"""
+
+    def __init__(self, parse_dir: str, blocking: bool):
+        self.path = os.path.join(parse_dir, 'lock')
+        self.blocking = blocking
+        self.handle = None
+        self.local_lock = None
+
+    def __enter__(self) -> bool:
+        if fcntl is not None:
+            self.handle = open(self.path, 'a+')
+            flags = fcntl.LOCK_EX if self.blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            try:
+                fcntl.flock(self.handle, flags)
+                return True
+            except BlockingIOError:
+                self.handle.close()
+                self.handle = None
+                return False
+
+        with _local_locks_guard:
+            self.local_lock = _local_locks.setdefault(self.path, threading.Lock())
+        if self.local_lock.acquire(blocking=self.blocking):
+            return True
+        self.local_lock = None
+        return False
+
+    def __exit__(self, *exc_info):
+        if self.handle is not None:
+            fcntl.flock(self.handle, fcntl.LOCK_UN)
+            self.handle.close()
+        if self.local_lock is not None:
+            self.local_lock.release()
+
+
+def _load_state(parse_dir: str) -> Dict[str, Any]:
+    """Load parser state (a fresh state if parsing has not started)"""
+    try:
+        with open(os.path.join(parse_dir, 'state.json')) as state_file:
+            return json.load(state_file)
+    except FileNotFoundError:
+        return {'status': 'parsing', 'columns': None, 'parsed_bytes': 0, 'parts': 0, 'rows': 0, 'profiles': []}
+
+
+def _save_state(parse_dir: str, state: Dict[str, Any]):
+    """Save parser state atomically"""
+    temp_path = os.path.join(parse_dir, 'state.json.tmp')
+    with open(temp_path, 'w') as state_file:
+        json.dump(state, state_file)
+    os.replace(temp_path, os.path.join(parse_dir, 'state.json'))
+
+
+def _row_boundary(data: bytes) -> int:
+    """
+    Find end of the last complete row in a block
+
+    Newlines inside quoted fields are skipped by requiring an even number
+    of quote characters before the cut.
+
+    Returns:
+        Length of the complete-row prefix (0 if there is none)
+    """
+    end = data.rfind(b'\n')
+    while end != -1:
+        if data.count(b'"', 0, end) % 2 == 0:
+            return end + 1
+        end = data.rfind(b'\n', 0, end)
+    return 0
+
+
+def _parse_block(data: bytes, columns: Optional[List[str]]) -> pd.DataFrame:
+    """Parse a block of complete rows as strings (types are inferred on load)"""
+    if columns is None:
+        return pd.read_csv(io.BytesIO(data), dtype=str, index_col=False)
+    return pd.read_csv(io.BytesIO(data), dtype=str, header=None, names=columns, index_col=False)
+
+
+def _aggregate_block(block: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Pre-aggregate a parsed block for type inference of the whole file
+
+    A column is numeric in the file if it is numeric in every block, and
+    boolean if every block only holds boolean spellings (or nothing), so
+    the file's types follow from these per-block results.
+
+    Args:
+        block: Block parsed with dtype=str
+
+    Returns:
+        Tuple of (numeric columns converted, profile with the block's rows,
+        numeric columns, empty columns and boolean spellings by column)
+    """
+    numeric = {}
+    empty = []
+    bool_values = {}
+
+    for column in block.columns:
+        values = block[column]
+        present = values.notna()
+        if not present.any():
+            empty.append(column)
+
+        converted = pd.to_numeric(values, errors='coerce')
+        if converted[present].notna().all():
+            numeric[column] = converted
+            continue
+
+        distinct = set(values[present].unique())
+        if distinct <= _BOOL_VALUES.keys():
+            bool_values[column] = sorted(distinct)
+
+    profile = {'rows': len(block), 'numeric': list(numeric), 'empty': empty, 'bool_values': bool_values}
+    return pd.DataFrame(numeric, index=block.index), profile
+
+
+def _part_paths(parse_dir: str, index: int) -> Tuple[str, str]:
+    """Get Arrow IPC files of a part's text and converted numeric columns"""
+    base = os.path.join(parse_dir, f'part_{index:05d}')
+    return f'{base}.arrow', f'{base}.numeric.arrow'
+
+
+def advance_parse(parse_dir: str, data_path: str, available_bytes: int,
+                  final: bool = False, blocking: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Parse newly available complete rows of an upload into a new part
+
+    Args:
+        parse_dir: Parse directory of the session
+        data_path: File the upload's bytes are written to
+        available_bytes: Length of the contiguous received prefix of the file
+        final: Whether the whole file is available (parse the last row too)
+        blocking: Wait for a parse already running on the session
+
+    Returns:
+        Parser state, or None if another parse holds the lock
+    """
+    os.makedirs(parse_dir, exist_ok=True)
+
+    with _ParseLock(parse_dir, blocking) as locked:
+        if not locked:
+            return None
+
+        state = _load_state(parse_dir)
+        if state['status'] != 'parsing':
+            return state
+
+        if available_bytes <= state['parsed_bytes']:
+            if final:
+                state['status'] = 'complete'
+                _save_state(parse_dir, state)
+            return state
+
+        try:
+            with open(data_path, 'rb') as data_file:
+                data_file.seek(state['parsed_bytes'])
+                data = data_file.read(available_bytes - state['parsed_bytes'])
+
+            cut = len(data) if final else _row_boundary(data)
+            if cut == 0 and not final:
+                return state
+
+            block = _parse_block(data[:cut], state['columns'])
+            if state['columns'] is None:
+                state['columns'] = [str(column) for column in block.columns]
+
+            if len(block):
+                numeric, profile = _aggregate_block(block)
+                text_path, numeric_path = _part_paths(parse_dir, state['parts'])
+                block.reset_index(drop=True).to_feather(text_path)
+                numeric.reset_index(drop=True).to_feather(numeric_path)
+                state['profiles'].append(profile)
+                state['parts'] += 1
+                state['rows'] += len(block)
+
+            state['parsed_bytes'] += cut
+            if final:
+                state['status'] = 'complete'
+        except FileNotFoundError:
+            return state  # Part file renamed on completion; the final parse picks up
+        except (ValueError, UnicodeDecodeError, pd.errors.ParserError) as e:
+            # Analyses fall back to parsing the whole file
+            logger.warning(f"Incremental CSV parse stopped for {parse_dir}: {e}")
+            state['status'] = 'unsupported'
+
+        _save_state(parse_dir, state)
+        return state
+
+
+def schedule_parse(parse_dir: str, data_path: str, available_bytes: int, final: bool = False):
+    """Run advance_parse in the background parse thread"""
+    def run():
+        try:
+            advance_parse(parse_dir, data_path, available_bytes, final=final)
+        except Exception as e:
+            logger.error(f"Incremental CSV parse failed for {parse_dir}: {e}")
+
+    _executor.submit(run)
+
+
+def get_parse_state(parse_dir: str) -> Optional[Dict[str, Any]]:
+    """Get parser state of a session (None if parsing never started)"""
+    if not os.path.isdir(parse_dir):
+        return None
+    return _load_state(parse_dir)
+
+
+def _column_kind(column: str, profiles: List[Dict[str, Any]]) -> str:
+    """
+    Combine per-part profiles into the type read_csv infers for the whole file
+
+    Returns:
+        'numeric', 'bool' or 'text'
+    """
+    if all(column in profile['numeric'] for profile in profiles):
+        return 'numeric'
+
+    if all(column in profile['bool_values'] or column in profile['empty'] for profile in profiles):
+        return 'bool'
+
+    return 'text'
+
+
+def _read_part(parse_dir: str, index: int, rows: int, text: List[str], numeric: List[str]) -> pd.DataFrame:
+    """Read only the given text and numeric columns of a part"""
+    text_path, numeric_path = _part_paths(parse_dir, index)
+    frames = []
+
+    if text:
+        frame = pd.read_feather(text_path, columns=text)
+        # Arrow gives None for missing strings where read_csv gives NaN
+        frames.append(frame.fillna(np.nan))
+    if numeric:
+        frames.append(pd.read_feather(numeric_path, columns=numeric))
+
+    if not frames:
+        return pd.DataFrame(index=range(rows))
+
+    return pd.concat(frames, axis=1)
+
+
+def load_parsed_frame(parse_dir: str, data_path: str, file_size: int,
+                      columns: Optional[Iterable[str]] = None) -> Optional[pd.DataFrame]:
+    """
+    Assemble the parsed frame of a completed upload
+
+    Parses whatever is left of the file, then concatenates the requested
+    columns of the parts; types come from the parts' profiles, so numeric
+    columns are never converted again.
+
+    Args:
+        parse_dir: Parse directory of the session
+        data_path: Completed upload file
+        file_size: Total file size in bytes
+        columns: Only read these columns (compared stripped) from the parts
+
+    Returns:
+        Parsed DataFrame, or None if the upload was not parsed incrementally
+    """
+    if get_parse_state(parse_dir) is None:
+        return None
+
+    state = advance_parse(parse_dir, data_path, file_size, final=True, blocking=True)
+    if state is None or state['status'] != 'complete' or 'profiles' not in state:
+        return None
+
+    selected = state['columns']
+    if columns is not None:
+        wanted = set(columns)
+        selected = [column for column in selected if column.strip() in wanted]
+
+    if not state['parts']:
+        return pd.DataFrame(columns=selected)
+
+    profiles = state['profiles']
+    kinds = {column: _column_kind(column, profiles) for column in selected}
+    numeric = [column for column in selected if kinds[column] == 'numeric']
+    text = [column for column in selected if kinds[column] != 'numeric']
+
+    parts = [
+        _read_part(parse_dir, index, profile['rows'], text, numeric)
+        for index, profile in enumerate(profiles)
+    ]
+    frame = pd.concat(parts, ignore_index=True)[selected]
+
+    for column in text:
+        if kinds[column] == 'bool':
+            frame[column] = frame[column].map(_BOOL_VALUES)
+
+    return frame
+
+
+def remove_parse_dir(parse_dir: str):
+    """Delete parsed parts and parser state of a session"""
+    shutil.rmtree(parse_dir, ignore_errors=True)
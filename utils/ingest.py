@@ -0,0 +1,247 @@
+"""
+Upload ingestion without temp-file round trips
+Multipart file parts are spooled in memory up to UPLOAD_SPOOL_MAX_MEMORY and
+parsed straight from that spool; only larger parts roll over to a temp file.
+Files completed through /uploads are opened in place by upload session ID.
+"""
+from abc import ABC, abstractmethod
+from flask import Request, current_app, request, g
+from werkzeug.datastructures import FileStorage
+from tempfile import SpooledTemporaryFile
+from typing import IO, Callable, Iterable, List, Optional
+from middleware.error_handler import ValidationError, NotFoundError, AuthorizationError
+from utils.validators import validate_file, get_file_extension
+from utils.incremental_csv import parse_dir_path, load_parsed_frame
+from utils.response import fingerprint_upload
+
+import pandas as pd
+
+
+# Werkzeug's own default spools only 500KB before writing to disk
+DEFAULT_SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+
+
+class SpoolingRequest(Request):
+    """
+    Request class that keeps uploaded file parts in memory below a threshold
+
+    Each file part is written once, into a SpooledTemporaryFile; it only
+    becomes a temp file when it exceeds UPLOAD_SPOOL_MAX_MEMORY bytes.
+    """
+
+    def _get_file_stream(
+        self,
+        total_content_length: Optional[int],
+        content_type: Optional[str],
+        filename: Optional[str] = None,
+        content_length: Optional[int] = None
+    ) -> IO[bytes]:
+        max_memory = current_app.config.get('UPLOAD_SPOOL_MAX_MEMORY', DEFAULT_SPOOL_MAX_MEMORY)
+        return SpooledTemporaryFile(
+            max_size=max_memory,
+            mode='rb+',
+            dir=current_app.config.get('UPLOAD_FOLDER')
+        )
+
+
+def open_upload_stream(file: FileStorage) -> IO[bytes]:
+    """
+    Get the spooled stream of an uploaded file, rewound to the start
+
+    Args:
+        file: Uploaded file object
+
+    Returns:
+        Readable, seekable binary stream
+    """
+    stream = file.stream
+    stream.seek(0)
+    return stream
+
+
+def read_upload_bytes(file: FileStorage) -> bytes:
+    """
+    Read the full content of an uploaded file
+
+    Args:
+        file: Uploaded file object
+
+    Returns:
+        File content
+    """
+    return open_upload_stream(file).read()
+
+
+def column_filter(columns: Iterable[str]) -> Callable[[str], bool]:
+    """
+    Build a usecols callable selecting columns by name
+
+    Header names are compared stripped, and names missing from the file
+    are ignored instead of failing the parse.
+
+    Args:
+        columns: Column names to load
+
+    Returns:
+        Callable for the usecols argument of read_csv / read_excel
+    """
+    wanted = set(columns)
+    return lambda column: str(column).strip() in wanted
+
+
+def read_upload_frame(file: FileStorage, columns: Optional[Iterable[str]] = None, **read_kwargs) -> pd.DataFrame:
+    """
+    Parse an uploaded CSV or Excel file directly from its spooled stream
+
+    Args:
+        file: Uploaded file object
+        columns: Only load these columns (None for all); the others are
+            skipped by the parser instead of being parsed and dropped
+        **read_kwargs: Extra arguments for pandas.read_csv / read_excel
+
+    Returns:
+        Parsed DataFrame
+    """
+    stream = open_upload_stream(file)
+
+    if columns is not None:
+        read_kwargs['usecols'] = column_filter(columns)
+
+    if get_file_extension(file.filename) == 'csv':
+        return pd.read_csv(stream, **read_kwargs)
+
+    return pd.read_excel(stream, **read_kwargs)
+
+
+class UploadSource(ABC):
+    """Input file of an analysis, from the request body or a completed upload session"""
+
+    filename: str
+
+    @abstractmethod
+    def fingerprint(self) -> str:
+        """Get fingerprint identifying the file content (for input ETags)"""
+
+    @abstractmethod
+    def read_frame(self, columns: Optional[Iterable[str]] = None, **read_kwargs) -> pd.DataFrame:
+        """Parse the file as a DataFrame (CSV or Excel by extension), optionally only some columns"""
+
+    @abstractmethod
+    def read_bytes(self) -> bytes:
+        """Read the full file content"""
+
+
+class FileUploadSource(UploadSource):
+    """File sent in the request as multipart form data"""
+
+    def __init__(self, file: FileStorage):
+        self.file = file
+        self.filename = file.filename
+
+    def fingerprint(self) -> str:
+        return fingerprint_upload(self.file)
+
+    def read_frame(self, columns: Optional[Iterable[str]] = None, **read_kwargs) -> pd.DataFrame:
+        return read_upload_frame(self.file, columns=columns, **read_kwargs)
+
+    def read_bytes(self) -> bytes:
+        return read_upload_bytes(self.file)
+
+
+class SessionUploadSource(UploadSource):
+    """File completed through the chunked upload endpoints, read in place"""
+
+    def __init__(self, session, upload_folder: str):
+        self.session = session
+        self.path = session.storage_path
+        self.filename = session.filename
+        self.parse_dir = parse_dir_path(upload_folder, session.session_id)
+
+    def fingerprint(self) -> str:
+        # A completed upload never changes, so no need to hash its content
+        completed_at = self.session.completed_at.isoformat() if self.session.completed_at else ''
+        return f'upload:{self.session.session_id}:{self.session.file_size}:{completed_at}'
+
+    def read_frame(self, columns: Optional[Iterable[str]] = None, **read_kwargs) -> pd.DataFrame:
+        if get_file_extension(self.filename) == 'csv':
+            # Reuse rows parsed while the chunks were arriving
+            if not read_kwargs:
+                frame = load_parsed_frame(self.parse_dir, self.path, self.session.file_size, columns=columns)
+                if frame is not None:
+                    return frame
+            if columns is not None:
+                read_kwargs['usecols'] = column_filter(columns)
+            return pd.read_csv(self.path, memory_map=True, **read_kwargs)
+
+        if columns is not None:
+            read_kwargs['usecols'] = column_filter(columns)
+
+        return pd.read_excel(self.path, **read_kwargs)
+
+    def read_bytes(self) -> bytes:
+        with open(self.path, 'rb') as upload_file:
+            return upload_file.read()
+
+
+def get_upload_source(field: str = 'file', allowed_extensions: Optional[List[str]] = None) -> UploadSource:
+    """
+    Get an analysis input file from the request
+
+    The file is either sent as form data in `field`, or referenced by the ID
+    of a completed upload session in the `upload_session_id` form field or
+    query parameter (`<field>_upload_session_id` for fields other than
+    'file'), so large files do not have to be sent twice.
+
+    Args:
+        field: Form field of the file
+        allowed_extensions: Allowed file extensions (None for any)
+
+    Returns:
+        UploadSource for the file
+
+    Raises:
+        ValidationError: If no file is given or it is invalid
+        NotFoundError: If the upload session does not exist
+        AuthorizationError: If the upload session belongs to another user
+    """
+    from models.upload_session import UploadSession
+
+    session_param = 'upload_session_id' if field == 'file' else f'{field}_upload_session_id'
+    session_id = request.form.get(session_param) or request.args.get(session_param)
+
+    if not session_id:
+        if field not in request.files:
+            raise ValidationError(
+                f'No file provided. Send {field} or {session_param}',
+                details={'field': field}
+            )
+
+        file = request.files[field]
+        validate_file(
+            file,
+            allowed_extensions=allowed_extensions,
+            max_size=current_app.config['MAX_CONTENT_LENGTH']
+        )
+        return FileUploadSource(file)
+
+    session = UploadSession.query.filter_by(session_id=session_id).first()
+
+    if not session:
+        raise NotFoundError('Upload session not found')
+
+    # Verify ownership
+    if session.user_id != g.user_id:
+        raise AuthorizationError('Not authorized to use this upload')
+
+    if session.status != 'completed' or not session.storage_path:
+        raise ValidationError('Upload session is not completed', details={'field': session_param})
+
+    if allowed_extensions:
+        ext = get_file_extension(session.filename)
+        if ext not in allowed_extensions:
+            raise ValidationError(
+                f"Invalid file type '{ext}'. Allowed: {', '.join(allowed_extensions)}",
+                details={'field': session_param, 'filename': session.filename, 'extension': ext}
+            )
+
+    return SessionUploadSource(session, current_app.config['UPLOAD_FOLDER'])
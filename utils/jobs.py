@@ -0,0 +1,127 @@
+"""
+Analyses that can outlive their request
+Computations run on a shared thread pool while the request waits for them
+until its deadline. Unfinished computations then either continue as an
+async job whose progress and result handles are published through the
+progress store, or are left to stop at their next deadline check
+"""
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from functools import partial
+from typing import Any, Callable, Dict, Tuple
+from utils.deadline import Deadline, DeadlineExceeded
+from utils.progress import create_progress_tracker
+import logging
+import os
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def get_job_executor(max_workers: int = 4) -> ThreadPoolExecutor:
+    """
+    Get this process's job pool (created on first use)
+
+    Args:
+        max_workers: Computations run at once by the process
+    """
+    global _executor, _executor_pid
+
+    with _executor_lock:
+        # Pool threads do not survive a fork
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analysis-job')
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def run_until_deadline(
+    computations: Dict[str, Callable[[], Any]],
+    deadline: Deadline,
+    max_workers: int = 4
+) -> Tuple[Dict[str, Any], Dict[str, Future]]:
+    """
+    Run computations concurrently and wait for them until the deadline
+
+    Errors of finished computations are raised; one stopped by its own
+    deadline check counts as unfinished.
+
+    Args:
+        computations: Callables by name
+        deadline: Request deadline
+        max_workers: Size of the job pool
+
+    Returns:
+        Tuple of (results of finished computations, futures of unfinished
+        ones), both by name
+    """
+    executor = get_job_executor(max_workers)
+    futures = {name: executor.submit(compute) for name, compute in computations.items()}
+
+    wait(futures.values(), timeout=deadline.remaining())
+
+    results = {}
+    pending = {}
+    for name, future in futures.items():
+        if future.done() and not isinstance(future.exception(), DeadlineExceeded):
+            results[name] = future.result()
+        else:
+            pending[name] = future
+
+    return results, pending
+
+
+def continue_as_job(
+    pending: Dict[str, Future],
+    on_result: Callable[[str, Any], Dict[str, Any]],
+    user_id=None
+) -> str:
+    """
+    Track unfinished computations as an async job
+
+    Each finished computation is passed to on_result (e.g. to store it);
+    what it returns is published under the job progress' 'results'
+    metadata by computation name.
+
+    Args:
+        pending: Futures of unfinished computations by name
+        on_result: Callback(name, result) returning the job result entry
+        user_id: Owner of the job
+
+    Returns:
+        Operation ID of the job (see GET /loans/progress/<operation_id>)
+    """
+    operation_id = uuid.uuid4().hex
+    tracker = create_progress_tracker(operation_id, total_steps=len(pending), user_id=user_id)
+    tracker.update(0, f"Running {', '.join(pending)}", pending=list(pending), results={})
+
+    results = {}
+    lock = threading.Lock()
+
+    def finished(name, future):
+        try:
+            entry = on_result(name, future.result())
+        except Exception as e:
+            logger.error(f"Job {operation_id} failed in {name}: {str(e)}")
+            with lock:
+                tracker.update(tracker.current_step, f"Error in {name}: {str(e)}", error=True, results=dict(results))
+            return
+
+        # Updates are made under the lock so the step count never goes back
+        with lock:
+            results[name] = entry
+            waiting = [other for other in pending if other not in results]
+            if waiting:
+                tracker.update(len(results), f"Finished {name}", pending=waiting, results=dict(results))
+            else:
+                tracker.update(len(results), "Completed", completed=True, pending=[], results=dict(results))
+
+    for name, future in pending.items():
+        future.add_done_callback(partial(finished, name))
+
+    return operation_id
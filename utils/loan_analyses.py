@@ -0,0 +1,314 @@
+"""
+Loan portfolio analyses computed from a shared, cleaned frame
+The load, column cleaning and numeric typing steps are done once per file
+and reused by every analysis run on it
+"""
+from middleware.error_handler import ValidationError
+from utils.progress import StageProgress
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+import logging
+import threading
+import time
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class LoanFrame:
+    """
+    Portfolio frame shared by several analyses
+
+    Column names are stripped once and numeric conversions are memoized,
+    so analyses reading the same column only convert it once. Analyses
+    build their own frames from it and never modify it.
+
+    Time spent converting columns is kept in clean_seconds, so callers can
+    report cleaning separately from the analyses themselves. With a request
+    deadline, every conversion first checks it (raising DeadlineExceeded),
+    and so do the stages and row blocks of each analysis (see stages()).
+    """
+
+    def __init__(self, frame: pd.DataFrame, deadline=None):
+        self.frame = frame.rename(columns=lambda column: column.strip() if isinstance(column, str) else column)
+        self.deadline = deadline
+        self.clean_seconds = 0.0
+        self._numeric: Dict[Tuple[str, bool], pd.Series] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.frame)
+
+    def stages(self) -> StageProgress:
+        """Get stage hooks for one analysis, checking the deadline between stages and row blocks"""
+        return StageProgress(None, [], deadline=self.deadline)
+
+    def missing_columns(self, columns: List[str]) -> List[str]:
+        """Get the given columns that are missing from the frame"""
+        return [column for column in columns if column not in self.frame.columns]
+
+    def numeric(self, column: str, clean_symbols: bool = False) -> pd.Series:
+        """
+        Get column converted to numbers (invalid or missing values become 0)
+
+        Args:
+            column: Column name
+            clean_symbols: Strip currency symbols, separators and other
+                non-numeric characters before converting
+
+        Returns:
+            Numeric series (all zeros if the column does not exist)
+        """
+        key = (column, clean_symbols)
+
+        with self._lock:
+            if key not in self._numeric:
+                if self.deadline is not None:
+                    self.deadline.check(f'converting {column}')
+                started = time.perf_counter()
+                if column not in self.frame.columns:
+                    values = pd.Series(0, index=self.frame.index)
+                else:
+                    values = self.frame[column]
+                    if clean_symbols:
+                        values = values.astype(str).str.replace(r'[^\d\.\-]', '', regex=True)
+                    values = pd.to_numeric(values, errors='coerce').fillna(0)
+                self._numeric[key] = values
+                self.clean_seconds += time.perf_counter() - started
+
+            return self._numeric[key]
+
+    def select(self, columns: List[str], numeric_columns: List[str]) -> pd.DataFrame:
+        """
+        Build a frame with the given columns, creating missing ones
+
+        Missing numeric columns are filled with 0, other missing columns
+        with 'Unknown'.
+
+        Args:
+            columns: Columns of the new frame, in order
+            numeric_columns: Columns to convert to numbers
+
+        Returns:
+            New DataFrame
+        """
+        data = {}
+        for column in columns:
+            if column in numeric_columns:
+                data[column] = self.numeric(column)
+            elif column in self.frame.columns:
+                data[column] = self.frame[column]
+            else:
+                data[column] = pd.Series('Unknown', index=self.frame.index)
+
+        return pd.DataFrame(data, index=self.frame.index)
+
+
+class AnalysisResult(NamedTuple):
+    """Result frame and summary of an analysis"""
+    frame: pd.DataFrame
+    summary: Dict[str, Any]
+
+
+def arrange_dues(loans: LoanFrame) -> AnalysisResult:
+    """
+    Organize dues by field officer
+
+    Args:
+        loans: Shared portfolio frame
+
+    Returns:
+        Dues per officer and overall totals
+    """
+    # Check for required columns
+    required_columns = ['FullNames', 'FieldOfficer', 'Amount Due', 'Arrears']
+    missing = loans.missing_columns(required_columns)
+    if missing:
+        raise ValidationError(f'Missing columns: {", ".join(missing)}')
+
+    progress = loans.stages()
+
+    df_processed = pd.DataFrame({
+        'FieldOfficer': loans.frame['FieldOfficer'],
+        'FullNames': loans.frame['FullNames'],
+        'Amount Due': loans.numeric('Amount Due', clean_symbols=True),
+        'Arrears': loans.numeric('Arrears', clean_symbols=True)
+    })
+
+    # Group by Field Officer
+    progress.stage('group')
+    grouped = df_processed.groupby('FieldOfficer').agg({
+        'FullNames': 'count',
+        'Amount Due': 'sum',
+        'Arrears': 'sum'
+    }).reset_index()
+
+    grouped.columns = ['FieldOfficer', 'ClientCount', 'TotalAmountDue', 'TotalArrears']
+
+    summary = {
+        'total_clients': len(df_processed),
+        'officer_count': len(grouped),
+        'total_amount_due': float(df_processed['Amount Due'].sum()),
+        'total_arrears': float(df_processed['Arrears'].sum())
+    }
+
+    logger.info(f"Arranged dues: {len(df_processed)} clients, {len(grouped)} officers")
+
+    return AnalysisResult(grouped, summary)
+
+
+def _arrears_bucket(days):
+    """Bucket for days in arrears"""
+    if days < 1: return "Current"
+    if 1 <= days <= 3: return "1-3 Days"
+    if 4 <= days <= 5: return "4-5 Days"
+    if 6 <= days <= 9: return "6-9 Days"
+    if 10 <= days <= 30: return "10-30 Days"
+    return "31+ Days"
+
+
+def arrange_arrears(loans: LoanFrame) -> AnalysisResult:
+    """
+    Arrange arrears by sales rep and days-in-arrears bucket
+
+    Args:
+        loans: Shared portfolio frame
+
+    Returns:
+        Arrears per sales rep and bucket, with dashboard totals
+    """
+    # Required columns (created if missing)
+    required_cols = ['FullNames', 'Arrears Amount', 'DaysInArrears', 'LoanBalance', 'SalesRep']
+    numeric_cols = ['Arrears Amount', 'DaysInArrears', 'LoanBalance']
+
+    progress = loans.stages()
+    df_clean = loans.select(required_cols, numeric_cols)
+
+    progress.stage('bucket')
+    df_clean['Bucket'] = progress.apply(df_clean['DaysInArrears'], lambda block: block.apply(_arrears_bucket))
+
+    # Sort
+    progress.stage('sort')
+    df_clean.sort_values(['SalesRep', 'DaysInArrears'], ascending=[True, True], inplace=True)
+
+    # Group by SalesRep and Bucket
+    progress.stage('group')
+    summary = df_clean.groupby(['SalesRep', 'Bucket']).agg({
+        'FullNames': 'count',
+        'Arrears Amount': 'sum',
+        'LoanBalance': 'sum'
+    }).reset_index()
+
+    summary.columns = ['SalesRep', 'Bucket', 'ClientCount', 'TotalArrears', 'TotalPortfolio']
+
+    # Overall summary
+    overall_summary = {
+        'total_clients': len(df_clean),
+        'total_arrears': float(df_clean['Arrears Amount'].sum()),
+        'total_portfolio': float(df_clean['LoanBalance'].sum()),
+        'sales_reps': df_clean['SalesRep'].nunique(),
+        'bucket_distribution': df_clean['Bucket'].value_counts().to_dict()
+    }
+
+    logger.info(f"Arranged arrears: {len(df_clean)} clients")
+
+    return AnalysisResult(summary, overall_summary)
+
+
+def _categorize_risk(row):
+    """Risk category from the arrears to balance ratio"""
+    arrears = row['Arrears']
+    balance = row['LoanBalance']
+
+    if balance == 0:
+        return "Unknown"
+
+    risk_ratio = arrears / balance if balance > 0 else 0
+
+    if risk_ratio > 0.3:
+        return "High Risk"
+    elif risk_ratio > 0.1:
+        return "Medium Risk"
+    else:
+        return "Low Risk"
+
+
+def mtd_unpaid_dues(loans: LoanFrame) -> AnalysisResult:
+    """
+    Analyze MTD unpaid dues risk by field officer
+
+    Args:
+        loans: Shared portfolio frame
+
+    Returns:
+        Clients and amounts per officer and risk category, with totals
+    """
+    # Required columns (created if missing)
+    required = ["FullNames", "Arrears", "LoanBalance", "FieldOfficer"]
+    numeric_cols = ["Arrears", "LoanBalance"]
+
+    progress = loans.stages()
+    df_clean = loans.select(required, numeric_cols)
+
+    progress.stage('risk')
+    df_clean['RiskCategory'] = progress.apply(df_clean, lambda block: block.apply(_categorize_risk, axis=1))
+
+    # Group by officer and risk
+    progress.stage('group')
+    summary = df_clean.groupby(['FieldOfficer', 'RiskCategory']).agg({
+        'FullNames': 'count',
+        'Arrears': 'sum',
+        'LoanBalance': 'sum'
+    }).reset_index()
+
+    summary.columns = ['FieldOfficer', 'RiskCategory', 'ClientCount', 'TotalArrears', 'TotalPortfolio']
+
+    # Overall statistics
+    overall_summary = {
+        'total_clients': len(df_clean),
+        'total_arrears': float(df_clean['Arrears'].sum()),
+        'total_portfolio': float(df_clean['LoanBalance'].sum()),
+        'high_risk_clients': len(df_clean[df_clean['RiskCategory'] == 'High Risk']),
+        'medium_risk_clients': len(df_clean[df_clean['RiskCategory'] == 'Medium Risk']),
+        'low_risk_clients': len(df_clean[df_clean['RiskCategory'] == 'Low Risk'])
+    }
+
+    logger.info(f"MTD unpaid dues analysis: {len(df_clean)} clients")
+
+    return AnalysisResult(summary, overall_summary)
+
+
+class AnalysisSpec(NamedTuple):
+    """Registered portfolio analysis"""
+    compute: Callable[[LoanFrame], AnalysisResult]
+    input_columns: List[str]  # Only these columns are loaded from the file
+    cursor_fields: Optional[List[str]]
+    allowed_extensions: Optional[List[str]]
+
+
+# Analyses that run on a single portfolio file, by endpoint name
+ANALYSES: Dict[str, AnalysisSpec] = {
+    'arrange-dues': AnalysisSpec(
+        arrange_dues,
+        ['FullNames', 'FieldOfficer', 'Amount Due', 'Arrears'],
+        ['FieldOfficer'],
+        ['csv']
+    ),
+    'arrange-arrears': AnalysisSpec(
+        arrange_arrears,
+        ['FullNames', 'Arrears Amount', 'DaysInArrears', 'LoanBalance', 'SalesRep'],
+        ['SalesRep', 'Bucket'],
+        None
+    ),
+    'mtd-unpaid-dues': AnalysisSpec(
+        mtd_unpaid_dues,
+        ['FullNames', 'Arrears', 'LoanBalance', 'FieldOfficer'],
+        ['FieldOfficer', 'RiskCategory'],
+        None
+    )
+}
+
+
+def input_columns(analyses: List[str]) -> List[str]:
+    """Get columns to load for running the given analyses on one file"""
+    return list(dict.fromkeys(column for name in analyses for column in ANALYSES[name].input_columns))
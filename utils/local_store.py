@@ -0,0 +1,205 @@
+"""
+Node-local shared state without an external service
+A SQLite file in WAL mode that every worker process on the host opens;
+updates are single transactions, so counters stay exact across processes.
+Also holds JSON values with a TTL (e.g. progress of running operations)
+"""
+from typing import Any, Dict, Iterable, Optional, Tuple
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+# Seconds between sweeps of expired rows (per process)
+PURGE_INTERVAL = 60.0
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS counters ('
+    ' key TEXT PRIMARY KEY,'
+    ' value INTEGER NOT NULL,'
+    ' expires_at REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS ix_counters_expires_at ON counters (expires_at)',
+    'CREATE TABLE IF NOT EXISTS entries ('
+    ' key TEXT PRIMARY KEY,'
+    ' value TEXT NOT NULL,'
+    ' expires_at REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS ix_entries_expires_at ON entries (expires_at)'
+)
+
+
+class LocalStore:
+    """
+    SQLite-backed store shared by all worker processes on one host
+
+    Each thread keeps its own connection (reopened after a fork). WAL mode
+    lets readers proceed while a write is in progress, and with
+    synchronous=NORMAL a commit does not wait for an fsync.
+    """
+
+    def __init__(self, path: str, timeout: float = 5.0):
+        """
+        Args:
+            path: Database file (created if missing)
+            timeout: Seconds to wait for another process's write lock
+        """
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._last_purge = 0.0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        connection = self._connection()
+        for statement in _SCHEMA:
+            connection.execute(statement)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's connection"""
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            # Connections must not be shared with a forked parent
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = pid
+
+        return self._local.connection
+
+    def incr(self, key: str, expiry: float, amount: int = 1) -> Tuple[int, float]:
+        """
+        Atomically add to a counter, starting a new window if it expired
+
+        Args:
+            key: Counter key
+            expiry: Seconds until a new counter expires
+            amount: Amount to add
+
+        Returns:
+            Tuple of (new value, expiry timestamp)
+        """
+        now = time.time()
+        connection = self._connection()
+
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute(
+                'INSERT INTO counters (key, value, expires_at) VALUES (?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET '
+                ' value = CASE WHEN expires_at <= ? THEN excluded.value ELSE value + excluded.value END,'
+                ' expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END',
+                (key, amount, now + expiry, now, now)
+            )
+            value, expires_at = connection.execute(
+                'SELECT value, expires_at FROM counters WHERE key = ?', (key,)
+            ).fetchone()
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+        if now - self._last_purge >= PURGE_INTERVAL:
+            self.purge_expired()
+
+        return value, expires_at
+
+    def get_counter(self, key: str) -> Tuple[int, Optional[float]]:
+        """
+        Get a counter
+
+        Returns:
+            Tuple of (value, expiry timestamp); (0, None) if missing or expired
+        """
+        row = self._connection().execute(
+            'SELECT value, expires_at FROM counters WHERE key = ? AND expires_at > ?',
+            (key, time.time())
+        ).fetchone()
+
+        return (row[0], row[1]) if row else (0, None)
+
+    def delete_counter(self, key: str):
+        """Remove a counter"""
+        self._connection().execute('DELETE FROM counters WHERE key = ?', (key,))
+
+    def clear_counters(self) -> int:
+        """Remove all counters and return how many there were"""
+        return self._connection().execute('DELETE FROM counters').rowcount
+
+    def set_values(self, items: Dict[str, Any], ttl: float):
+        """
+        Store several JSON values in one transaction
+
+        Args:
+            items: Values by key (replacing existing values)
+            ttl: Seconds until the values expire
+        """
+        if not items:
+            return
+
+        now = time.time()
+        rows = [(key, json.dumps(value, default=str), now + ttl) for key, value in items.items()]
+
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(
+                'INSERT INTO entries (key, value, expires_at) VALUES (?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at',
+                rows
+            )
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+        if now - self._last_purge >= PURGE_INTERVAL:
+            self.purge_expired()
+
+    def get_values(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Get the unexpired values among the given keys"""
+        keys = list(keys)
+        if not keys:
+            return {}
+
+        placeholders = ','.join('?' * len(keys))
+        rows = self._connection().execute(
+            f'SELECT key, value FROM entries WHERE key IN ({placeholders}) AND expires_at > ?',
+            (*keys, time.time())
+        ).fetchall()
+
+        return {key: json.loads(value) for key, value in rows}
+
+    def get_values_with_prefix(self, prefix: str) -> Dict[str, Any]:
+        """Get the unexpired values whose keys start with prefix"""
+        rows = self._connection().execute(
+            'SELECT key, value FROM entries WHERE key >= ? AND key < ? AND expires_at > ?',
+            (prefix, prefix + '\uffff', time.time())
+        ).fetchall()
+
+        return {key: json.loads(value) for key, value in rows}
+
+    def get_value(self, key: str) -> Optional[Any]:
+        """Get a value (None if missing or expired)"""
+        return self.get_values([key]).get(key)
+
+    def delete_value(self, key: str):
+        """Remove a value"""
+        self._connection().execute('DELETE FROM entries WHERE key = ?', (key,))
+
+    def purge_expired(self):
+        """Delete expired rows"""
+        self._last_purge = time.time()
+        connection = self._connection()
+        connection.execute('DELETE FROM counters WHERE expires_at <= ?', (self._last_purge,))
+        connection.execute('DELETE FROM entries WHERE expires_at <= ?', (self._last_purge,))
+
+    def ping(self) -> bool:
+        """Check the database file is usable"""
+        try:
+            self._connection().execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
@@ -0,0 +1,243 @@
+"""
+Queued logging pipeline
+Log calls only put records on a bounded in-memory queue; a background writer
+formats them and writes them to the console/log file in batches, so request
+threads never wait on disk or terminal I/O
+"""
+from datetime import datetime
+from logging.handlers import QueueHandler
+from typing import Any, Dict, List, Optional
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import threading
+
+
+# Attributes every LogRecord has; anything else was passed via extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including extra= fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'timestamp': datetime.utcfromtimestamp(record.created).isoformat() + 'Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+
+        return json.dumps(entry, default=str)
+
+
+class BatchEmitMixin:
+    """Write a batch of records with one write and one flush"""
+
+    def emit_batch(self, records: List[logging.LogRecord]):
+        lines = []
+        for record in records:
+            if record.levelno < self.level:
+                continue
+            try:
+                lines.append(self.format(record))
+            except Exception:
+                self.handleError(record)
+
+        if not lines:
+            return
+
+        self.acquire()
+        try:
+            if self.stream is None:  # FileHandler opened with delay=True
+                self.stream = self._open()
+            self.stream.write(self.terminator.join(lines) + self.terminator)
+            self.flush()
+        finally:
+            self.release()
+
+
+class BatchStreamHandler(BatchEmitMixin, logging.StreamHandler):
+    """Console handler writing batches"""
+
+
+class BatchFileHandler(BatchEmitMixin, logging.FileHandler):
+    """Log file handler writing batches"""
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Queue handler that never waits
+
+    Records are dropped (and counted) when the queue is full instead of
+    blocking the logging thread. Only the message and exception text are
+    resolved here; JSON/text formatting happens on the writer thread.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogWriter:
+    """
+    Background thread draining the log queue into the real handlers
+
+    Every record waiting in the queue (up to batch_size) is written in one
+    batch, so bursts cost one write and flush per handler instead of one
+    per record.
+    """
+
+    _STOP = object()
+
+    def __init__(self, log_queue: queue.Queue, handlers: List[logging.Handler], batch_size: int = 200):
+        self.queue = log_queue
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        """Write all queued records and stop the thread"""
+        if self._thread.is_alive():
+            self.queue.put(self._STOP)
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = [self.queue.get()]
+
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if self._STOP in batch:
+                stopping = True
+                batch = [record for record in batch if record is not self._STOP]
+
+            self._write(batch)
+
+    def _write(self, batch: List[logging.LogRecord]):
+        for handler in self.handlers:
+            if isinstance(handler, BatchEmitMixin):
+                handler.emit_batch(batch)
+            else:
+                for record in batch:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+
+
+class LoggingPipeline:
+    """Queue handler installed on the root logger plus its writer"""
+
+    def __init__(self, queue_handler: NonBlockingQueueHandler, writer: LogWriter):
+        self.queue_handler = queue_handler
+        self.writer = writer
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and records dropped because the queue was full"""
+        return {
+            'queued': self.queue_handler.queue.qsize(),
+            'dropped': self.queue_handler.dropped
+        }
+
+    def stop(self):
+        self.writer.stop()
+
+
+def configure_logging(
+    level: str = 'INFO',
+    log_format: str = 'json',
+    log_file: Optional[str] = None,
+    queue_size: int = 10000,
+    batch_size: int = 200
+) -> LoggingPipeline:
+    """
+    Route all logging through the queued pipeline (once per process)
+
+    Later calls return the existing pipeline unchanged, so processors and
+    app instances can call this freely without adding handlers.
+
+    Args:
+        level: Root log level
+        log_format: 'json' or 'text'
+        log_file: Also write to this file (None or empty for console only)
+        queue_size: Records buffered before new ones are dropped
+        batch_size: Maximum records written per batch
+
+    Returns:
+        LoggingPipeline instance
+    """
+    global _pipeline
+
+    with _pipeline_lock:
+        if _pipeline is not None:
+            return _pipeline
+
+        formatter = JsonFormatter() if log_format == 'json' else logging.Formatter(TEXT_FORMAT)
+
+        handlers = [BatchStreamHandler()]
+        if log_file:
+            log_dir = os.path.dirname(log_file)
+            if log_dir:
+                os.makedirs(log_dir, exist_ok=True)
+            handlers.append(BatchFileHandler(log_file, delay=True))
+
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        log_queue = queue.Queue(maxsize=queue_size)
+        queue_handler = NonBlockingQueueHandler(log_queue)
+        writer = LogWriter(log_queue, handlers, batch_size=batch_size)
+
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(level)
+
+        writer.start()
+        _pipeline = LoggingPipeline(queue_handler, writer)
+        atexit.register(_pipeline.stop)
+
+        return _pipeline
+
+
+def get_logging_pipeline() -> Optional[LoggingPipeline]:
+    """Get the configured pipeline (None before configure_logging)"""
+    return _pipeline
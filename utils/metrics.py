@@ -0,0 +1,350 @@
+"""
+Request stage timing and Prometheus metrics
+Handlers time their stages (parse, clean, compute, excel, serialize,
+compress) with timed_stage/record_stage; MetricsMiddleware reports them in
+the Server-Timing header and adds them to the latency histograms served
+at /metrics
+
+Every worker process publishes its metrics to a LocalStore file shared by
+the workers of the host, so a scrape of any worker returns all of them,
+each series labelled with its worker.
+"""
+from flask import g, has_request_context
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from utils.local_store import LocalStore
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# Histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def record_stage(stage: str, seconds: float):
+    """
+    Add time spent in a stage of the current request
+
+    Repeated stages (e.g. parsing two input files) are summed. Outside a
+    request (worker threads, CLI processors) this does nothing.
+
+    Args:
+        stage: Stage name, e.g. 'parse', 'compute', 'serialize'
+        seconds: Time spent
+    """
+    if not has_request_context():
+        return
+
+    timings = g.setdefault('stage_timings', {})
+    timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed_stage(stage: str) -> Iterator[None]:
+    """Time the enclosed block as a stage of the current request"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+def record_rows(count: int, columns: Optional[int] = None):
+    """
+    Add input rows processed by the current request
+
+    Args:
+        count: Rows processed
+        columns: Columns of the input (the widest input is kept)
+    """
+    if has_request_context():
+        g.rows_processed = g.get('rows_processed', 0) + count
+        if columns is not None:
+            g.input_columns = max(g.get('input_columns', 0), columns)
+
+
+def get_stage_timings() -> Dict[str, float]:
+    """Get stage timings recorded for the current request"""
+    return g.get('stage_timings', {}) if has_request_context() else {}
+
+
+def add_server_timing(response, metric: str, seconds: float, description: Optional[str] = None):
+    """Append a metric to the Server-Timing header"""
+    entry = f'{metric};dur={seconds * 1000:.2f}'
+    if description:
+        entry += f';desc="{description}"'
+
+    existing = response.headers.get('Server-Timing')
+    response.headers['Server-Timing'] = f'{existing}, {entry}' if existing else entry
+
+
+class Histogram:
+    """Bucketed observations with their sum and count"""
+
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    """Format a Prometheus label set"""
+    pairs = [
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class MetricsRegistry:
+    """
+    Process-wide request metrics
+
+    Each worker process keeps its own counters; they start from zero when
+    the process starts, which Prometheus handles as a counter reset.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = defaultdict(int)  # (endpoint, method, status) -> count
+        self._latency = defaultdict(Histogram)  # (endpoint, method) -> histogram
+        self._stages = defaultdict(Histogram)  # (endpoint, stage) -> histogram
+        self._rows = defaultdict(int)  # endpoint -> rows
+        self._bytes_in = defaultdict(int)  # endpoint -> request body bytes
+        self._bytes_out = defaultdict(int)  # endpoint -> response body bytes
+
+    def observe_request(
+        self,
+        endpoint: str,
+        method: str,
+        status: int,
+        seconds: float,
+        stages: Dict[str, float],
+        rows: int = 0,
+        bytes_in: int = 0,
+        bytes_out: int = 0
+    ):
+        """Record one completed request"""
+        with self._lock:
+            self._requests[(endpoint, method, status)] += 1
+            self._latency[(endpoint, method)].observe(seconds)
+            for stage, stage_seconds in stages.items():
+                self._stages[(endpoint, stage)].observe(stage_seconds)
+            self._rows[endpoint] += rows
+            self._bytes_in[endpoint] += bytes_in
+            self._bytes_out[endpoint] += bytes_out
+
+    def observe_stage(self, endpoint: str, stage: str, seconds: float):
+        """Record a stage that ran after its request (e.g. a background write)"""
+        with self._lock:
+            self._stages[(endpoint, stage)].observe(seconds)
+
+    def render(self, extra_lines: Optional[List[str]] = None) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format
+
+        Args:
+            extra_lines: Further exposition lines (e.g. compression counters)
+
+        Returns:
+            Exposition text
+        """
+        lines = []
+
+        with self._lock:
+            lines += [
+                '# HELP http_requests_total Completed requests',
+                '# TYPE http_requests_total counter'
+            ]
+            for key, count in sorted(self._requests.items()):
+                lines.append(f'http_requests_total{_labels(("endpoint", "method", "status"), key)} {count}')
+
+            self._render_histograms(
+                lines, 'http_request_duration_seconds', 'Request latency',
+                ('endpoint', 'method'), self._latency
+            )
+            self._render_histograms(
+                lines, 'request_stage_duration_seconds', 'Time spent per request stage',
+                ('endpoint', 'stage'), self._stages
+            )
+
+            for name, help_text, values in (
+                ('rows_processed_total', 'Input rows processed', self._rows),
+                ('request_bytes_total', 'Request body bytes received', self._bytes_in),
+                ('response_bytes_total', 'Response body bytes sent (after compression)', self._bytes_out)
+            ):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+                for endpoint, value in sorted(values.items()):
+                    lines.append(f'{name}{_labels(("endpoint",), (endpoint,))} {value}')
+
+        lines += extra_lines or []
+
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _render_histograms(lines: List[str], name: str, help_text: str, label_names: Tuple[str, ...], histograms):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+
+        for key, histogram in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), histogram.counts):
+                cumulative += count
+                bucket_label = f'le="{bound}"'
+                lines.append(f'{name}_bucket{_labels(label_names, key, bucket_label)} {cumulative}')
+            lines.append(f'{name}_sum{_labels(label_names, key)} {histogram.sum:.6f}')
+            lines.append(f'{name}_count{_labels(label_names, key)} {histogram.count}')
+
+
+metrics = MetricsRegistry()
+
+
+def add_worker_label(text: str, worker: str) -> List[Tuple[str, str]]:
+    """
+    Label every sample of an exposition with its worker
+
+    Args:
+        text: Exposition text of one worker
+        worker: Worker label value
+
+    Returns:
+        List of (metric family, line); HELP/TYPE lines keep their text
+    """
+    lines = []
+    family = ''
+
+    for line in text.splitlines():
+        if not line:
+            continue
+        if line.startswith('#'):
+            family = line.split()[2]
+            lines.append((family, line))
+            continue
+
+        name, _, rest = line.partition('{')
+        if rest:
+            line = f'{name}{{worker="{worker}",{rest}'
+        else:
+            name, _, value = line.partition(' ')
+            line = f'{name}{{worker="{worker}"}} {value}'
+        lines.append((family, line))
+
+    return lines
+
+
+class MetricsPublisher:
+    """
+    Publishes the metrics of this process to the shared store
+
+    A background thread writes the exposition of this worker every
+    interval; workers that stop publishing drop out after three intervals.
+    """
+
+    KEY_PREFIX = 'metrics:'
+
+    def __init__(self, store: LocalStore, registry: MetricsRegistry,
+                 extra_lines: Callable[[], List[str]] = list, interval: float = 5.0):
+        """
+        Args:
+            store: LocalStore file shared by the workers of this host
+            registry: Metrics of this process
+            extra_lines: Further exposition lines of this process (e.g. compression counters)
+            interval: Seconds between publications
+        """
+        self.store = store
+        self.registry = registry
+        self.extra_lines = extra_lines
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread_pid = None
+
+    def start(self):
+        """Start publishing from this process (again after a fork)"""
+        if self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+        threading.Thread(target=self._run, name='metrics-publisher', daemon=True).start()
+
+    def publish(self):
+        """Write the current metrics of this process"""
+        self.store.set_values(
+            {f'{self.KEY_PREFIX}{os.getpid()}': self.registry.render(self.extra_lines())},
+            self.interval * 3
+        )
+
+    def render(self) -> str:
+        """
+        Render the metrics of all workers on this host
+
+        This process publishes first, so its own series are current; other
+        workers' series are at most one interval old.
+        """
+        self.publish()
+        workers = self.store.get_values_with_prefix(self.KEY_PREFIX)
+
+        families: Dict[str, List[str]] = {}
+        for key, text in sorted(workers.items()):
+            for family, line in add_worker_label(text, key[len(self.KEY_PREFIX):]):
+                lines = families.setdefault(family, [])
+                # HELP/TYPE once per family, ahead of its samples
+                if not line.startswith('#') or line not in lines:
+                    lines.append(line)
+
+        return '\n'.join(line for lines in families.values() for line in lines) + '\n'
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.publish()
+            except Exception as e:
+                logger.warning(f"Could not publish metrics: {str(e)}")
+
+
+_publisher: Optional[MetricsPublisher] = None
+_publisher_lock = threading.Lock()
+
+
+def configure_metrics_store(path: str, extra_lines: Callable[[], List[str]] = list,
+                            interval: float = 5.0) -> MetricsPublisher:
+    """
+    Set up the shared metrics store (once per process)
+
+    Later calls return the existing publisher unchanged.
+
+    Args:
+        path: LocalStore file shared by the workers of this host
+        extra_lines: Further exposition lines of this process
+        interval: Seconds between publications
+
+    Returns:
+        MetricsPublisher instance
+    """
+    global _publisher
+
+    with _publisher_lock:
+        if _publisher is None:
+            _publisher = MetricsPublisher(LocalStore(path), metrics, extra_lines, interval)
+        return _publisher
+
+
+def get_metrics_publisher() -> Optional[MetricsPublisher]:
+    """Get the metrics publisher (None if not configured)"""
+    return _publisher
@@ -6,6 +6,8 @@ import base64
 import json
 from typing import List, Dict, Any, Optional, Tuple
 from flask import request
+import numpy as np
+import pandas as pd
 
 
 class PaginationCursor:
@@ -42,6 +44,20 @@ class PaginationCursor:
         except Exception:
             return {}
     
+    @staticmethod
+    def cursor_offset(cursor: Optional[str]) -> int:
+        """
+        Get the row offset carried by a cursor
+        
+        Returns:
+            Offset of the first item after the cursor (0 if none or invalid)
+        """
+        cursor_data = PaginationCursor.decode_cursor(cursor) if cursor else {}
+        try:
+            return max(int(cursor_data.get('offset', 0)), 0)
+        except (TypeError, ValueError):
+            return 0
+    
     @staticmethod
     def paginate(
         items: List[Any],
@@ -53,6 +69,9 @@ class PaginationCursor:
         """
         Paginate a list of items using cursor-based pagination
         
+        Items without cursor_field are paged by offset cursors (as issued by
+        create_pagination_response).
+        
         Args:
             items: List of items to paginate (should be sorted)
             limit: Number of items per page
@@ -69,6 +88,11 @@ class PaginationCursor:
         
         # Filter items based on cursor
         filtered_items = items
+        start = 0
+        
+        if after_data and cursor_field not in after_data and 'offset' in after_data:
+            start = PaginationCursor.cursor_offset(after_cursor)
+            filtered_items = filtered_items[start:]
         
         if after_data and cursor_field in after_data:
             after_value = after_data[cursor_field]
@@ -91,10 +115,11 @@ class PaginationCursor:
         # Generate next cursor
         next_cursor = None
         if has_more and page_items:
-            last_item = page_items[-1]
-            next_cursor = PaginationCursor.encode_cursor({
-                cursor_field: PaginationCursor._get_field_value(last_item, cursor_field)
-            })
+            cursor_value = PaginationCursor._get_field_value(page_items[-1], cursor_field)
+            if cursor_value is not None:
+                next_cursor = PaginationCursor.encode_cursor({cursor_field: cursor_value})
+            else:
+                next_cursor = PaginationCursor.encode_cursor({'offset': start + len(page_items)})
         
         # Generate previous cursor
         prev_cursor = None
@@ -174,7 +199,13 @@ def create_pagination_response(
     if has_more and page_items:
         last_item = page_items[-1]
         cursor_value = PaginationCursor._get_field_value(last_item, cursor_field)
-        next_cursor = PaginationCursor.encode_cursor({cursor_field: cursor_value})
+        if cursor_value is not None:
+            next_cursor = PaginationCursor.encode_cursor({cursor_field: cursor_value})
+        else:
+            # Items without the cursor field fall back to an offset cursor
+            # (read back by PaginationCursor.paginate)
+            offset = PaginationCursor.cursor_offset(after_cursor) + len(page_items)
+            next_cursor = PaginationCursor.encode_cursor({'offset': offset})
     
     response = {
         'data': page_items,
@@ -192,12 +223,126 @@ def create_pagination_response(
     return response
 
 
+def paginate_dataframe(
+    frame: pd.DataFrame,
+    limit: int = 20,
+    after_cursor: Optional[str] = None,
+    cursor_fields: Optional[List[str]] = None,
+    total_count: bool = True,
+    as_records: bool = True
+) -> Dict[str, Any]:
+    """
+    Paginate a DataFrame, converting only the requested page to records
+    
+    Cursors always carry the row offset of the next page. When cursor_fields
+    is given (the frame must be sorted by those columns), the cursor also
+    carries the key of the last row returned, so a page can be resumed by
+    key (keyset pagination) when the frame has changed since the cursor was
+    issued, e.g. after re-processing the same file.
+    
+    Args:
+        frame: Result DataFrame (sorted by cursor_fields if given)
+        limit: Page size
+        after_cursor: Cursor returned with the previous page
+        cursor_fields: Optional sort key columns for keyset cursors
+        total_count: Whether to include total row count
+        as_records: Convert the page to a list of dicts (False keeps the
+            page as a DataFrame slice for column-wise JSON encoding)
+    
+    Returns:
+        Dictionary with page records and pagination metadata
+    """
+    cursor_fields = [field for field in (cursor_fields or []) if field in frame.columns]
+    start_idx = _resolve_frame_cursor(frame, after_cursor, cursor_fields)
+    
+    end_idx = min(start_idx + limit, len(frame))
+    page = frame.iloc[start_idx:end_idx]
+    has_more = end_idx < len(frame)
+    
+    # Generate next cursor
+    next_cursor = None
+    if has_more and len(page):
+        cursor_data = {'offset': end_idx}
+        if cursor_fields:
+            last_row = page.iloc[-1]
+            cursor_data['key'] = [_to_cursor_value(last_row[field]) for field in cursor_fields]
+        next_cursor = PaginationCursor.encode_cursor(cursor_data)
+    
+    response = {
+        'data': page.to_dict(orient='records') if as_records else page,
+        'pagination': {
+            'next_cursor': next_cursor,
+            'has_more': has_more,
+            'limit': limit
+        }
+    }
+    
+    if total_count:
+        response['pagination']['total_count'] = len(frame)
+    
+    return response
+
+
+def _resolve_frame_cursor(frame: pd.DataFrame, after_cursor: Optional[str], cursor_fields: List[str]) -> int:
+    """
+    Resolve a cursor to the starting row position in a frame
+    
+    Returns:
+        Row position of the first item after the cursor
+    """
+    if not after_cursor:
+        return 0
+    
+    cursor_data = PaginationCursor.decode_cursor(after_cursor)
+    offset = PaginationCursor.cursor_offset(after_cursor)
+    
+    key = cursor_data.get('key')
+    if not cursor_fields or not isinstance(key, list) or len(key) != len(cursor_fields):
+        return min(offset, len(frame))
+    
+    # Null keys have no ordering - fall back to the offset
+    if any(value is None or (isinstance(value, float) and np.isnan(value)) for value in key):
+        return min(offset, len(frame))
+    
+    # Fast path: the row before the offset still has the cursor key
+    if 0 < offset <= len(frame):
+        last_row = frame.iloc[offset - 1]
+        if [_to_cursor_value(last_row[field]) for field in cursor_fields] == key:
+            return offset
+    
+    # Keyset path: first row whose key sorts strictly after the cursor key
+    greater = np.zeros(len(frame), dtype=bool)
+    equal = np.ones(len(frame), dtype=bool)
+    for field, value in zip(cursor_fields, key):
+        column = frame[field]
+        if pd.api.types.is_datetime64_any_dtype(column):
+            value = pd.Timestamp(value)
+        try:
+            greater |= equal & (column > value).to_numpy()
+            equal &= (column == value).to_numpy()
+        except TypeError:
+            # Incomparable key types - fall back to the offset
+            return min(offset, len(frame))
+    
+    positions = np.flatnonzero(greater)
+    return int(positions[0]) if len(positions) else len(frame)
+
+
+def _to_cursor_value(value: Any) -> Any:
+    """Convert a cell value to a JSON-serializable cursor value"""
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
 def paginate_query(query, limit: int, after_cursor: Optional[str] = None, order_by_field: str = 'id'):
     """
     Paginate SQLAlchemy query using cursor-based pagination
     
     Args:
-        query: SQLAlchemy query object
+        query: SQLAlchemy query object (ordered by order_by_field here)
         limit: Number of items per page
         after_cursor: Cursor to get items after
         order_by_field: Field to order by and use for cursor
@@ -205,17 +350,18 @@ def paginate_query(query, limit: int, after_cursor: Optional[str] = None, order_
     Returns:
         Tuple of (items, next_cursor, has_more)
     """
+    model = query.column_descriptions[0]['entity']
+    field = getattr(model, order_by_field)
+    
     # Decode cursor
     if after_cursor:
         cursor_data = PaginationCursor.decode_cursor(after_cursor)
         if order_by_field in cursor_data:
-            # Filter query based on cursor
-            model = query.column_descriptions[0]['entity']
-            field = getattr(model, order_by_field)
+            # Filter query based on cursor (an index on the field seeks straight to it)
             query = query.filter(field > cursor_data[order_by_field])
     
     # Get one extra item to check if there are more
-    items = query.limit(limit + 1).all()
+    items = query.order_by(field).limit(limit + 1).all()
     
     # Check if there are more items
     has_more = len(items) > limit
@@ -0,0 +1,158 @@
+"""
+Bounded on-disk store of request profiles
+Each profile is kept as a pstats file plus a JSON metadata file (request,
+input shape, hottest functions) in PROFILE_DIR; the oldest are deleted
+beyond PROFILE_MAX_ENTRIES
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import threading
+import uuid
+
+
+# IDs start with the creation time, so they sort oldest to newest
+_PROFILE_ID = re.compile(r'^\d{8}T\d{12}-[0-9a-f]{8}$')
+
+
+def top_functions(profile: cProfile.Profile, limit: int = 15) -> List[Dict[str, Any]]:
+    """
+    Get the functions with the highest cumulative time
+
+    Args:
+        profile: Stopped profiler
+        limit: Number of functions
+
+    Returns:
+        List of dicts with function, calls, total_seconds and cumulative_seconds
+    """
+    stats = pstats.Stats(profile)
+    entries = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+
+    return [
+        {
+            'function': f'{filename}:{line}({name})',
+            'calls': calls,
+            'total_seconds': round(total_time, 6),
+            'cumulative_seconds': round(cumulative_time, 6)
+        }
+        for (filename, line, name), (_, calls, total_time, cumulative_time, _) in entries
+    ]
+
+
+class ProfileStore:
+    """
+    Request profiles on disk, shared by the worker processes of a host
+
+    Files are written with a temporary name and renamed, so listing never
+    sees a half-written profile.
+    """
+
+    def __init__(self, directory: str, max_entries: int = 50):
+        """
+        Args:
+            directory: Directory holding the profiles (created if missing)
+            max_entries: Profiles kept; older ones are deleted
+        """
+        self.directory = directory
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, profile_id: str, suffix: str) -> str:
+        return os.path.join(self.directory, f'{profile_id}.{suffix}')
+
+    def save(self, profile: cProfile.Profile, metadata: Dict[str, Any]) -> str:
+        """
+        Store a profile
+
+        Args:
+            profile: Stopped profiler
+            metadata: Request and input shape details
+
+        Returns:
+            Profile ID
+        """
+        profile_id = f'{datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")}-{uuid.uuid4().hex[:8]}'
+
+        metadata = {
+            'profile_id': profile_id,
+            'created_at': datetime.utcnow().isoformat() + 'Z',
+            **metadata,
+            'top_functions': top_functions(profile)
+        }
+
+        stats_path = self._path(profile_id, 'prof')
+        profile.dump_stats(stats_path + '.tmp')
+        os.replace(stats_path + '.tmp', stats_path)
+
+        metadata_path = self._path(profile_id, 'json')
+        with open(metadata_path + '.tmp', 'w') as metadata_file:
+            json.dump(metadata, metadata_file, default=str)
+        os.replace(metadata_path + '.tmp', metadata_path)
+
+        self.prune()
+
+        return profile_id
+
+    def _profile_ids(self) -> List[str]:
+        """Get stored profile IDs, newest first"""
+        return sorted(
+            (name[:-5] for name in os.listdir(self.directory) if name.endswith('.json')),
+            reverse=True
+        )
+
+    def prune(self):
+        """Delete the oldest profiles beyond max_entries"""
+        with self._lock:
+            for profile_id in self._profile_ids()[self.max_entries:]:
+                for suffix in ('json', 'prof'):
+                    try:
+                        os.remove(self._path(profile_id, suffix))
+                    except FileNotFoundError:
+                        pass  # Already pruned by another worker
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Get metadata of all stored profiles, newest first (without top functions)"""
+        profiles = []
+        for profile_id in self._profile_ids():
+            metadata = self.get(profile_id)
+            if metadata is not None:
+                metadata.pop('top_functions', None)
+                profiles.append(metadata)
+        return profiles
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        """Get metadata of a profile (None if unknown or pruned)"""
+        if not _PROFILE_ID.match(profile_id):
+            return None
+
+        try:
+            with open(self._path(profile_id, 'json')) as metadata_file:
+                return json.load(metadata_file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def stats_path(self, profile_id: str) -> Optional[str]:
+        """Get path of a profile's pstats file (None if unknown or pruned)"""
+        if not _PROFILE_ID.match(profile_id):
+            return None
+
+        path = self._path(profile_id, 'prof')
+        return path if os.path.exists(path) else None
+
+    def text_report(self, profile_id: str, sort: str = 'cumulative', limit: int = 60) -> Optional[str]:
+        """Get a pstats text report of a profile (None if unknown or pruned)"""
+        path = self.stats_path(profile_id)
+        if path is None:
+            return None
+
+        output = io.StringIO()
+        pstats.Stats(path, stream=output).strip_dirs().sort_stats(sort).print_stats(limit)
+        return output.getvalue()
@@ -1,37 +1,75 @@
 """
 Progress callback system for long-running operations
 Allows Android clients to track processing progress in real-time
+
+Progress of registered operations is published to a LocalStore file shared
+by all worker processes, so a poll can land on any worker. Updates only
+change the in-memory tracker; a background publisher writes changed
+trackers in one batch every PROGRESS_FLUSH_INTERVAL seconds, and entries
+expire PROGRESS_TTL seconds after their last update.
+
+Clients wait for the next change (wait_for_progress, served as a long poll
+or Server-Sent Events) instead of polling, so they receive at most one
+update per flush interval however often an operation reports progress.
 """
-from typing import Callable, Optional, Dict, Any
+from typing import Callable, Optional, Dict, Any, List, Iterator, Tuple
 from datetime import datetime
+from utils.local_store import LocalStore
+import logging
+import os
 import threading
 import time
 
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_PROGRESS_STORE_PATH = '/tmp/arrears_manager_progress.sqlite'
+DEFAULT_PROGRESS_TTL = 3600
+DEFAULT_FLUSH_INTERVAL = 0.25
+
+# Rows processed between progress reports and cancellation checks
+DEFAULT_BLOCK_ROWS = 20000
+
 
 class ProgressTracker:
     """Thread-safe progress tracking for long-running operations"""
     
-    def __init__(self, total_steps: int = 100, callback: Optional[Callable] = None):
+    def __init__(self, total_steps: int = 100, callback: Optional[Callable] = None,
+                 operation_id: Optional[str] = None, user_id: Optional[int] = None):
         """
         Initialize progress tracker
         
         Args:
             total_steps: Total number of steps (default 100 for percentage)
             callback: Optional callback function(current, total, message, metadata)
+            operation_id: ID the progress is published under (see
+                create_progress_tracker); None for a local-only tracker
+            user_id: Owner of the operation (only they can see its progress)
         """
         self.total_steps = total_steps
         self.current_step = 0
         self.callback = callback
+        self.operation_id = operation_id
+        self.user_id = user_id
+        self.version = 0  # Incremented on every change
         self.message = ""
         self.metadata = {}
         self.start_time = datetime.now()
+        self.finish_time = None
         self._lock = threading.Lock()
         self._cancelled = False
+        self._dirty = False
+        self._publisher = None  # Set by ProgressPublisher.register
     
     def update(self, step: int, message: str = "", **metadata):
         """
         Update progress
         
+        Only the in-memory state changes; the publisher writes it to the
+        shared store in the background (immediately once finished).
+        
         Args:
             step: Current step number
             message: Progress message
@@ -44,6 +82,12 @@ class ProgressTracker:
             self.current_step = min(step, self.total_steps)
             self.message = message
             self.metadata = metadata
+            self._dirty = True
+            self.version += 1
+            
+            finished = self.current_step >= self.total_steps or bool(metadata.get('error'))
+            if finished and self.finish_time is None:
+                self.finish_time = datetime.now()
             
             if self.callback:
                 self.callback(
@@ -54,6 +98,9 @@ class ProgressTracker:
                     percentage=self.get_percentage(),
                     elapsed_seconds=self.get_elapsed_seconds()
                 )
+        
+        if finished and self._publisher is not None:
+            self._publisher.publish([self])
     
     def increment(self, steps: int = 1, message: str = "", **metadata):
         """Increment progress by specified steps"""
@@ -66,22 +113,55 @@ class ProgressTracker:
         return round((self.current_step / self.total_steps) * 100, 2)
     
     def get_elapsed_seconds(self) -> float:
-        """Get elapsed time in seconds"""
-        return (datetime.now() - self.start_time).total_seconds()
+        """Get elapsed time in seconds (up to completion or error)"""
+        return ((self.finish_time or datetime.now()) - self.start_time).total_seconds()
     
     def cancel(self):
         """Cancel the operation"""
         with self._lock:
             self._cancelled = True
+            self._dirty = True
+            self.version += 1
     
     def is_cancelled(self) -> bool:
         """Check if operation was cancelled"""
         with self._lock:
             return self._cancelled
     
+    def is_finished(self) -> bool:
+        """Check if operation completed, failed or was cancelled"""
+        with self._lock:
+            return self.finish_time is not None or self._cancelled
+    
     def complete(self, message: str = "Completed"):
         """Mark operation as complete"""
         self.update(self.total_steps, message, completed=True)
+    
+    def snapshot(self, mark_published: bool = False) -> Dict[str, Any]:
+        """
+        Get progress status as dictionary
+        
+        Args:
+            mark_published: Clear the changed flag (set by the publisher)
+        """
+        with self._lock:
+            if mark_published:
+                self._dirty = False
+            return {
+                'operation_id': self.operation_id,
+                'current_step': self.current_step,
+                'total_steps': self.total_steps,
+                'percentage': self.get_percentage(),
+                'message': self.message,
+                'metadata': self.metadata,
+                'elapsed_seconds': self.get_elapsed_seconds(),
+                'completed': self.current_step >= self.total_steps,
+                'cancelled': self._cancelled,
+                'finished': self.finish_time is not None or self._cancelled,
+                'version': self.version,
+                'user_id': self.user_id,
+                'updated_at': datetime.utcnow().isoformat() + 'Z'
+            }
 
 
 class ProgressCancelled(Exception):
@@ -89,13 +169,312 @@ class ProgressCancelled(Exception):
     pass
 
 
-# Global progress storage for tracking multiple operations
-_progress_store: Dict[str, ProgressTracker] = {}
-_store_lock = threading.Lock()
+class StageProgress:
+    """
+    Stage and row-block hooks for processing pipelines
+    
+    Each stage owns a share of the tracker's steps (by weight). Pipelines
+    enter stages with stage() and report processed rows with rows() or by
+    iterating blocks(); every report checks for cancellation and the
+    optional request deadline (utils.deadline), so a cancelled or overdue
+    operation stops at the next row block. Without a tracker or deadline
+    the hooks only do the work (blocks() yields the whole frame at once).
+    """
+    
+    def __init__(self, tracker: Optional[ProgressTracker], stages: List[Tuple[str, float]],
+                 block_rows: int = DEFAULT_BLOCK_ROWS, deadline=None):
+        """
+        Args:
+            tracker: Tracker to report to (None to only run the pipeline)
+            stages: (name, weight) pairs in pipeline order
+            block_rows: Rows processed between reports
+            deadline: Optional Deadline checked with the cancellation
+        """
+        self.tracker = tracker
+        self.deadline = deadline
+        self.block_rows = block_rows
+        self.current = None
+        self.rows_done = 0
+        self.rows_total = None
+        self._ranges: Dict[str, Tuple[float, float]] = {}
+        
+        total_weight = sum(weight for _, weight in stages) or 1
+        start = 0.0
+        steps = tracker.total_steps if tracker is not None else 100
+        for name, weight in stages:
+            end = start + steps * weight / total_weight
+            self._ranges[name] = (start, end)
+            start = end
+    
+    def check(self):
+        """Raise ProgressCancelled if the operation was cancelled (DeadlineExceeded if overdue)"""
+        if self.tracker is not None and self.tracker.is_cancelled():
+            raise ProgressCancelled("Operation was cancelled")
+        if self.deadline is not None:
+            self.deadline.check(self.current or '')
+    
+    def stage(self, name: str, message: str = "", rows_total: Optional[int] = None):
+        """
+        Enter a pipeline stage
+        
+        Args:
+            name: Stage name (one of the configured stages)
+            message: Progress message
+            rows_total: Rows the stage will process, if known
+        """
+        self.current = name
+        self.check()
+        self.rows_done = 0
+        self.rows_total = rows_total
+        
+        if self.tracker is not None:
+            self.tracker.update(int(self._ranges[name][0]), message or name, stage=name)
+    
+    def rows(self, done: int, message: str = ""):
+        """
+        Report rows processed in the current stage
+        
+        Args:
+            done: Rows processed so far in this stage
+            message: Progress message (default: row counts)
+        """
+        self.rows_done = done
+        self.check()
+        if self.tracker is None:
+            return
+        
+        start, end = self._ranges[self.current]
+        fraction = min(done / self.rows_total, 1.0) if self.rows_total else 0.0
+        self.tracker.update(
+            int(start + (end - start) * fraction),
+            message or f"{self.current}: {done:,} of {self.rows_total or '?'} rows",
+            stage=self.current,
+            rows_processed=done,
+            rows_total=self.rows_total
+        )
+    
+    def blocks(self, frame, block_rows: Optional[int] = None) -> Iterator[Any]:
+        """
+        Iterate a frame in row blocks, reporting after each block
+        
+        Args:
+            frame: DataFrame or Series the current stage processes
+            block_rows: Rows per block (default: the hooks' block_rows)
+        
+        Yields:
+            Row slices of the frame
+        """
+        if self.tracker is None and self.deadline is None:
+            yield frame
+            return
+        
+        block_rows = block_rows or self.block_rows
+        self.rows_total = len(frame)
+        for start in range(0, len(frame), block_rows):
+            self.check()
+            yield frame.iloc[start:start + block_rows]
+            self.rows(min(start + block_rows, len(frame)))
+    
+    def apply(self, frame, func: Callable, block_rows: Optional[int] = None):
+        """
+        Apply a row-wise function block by block and concatenate the results
+        
+        Args:
+            frame: DataFrame or Series
+            func: Function taking and returning a block
+            block_rows: Rows per block
+        
+        Returns:
+            Concatenated result (same index as the frame)
+        """
+        results = [func(block) for block in self.blocks(frame, block_rows)]
+        if len(results) == 1:
+            return results[0]
+        return pd.concat(results) if results else func(frame)
+
+
+def _status_key(operation_id: str) -> str:
+    return f'progress:{operation_id}'
+
+
+def _cancel_key(operation_id: str) -> str:
+    return f'progress-cancel:{operation_id}'
+
+
+class ProgressPublisher:
+    """
+    Publishes the trackers of this process to the shared store
+    
+    A background thread writes every changed tracker in one transaction per
+    flush interval, picks up cancellations requested through other workers
+    and forgets finished trackers (their last state stays in the store
+    until it expires).
+    """
+    
+    def __init__(self, store: LocalStore, ttl: float = DEFAULT_PROGRESS_TTL,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        self.store = store
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self._trackers: Dict[str, ProgressTracker] = {}
+        self._lock = threading.Lock()
+        self._thread_pid = None
+        self._published = threading.Condition()
+    
+    def register(self, tracker: ProgressTracker):
+        """Track and publish a tracker"""
+        tracker._publisher = self
+        with self._lock:
+            self._trackers[tracker.operation_id] = tracker
+            
+            # The thread does not survive a fork, so start one per process
+            if self._thread_pid != os.getpid():
+                self._thread_pid = os.getpid()
+                threading.Thread(target=self._run, name='progress-publisher', daemon=True).start()
+        
+        self.publish([tracker])
+    
+    def unregister(self, operation_id: str) -> Optional[ProgressTracker]:
+        """Stop tracking an operation in this process"""
+        with self._lock:
+            return self._trackers.pop(operation_id, None)
+    
+    def get(self, operation_id: str) -> Optional[ProgressTracker]:
+        """Get tracker of an operation running in this process"""
+        with self._lock:
+            return self._trackers.get(operation_id)
+    
+    def publish(self, trackers: List[ProgressTracker]):
+        """Write trackers to the shared store in one transaction"""
+        self.store.set_values(
+            {_status_key(tracker.operation_id): tracker.snapshot(mark_published=True) for tracker in trackers},
+            self.ttl
+        )
+        
+        with self._published:
+            self._published.notify_all()
+    
+    def flush(self):
+        """Publish changed trackers and apply cancellations from other workers"""
+        with self._lock:
+            trackers = list(self._trackers.values())
+        
+        if not trackers:
+            return
+        
+        cancelled = self.store.get_values(_cancel_key(tracker.operation_id) for tracker in trackers)
+        for tracker in trackers:
+            if _cancel_key(tracker.operation_id) in cancelled:
+                tracker.cancel()
+        
+        self.publish([tracker for tracker in trackers if tracker._dirty])
+        
+        for tracker in trackers:
+            if tracker.is_finished():
+                self.unregister(tracker.operation_id)
+    
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"Could not publish progress: {str(e)}")
+    
+    def status(self, operation_id: str) -> Optional[Dict[str, Any]]:
+        """Get latest progress of an operation from any worker"""
+        tracker = self.get(operation_id)
+        if tracker is not None:
+            return tracker.snapshot()  # Newer than the published state
+        
+        return self.store.get_value(_status_key(operation_id))
+    
+    def wait(self, operation_id: str, since_version: Optional[int] = None,
+             timeout: float = 30.0) -> Optional[Dict[str, Any]]:
+        """
+        Wait until an operation's progress differs from a known version
+        
+        Waiters wake when this process publishes, and otherwise re-read the
+        store once per flush interval, so changes are coalesced to at most
+        one per flush interval.
+        
+        Args:
+            operation_id: Operation to watch
+            since_version: Version the caller already has (None returns at once)
+            timeout: Seconds to wait for a change
+        
+        Returns:
+            Latest progress (unchanged if the wait timed out), or None if
+            not found or expired
+        """
+        deadline = time.monotonic() + timeout
+        
+        while True:
+            status = self.status(operation_id)
+            if status is None or status.get('version') != since_version or status.get('finished'):
+                return status
+            
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return status
+            
+            with self._published:
+                self._published.wait(min(self.flush_interval, remaining))
+    
+    def request_cancel(self, operation_id: str):
+        """Cancel an operation running in any worker"""
+        tracker = self.get(operation_id)
+        if tracker is not None:
+            tracker.cancel()
+            self.publish([tracker])
+        else:
+            self.store.set_values({_cancel_key(operation_id): True}, self.ttl)
+    
+    def remove(self, operation_id: str):
+        """Forget an operation in this process and the shared store"""
+        self.unregister(operation_id)
+        self.store.delete_value(_status_key(operation_id))
+        self.store.delete_value(_cancel_key(operation_id))
+
+
+_publisher: Optional[ProgressPublisher] = None
+_publisher_lock = threading.Lock()
+
+
+def configure_progress_store(
+    path: str = DEFAULT_PROGRESS_STORE_PATH,
+    ttl: float = DEFAULT_PROGRESS_TTL,
+    flush_interval: float = DEFAULT_FLUSH_INTERVAL
+) -> ProgressPublisher:
+    """
+    Set up the shared progress store (once per process)
+    
+    Later calls return the existing publisher unchanged.
+    
+    Args:
+        path: LocalStore file shared by the workers of this host
+        ttl: Seconds progress is kept after its last update
+        flush_interval: Seconds between batched writes of changed trackers
+    
+    Returns:
+        ProgressPublisher instance
+    """
+    global _publisher
+    
+    with _publisher_lock:
+        if _publisher is None:
+            _publisher = ProgressPublisher(LocalStore(path), ttl=ttl, flush_interval=flush_interval)
+        return _publisher
+
+
+def get_progress_publisher() -> ProgressPublisher:
+    """Get the progress publisher (set up with defaults if not configured)"""
+    return _publisher or configure_progress_store()
 
 
-def create_progress_tracker(operation_id: str, total_steps: int = 100, 
-                           callback: Optional[Callable] = None) -> ProgressTracker:
+def create_progress_tracker(operation_id: str, total_steps: int = 100,
+                           callback: Optional[Callable] = None,
+                           user_id: Optional[int] = None) -> ProgressTracker:
     """
     Create and register a progress tracker
     
@@ -103,26 +482,34 @@ def create_progress_tracker(operation_id: str, total_steps: int = 100,
         operation_id: Unique identifier for this operation
         total_steps: Total number of steps
         callback: Optional callback function
+        user_id: Owner of the operation
     
     Returns:
         ProgressTracker instance
     """
-    with _store_lock:
-        tracker = ProgressTracker(total_steps, callback)
-        _progress_store[operation_id] = tracker
-        return tracker
+    tracker = ProgressTracker(total_steps, callback, operation_id=operation_id, user_id=user_id)
+    get_progress_publisher().register(tracker)
+    return tracker
 
 
 def get_progress_tracker(operation_id: str) -> Optional[ProgressTracker]:
-    """Get progress tracker by operation ID"""
-    with _store_lock:
-        return _progress_store.get(operation_id)
+    """Get progress tracker by operation ID (only for operations running in this process)"""
+    return get_progress_publisher().get(operation_id)
 
 
 def remove_progress_tracker(operation_id: str):
-    """Remove progress tracker after completion"""
-    with _store_lock:
-        _progress_store.pop(operation_id, None)
+    """Remove progress tracker and its published progress"""
+    get_progress_publisher().remove(operation_id)
+
+
+def cancel_progress(operation_id: str):
+    """
+    Cancel an operation, whichever worker runs it
+    
+    The tracker raises ProgressCancelled on its next update (within one
+    flush interval when it runs in another worker).
+    """
+    get_progress_publisher().request_cancel(operation_id)
 
 
 def get_progress_status(operation_id: str) -> Optional[Dict[str, Any]]:
@@ -130,35 +517,75 @@ def get_progress_status(operation_id: str) -> Optional[Dict[str, Any]]:
     Get current progress status as dictionary (for API responses)
     
     Returns:
-        Dictionary with progress information or None if not found
+        Dictionary with progress information or None if not found or expired
+    """
+    return get_progress_publisher().status(operation_id)
+
+
+class WaiterSlots:
     """
-    tracker = get_progress_tracker(operation_id)
-    if not tracker:
-        return None
+    Cap on clients of this process waiting for progress (long polls and streams)
     
-    return {
-        'operation_id': operation_id,
-        'current_step': tracker.current_step,
-        'total_steps': tracker.total_steps,
-        'percentage': tracker.get_percentage(),
-        'message': tracker.message,
-        'metadata': tracker.metadata,
-        'elapsed_seconds': tracker.get_elapsed_seconds(),
-        'completed': tracker.current_step >= tracker.total_steps
-    }
+    Each waiting client holds a worker thread, so the cap keeps threads free
+    for other requests.
+    """
+    
+    def __init__(self):
+        self.waiting = 0
+        self._lock = threading.Lock()
+    
+    def acquire(self, limit: int) -> bool:
+        """
+        Take a slot
+        
+        Args:
+            limit: Most clients waiting at once (0 for no limit)
+        
+        Returns:
+            False if all slots are taken
+        """
+        with self._lock:
+            if limit and self.waiting >= limit:
+                return False
+            self.waiting += 1
+            return True
+    
+    def release(self):
+        """Give back a slot"""
+        with self._lock:
+            self.waiting = max(self.waiting - 1, 0)
+
+
+waiter_slots = WaiterSlots()
+
+
+def wait_for_progress(operation_id: str, since_version: Optional[int] = None,
+                      timeout: float = 30.0) -> Optional[Dict[str, Any]]:
+    """
+    Wait for the next progress change of an operation (long poll)
+    
+    Args:
+        operation_id: Operation to watch
+        since_version: 'version' of the progress the client already has
+        timeout: Seconds to wait for a change
+    
+    Returns:
+        Dictionary with progress information or None if not found or expired
+    """
+    return get_progress_publisher().wait(operation_id, since_version, timeout)
 
 
 # Example usage for Android integration
 """
 # Server-side (Flask endpoint)
-from utils.progress import create_progress_tracker, get_progress_status
+from utils.progress import create_progress_tracker, wait_for_progress
 
 @app.route('/api/v1/loans/process', methods=['POST'])
 def process_loans():
     operation_id = str(uuid.uuid4())
     
     # Create progress tracker
-    tracker = create_progress_tracker(operation_id, total_steps=100)
+    tracker = create_progress_tracker(operation_id, total_steps=100, user_id=g.user_id)
     
     # Start background processing
     thread = threading.Thread(
@@ -172,9 +599,15 @@ def process_loans():
         'status': 'processing'
     })
 
+# Long poll: answers as soon as the progress differs from ?version=
+# (see routes/v1/loans.py, which also streams it as Server-Sent Events)
 @app.route('/api/v1/loans/progress/<operation_id>', methods=['GET'])
 def get_loan_progress(operation_id):
-    status = get_progress_status(operation_id)
+    status = wait_for_progress(
+        operation_id,
+        since_version=request.args.get('version', type=int),
+        timeout=request.args.get('wait', 0, type=float)
+    )
     if not status:
         return jsonify({'error': 'Operation not found'}), 404
     return jsonify(status)
@@ -205,9 +638,11 @@ class LoanProcessor(private val api: ApiService) {
         val response = api.startLoanProcessing(file)
         val operationId = response.operationId
         
-        // Poll for progress
+        // Long poll: each request returns when the progress changes
+        var version: Int? = null
         while (true) {
-            val progress = api.getProgress(operationId)
+            val progress = api.getProgress(operationId, version = version, wait = 30)
+            version = progress.version
             
             emit(ProgressState(
                 percentage = progress.percentage,
@@ -215,9 +650,7 @@ class LoanProcessor(private val api: ApiService) {
                 completed = progress.completed
             ))
             
-            if (progress.completed) break
-            
-            delay(1000) // Poll every second
+            if (progress.finished) break
         }
     }
 }
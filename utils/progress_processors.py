@@ -1,16 +1,27 @@
 """
 Example of integrating progress callbacks into loan processors
+The processors report real stage and row-block progress through
+StageProgress hooks and stop at the next row block once cancelled
 """
-from utils.progress import ProgressTracker, ProgressCancelled
-from typing import Optional, Dict, Any
+from utils.progress import ProgressTracker, ProgressCancelled, StageProgress, DEFAULT_BLOCK_ROWS
+from typing import Optional, Dict, Any, List, Tuple
 import pandas as pd
 
 
 class ProgressAwareLoanProcessor:
     """Base class for loan processors with progress tracking"""
     
-    def __init__(self, progress_tracker: Optional[ProgressTracker] = None):
+    # (stage, weight) pairs in pipeline order; weights split the tracker's steps
+    STAGES: List[Tuple[str, float]] = []
+    
+    def __init__(self, progress_tracker: Optional[ProgressTracker] = None,
+                 block_rows: int = DEFAULT_BLOCK_ROWS):
         self.progress = progress_tracker or ProgressTracker(100)
+        self.block_rows = block_rows
+    
+    def stage_progress(self) -> StageProgress:
+        """Create stage hooks reporting to this processor's tracker"""
+        return StageProgress(self.progress, self.STAGES, self.block_rows)
     
     def process_with_progress(self, file_input, **kwargs) -> Dict[str, Any]:
         """
@@ -25,48 +36,35 @@ class ProgressAwareLoanProcessor:
 class DormantArrangementWithProgress(ProgressAwareLoanProcessor):
     """Dormant arrangement processor with progress callbacks"""
     
+    STAGES = [
+        ('load', 15), ('filter', 5), ('normalize', 20), ('deduplicate', 10),
+        ('sort', 10), ('quality', 10), ('export', 30)
+    ]
+    
     def process_with_progress(self, file_input, branch_name: str) -> Dict[str, Any]:
         """Process dormant arrangement with progress updates"""
         try:
-            # Step 1: Load data (0-20%)
-            self.progress.update(5, "Loading file...")
             from Dormant_Arrangement import BranchDataProcessorAPI
             
             processor = BranchDataProcessorAPI()
+            hooks = self.stage_progress()
             
-            self.progress.update(10, "Reading file content...")
-            load_result = processor.load_data(file_input, "uploaded_file.xlsx")
+            # Load, process the branch and generate the Excel file (each reports its stages)
+            load_result = processor.load_data(file_input, "uploaded_file.xlsx", hooks)
             
             if load_result['status'] == 'error':
                 return load_result
             
-            self.progress.update(20, f"Loaded {load_result['data_summary']['total_records']} records")
-            
-            # Step 2: Process branch data (20-70%)
-            self.progress.update(30, f"Processing branch: {branch_name}")
-            process_result = processor.process_branch(branch_name)
+            process_result = processor.process_branch(branch_name, hooks)
             
             if process_result['status'] == 'error':
                 return process_result
             
-            self.progress.update(50, "Normalizing phone numbers...")
-            # Phone normalization happens inside process_branch
-            
-            self.progress.update(60, "Removing duplicates...")
-            # Deduplication happens inside process_branch
-            
-            self.progress.update(70, "Performing quality checks...")
-            # Quality checks happen inside process_branch
-            
-            # Step 3: Generate output (70-100%)
-            self.progress.update(80, "Generating Excel report...")
-            download_result = processor.download_processed_data(branch_name, format='excel')
+            download_result = processor.download_processed_data(branch_name, format='excel', progress=hooks)
             
             if download_result['status'] == 'error':
                 return download_result
             
-            self.progress.update(90, "Finalizing...")
-            
             # Complete
             self.progress.complete(f"Successfully processed {process_result['processing_summary']['total_records']} records")
             
@@ -98,6 +96,8 @@ class DormantArrangementWithProgress(ProgressAwareLoanProcessor):
 class ArrearsCollectedWithProgress(ProgressAwareLoanProcessor):
     """Arrears collected processor with progress callbacks"""
     
+    STAGES = [('load_sod', 30), ('load_current', 30), ('merge', 15), ('bucket', 15), ('report', 10)]
+    
     def process_with_progress(self, sod_content: bytes, sod_filename: str,
                              cur_content: bytes, cur_filename: str,
                              officer_targets: Optional[Dict] = None) -> Dict[str, Any]:
@@ -107,29 +107,19 @@ class ArrearsCollectedWithProgress(ProgressAwareLoanProcessor):
             
             processor = ArrearsProcessorAPI()
             
-            # Step 1: Load SOD file (0-20%)
-            self.progress.update(5, "Loading SOD file...")
-            
-            # Step 2: Load Current file (20-40%)
-            self.progress.update(25, "Loading current file...")
-            
-            # Step 3: Process data (40-70%)
-            self.progress.update(45, "Validating data...")
-            
             result = processor.process(
                 sod_content=sod_content,
                 sod_filename=sod_filename,
                 cur_content=cur_content,
                 cur_filename=cur_filename,
                 officer_targets=officer_targets,
-                output_format='json'
+                output_format='json',
+                progress=self.stage_progress()
             )
             
-            self.progress.update(60, "Calculating collections...")
-            self.progress.update(70, "Generating summary...")
-            
-            # Step 4: Finalize (70-100%)
-            self.progress.update(90, "Preparing response...")
+            if result.get('status') == 'error':
+                self.progress.update(self.progress.current_step, f"Error: {result['message']}", error=True)
+                return result
             
             self.progress.complete("Arrears collection analysis completed")
             
@@ -156,6 +146,8 @@ class ArrearsCollectedWithProgress(ProgressAwareLoanProcessor):
 class ArrangeArrearsWithProgress(ProgressAwareLoanProcessor):
     """Arrange arrears processor with progress callbacks"""
     
+    STAGES = [('load', 20), ('clean', 25), ('sort', 5), ('excel', 45), ('summary', 5)]
+    
     def process_with_progress(self, file_input) -> Dict[str, Any]:
         """Process arrears arrangement with progress updates"""
         try:
@@ -163,25 +155,18 @@ class ArrangeArrearsWithProgress(ProgressAwareLoanProcessor):
             
             dashboard = EnterpriseDashboardAPI()
             
-            # Step 1: Load data (0-30%)
-            self.progress.update(10, "Loading data file...")
-            
-            # Step 2: Process (30-80%)
-            self.progress.update(35, "Cleaning data...")
-            self.progress.update(50, "Calculating risk buckets...")
-            self.progress.update(65, "Sorting by sales rep...")
-            
-            result = dashboard.create_enterprise_dashboard(file_input)
+            result = dashboard.create_enterprise_dashboard(file_input, progress=self.stage_progress())
             
-            # Step 3: Generate report (80-100%)
-            self.progress.update(85, "Generating Excel charts...")
-            self.progress.update(95, "Applying formatting...")
+            if result['status'] == 'error':
+                self.progress.update(self.progress.current_step, f"Error: {result['message']}", error=True)
+                return result
             
             self.progress.complete("Enterprise dashboard created successfully")
             
             return result
             
         except ProgressCancelled:
+            dashboard.cleanup()  # Drop the partly written report
             return {
                 'status': 'cancelled',
                 'message': 'Operation was cancelled by user'
@@ -199,13 +184,15 @@ class ArrangeArrearsWithProgress(ProgressAwareLoanProcessor):
 
 
 # Factory function to create progress-aware processors
-def create_progress_processor(processor_type: str, progress_tracker: Optional[ProgressTracker] = None):
+def create_progress_processor(processor_type: str, progress_tracker: Optional[ProgressTracker] = None,
+                              block_rows: int = DEFAULT_BLOCK_ROWS):
     """
     Create a progress-aware processor
     
     Args:
         processor_type: Type of processor ('dormant', 'arrears_collected', 'arrange_arrears', etc.)
         progress_tracker: Optional progress tracker instance
+        block_rows: Rows processed between progress reports and cancellation checks
     
     Returns:
         Progress-aware processor instance
@@ -220,4 +207,4 @@ def create_progress_processor(processor_type: str, progress_tracker: Optional[Pr
     if not processor_class:
         raise ValueError(f"Unknown processor type: {processor_type}")
     
-    return processor_class(progress_tracker)
+    return processor_class(progress_tracker, block_rows)
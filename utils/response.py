@@ -2,45 +2,63 @@
 Response utilities for mobile-optimized API
 Includes standardized responses, caching, compression, and partial field selection
 """
-from flask import jsonify, request, make_response
+from flask import request, make_response, current_app
 from datetime import datetime
+from functools import lru_cache
 import hashlib
 import json
+import os
 from typing import Any, Dict, List, Optional
+import pandas as pd
+from utils.json_encoder import dumps
+from utils.metrics import timed_stage
 
 
 def success_response(
     data: Any,
     message: Optional[str] = None,
     status_code: int = 200,
-    headers: Optional[Dict[str, str]] = None
+    headers: Optional[Dict[str, str]] = None,
+    request_fields: bool = True
 ) -> tuple:
     """
     Create standardized success response
     
+    DataFrames in the response data are serialized column-wise (see
+    utils.json_encoder), so result pages can be passed without converting
+    them to record dicts first.
+    
     Args:
         data: Response data
         message: Optional success message
         status_code: HTTP status code
         headers: Optional additional headers
+        request_fields: Include the timestamp and correlation ID of this
+            request; False for bodies replayed to later requests (the
+            X-Correlation-Id header still carries the ID)
     
     Returns:
         Tuple of (response, status_code, headers)
     """
     response_data = {
         'success': True,
-        'data': data,
-        'timestamp': datetime.utcnow().isoformat() + 'Z'
+        'data': data
     }
     
+    if request_fields:
+        response_data['timestamp'] = datetime.utcnow().isoformat() + 'Z'
+    
     if message:
         response_data['message'] = message
     
     # Add correlation ID if available
-    if hasattr(request, 'correlation_id'):
+    if request_fields and hasattr(request, 'correlation_id'):
         response_data['correlation_id'] = request.correlation_id
     
-    response = jsonify(response_data)
+    with timed_stage('serialize'):
+        body = dumps(response_data)
+    
+    response = current_app.response_class(body, mimetype='application/json')
     
     # Add custom headers
     if headers:
@@ -61,7 +79,7 @@ def generate_etag(data: Any) -> str:
         ETag string
     """
     # Convert data to JSON string
-    json_str = json.dumps(data, sort_keys=True, default=str)
+    json_str = dumps(data)
     
     # Generate hash
     etag = hashlib.md5(json_str.encode()).hexdigest()
@@ -69,31 +87,200 @@ def generate_etag(data: Any) -> str:
     return f'"{etag}"'
 
 
-def check_etag(data: Any) -> bool:
+def fingerprint_upload(file, block_size: int = 1048576) -> str:
+    """
+    Hash the content of an uploaded file without reading it into memory
+    
+    The stream is rewound afterwards so the file can still be processed.
+    
+    Args:
+        file: FileStorage object
+        block_size: Bytes read per step
+    
+    Returns:
+        Hex digest of the file content
+    """
+    digest = hashlib.sha256()
+    stream = file.stream
+    stream.seek(0)
+    
+    for block in iter(lambda: stream.read(block_size), b''):
+        digest.update(block)
+    
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=1)
+def _source_digest() -> str:
+    """Digest of the application source, used when CODE_VERSION is not set"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    digest = hashlib.sha256()
+    
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(
+            name for name in dirnames
+            if not name.startswith('.') and name not in ('tests', 'venv', 'android-app', '__pycache__')
+        )
+        for filename in sorted(filenames):
+            if filename.endswith('.py'):
+                path = os.path.join(dirpath, filename)
+                digest.update(os.path.relpath(path, root).encode())
+                with open(path, 'rb') as source:
+                    digest.update(source.read())
+    
+    return digest.hexdigest()[:12]
+
+
+def get_code_version() -> str:
+    """
+    Get code version that input-fingerprint ETags are bound to
+    
+    Returns:
+        CODE_VERSION config value, or a digest of the source tree
+    """
+    return current_app.config.get('CODE_VERSION') or _source_digest()
+
+
+def generate_input_etag(*fingerprints: str) -> str:
+    """
+    Generate ETag from request inputs instead of the response body
+    
+    The ETag covers the endpoint, URL arguments, query parameters, non-file
+    form fields, the given input fingerprints (e.g. from fingerprint_upload)
+    and the code version. Identical inputs produce identical results, so a
+    304 decision can be made before any processing or serialization.
+    
+    Args:
+        *fingerprints: Fingerprints of the request's input data
+    
+    Returns:
+        ETag string
+    """
+    parts = [
+        get_code_version(),
+        request.endpoint or request.path,
+        json.dumps(request.view_args or {}, sort_keys=True, default=str),
+        json.dumps(sorted(request.args.items(multi=True))),
+        json.dumps(sorted(request.form.items(multi=True))),
+        *fingerprints
+    ]
+    
+    etag = hashlib.sha256('\n'.join(parts).encode()).hexdigest()[:32]
+    
+    return f'"{etag}"'
+
+
+def generate_result_etag(input_etag: str, *result_ids: str) -> str:
+    """
+    Bind an input-fingerprint ETag to the result handles sent with it
+    
+    Args:
+        input_etag: ETag from generate_input_etag
+        *result_ids: Handles of the stored results in the response
+    
+    Returns:
+        ETag string ("<input etag>.<result id>...")
+    """
+    return '"' + '.'.join([input_etag.strip('"'), *result_ids]) + '"'
+
+
+def etag_result_ids(input_etag: str) -> List[List[str]]:
+    """
+    Get result handles of the client's ETags issued for these inputs
+    
+    Encoding suffixes added by response compression ("<etag>:gzip") are ignored.
+    
+    Args:
+        input_etag: Current input-fingerprint ETag
+    
+    Returns:
+        Result handles of each matching ETag in If-None-Match
+    """
+    current = input_etag.strip('"')
+    matches = []
+    
+    for client_etag in request.headers.get('If-None-Match', '').split(','):
+        client_etag = client_etag.strip()
+        if client_etag.startswith('W/'):
+            client_etag = client_etag[2:]
+        
+        input_part, _, result_ids = client_etag.strip('"').split(':', 1)[0].partition('.')
+        if input_part == current and result_ids:
+            matches.append(result_ids.split('.'))
+    
+    return matches
+
+
+def etag_matches(etag: str) -> bool:
+    """
+    Check if client's If-None-Match header matches an ETag
+    
+    Encoding suffixes added by response compression ("<etag>:gzip") are ignored.
+    
+    Args:
+        etag: Current ETag string
+    
+    Returns:
+        True if ETag matches (304 should be returned)
+    """
+    client_etags = request.headers.get('If-None-Match')
+    
+    if not client_etags:
+        return False
+    
+    current = etag.strip('"')
+    
+    for client_etag in client_etags.split(','):
+        client_etag = client_etag.strip()
+        if client_etag == '*':
+            return True
+        if client_etag.startswith('W/'):
+            client_etag = client_etag[2:]
+        if client_etag.strip('"').split(':', 1)[0] == current:
+            return True
+    
+    return False
+
+
+def check_etag(data: Any, etag: Optional[str] = None) -> bool:
     """
     Check if client's ETag matches current data
     
     Args:
         data: Current response data
+        etag: Precomputed ETag for the data (avoids hashing it again)
     
     Returns:
         True if ETag matches (304 should be returned)
     """
-    client_etag = request.headers.get('If-None-Match')
-    
-    if not client_etag:
+    if not request.headers.get('If-None-Match'):
         return False
     
-    current_etag = generate_etag(data)
+    return etag_matches(etag or generate_etag(data))
+
+
+def not_modified_response(etag: str) -> tuple:
+    """
+    Create 304 Not Modified response
+    
+    Args:
+        etag: ETag of the unchanged representation
     
-    return client_etag == current_etag
+    Returns:
+        Response tuple
+    """
+    response = make_response('', 304)
+    response.headers['ETag'] = etag
+    return response, 304
 
 
 def cached_response(
     data: Any,
     max_age: int = 300,
     private: bool = False,
-    must_revalidate: bool = True
+    must_revalidate: bool = True,
+    etag: Optional[str] = None
 ) -> tuple:
     """
     Create response with caching headers
@@ -103,22 +290,23 @@ def cached_response(
         max_age: Cache max age in seconds
         private: Whether cache is private (user-specific)
         must_revalidate: Whether cache must revalidate
+        etag: Precomputed ETag (e.g. from generate_input_etag); hashed
+            from the data once if not given
     
     Returns:
         Response tuple
     """
+    if etag is None:
+        etag = generate_etag(data)
+    
     # Check ETag
-    if check_etag(data):
-        # Return 304 Not Modified
-        response = make_response('', 304)
-        response.headers['ETag'] = generate_etag(data)
-        return response, 304
+    if etag_matches(etag):
+        return not_modified_response(etag)
     
     # Create success response
     response, status_code = success_response(data)
     
     # Add ETag
-    etag = generate_etag(data)
     response.headers['ETag'] = etag
     
     # Add Cache-Control header
@@ -147,7 +335,7 @@ def select_fields(data: Any, fields: Optional[List[str]] = None) -> Any:
     Select specific fields from response data (sparse fieldsets)
     
     Args:
-        data: Response data (dict or list of dicts)
+        data: Response data (dict, list of dicts or DataFrame)
         fields: List of field names to include
     
     Returns:
@@ -156,6 +344,9 @@ def select_fields(data: Any, fields: Optional[List[str]] = None) -> Any:
     if not fields:
         return data
     
+    if isinstance(data, pd.DataFrame):
+        return data[[field for field in fields if field in data.columns]]
+    
     if isinstance(data, dict):
         return {key: value for key, value in data.items() if key in fields}
     
@@ -233,7 +424,10 @@ def add_response_headers(response, headers: Dict[str, str]):
 def compress_response(response, min_size: int = 500):
     """
     Compress response if size exceeds threshold
-    Note: Flask-Compress handles this automatically, this is for manual control
+    Note: CompressionMiddleware handles this automatically, this is for manual control
+    
+    The encoding comes from Accept-Encoding; the level is picked from the
+    body size and CPU load (see middleware.compression).
     
     Args:
         response: Flask response object
@@ -242,25 +436,24 @@ def compress_response(response, min_size: int = 500):
     Returns:
         Potentially compressed response
     """
+    from middleware.compression import negotiated_encoding, compression_level, compress_body, add_server_timing
+    
     # Check if response is large enough to compress
     if response.content_length and response.content_length < min_size:
         return response
     
     # Check if client accepts compression
-    accept_encoding = request.headers.get('Accept-Encoding', '')
-    
-    if 'br' in accept_encoding:
-        # Brotli compression (better for mobile)
-        import brotli
-        compressed = brotli.compress(response.get_data())
-        response.set_data(compressed)
-        response.headers['Content-Encoding'] = 'br'
-    elif 'gzip' in accept_encoding:
-        # Gzip compression
-        import gzip
-        compressed = gzip.compress(response.get_data())
-        response.set_data(compressed)
-        response.headers['Content-Encoding'] = 'gzip'
+    encoding = negotiated_encoding()
+    if encoding is None or 'Content-Encoding' in response.headers:
+        return response
+    
+    data = response.get_data()
+    level = compression_level(encoding, len(data))
+    compressed, elapsed = compress_body(data, encoding, level)
+    
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    add_server_timing(response, 'compress', elapsed, f'{encoding} {level}')
     
     return response
 
@@ -269,6 +462,7 @@ def mobile_optimized_response(
     data: Any,
     cacheable: bool = False,
     max_age: int = 300,
+    etag: Optional[str] = None,
     **kwargs
 ) -> tuple:
     """
@@ -278,6 +472,8 @@ def mobile_optimized_response(
         data: Response data
         cacheable: Whether response should be cached
         max_age: Cache max age in seconds
+        etag: Precomputed ETag; sent (with no-cache) even when not cacheable,
+            so clients can revalidate with If-None-Match
         **kwargs: Additional arguments
     
     Returns:
@@ -296,6 +492,12 @@ def mobile_optimized_response(
     
     # Create response with caching if enabled
     if cacheable:
-        return cached_response(filtered_data, max_age=max_age)
-    else:
-        return success_response(filtered_data, **kwargs)
+        return cached_response(filtered_data, max_age=max_age, etag=etag)
+    
+    response, status_code = success_response(filtered_data, **kwargs)
+    
+    if etag:
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = 'private, no-cache'
+    
+    return response, status_code
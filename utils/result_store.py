@@ -0,0 +1,324 @@
+"""
+Server-side result store for paginated loan analysis results
+Keeps processed result frames under opaque handles so later pages are
+served by slicing the stored frame instead of re-uploading and re-processing.
+Results are also written to a directory shared by the workers of a host, so
+any worker can serve pages of a result another worker computed
+"""
+from typing import Any, Dict, Optional
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+import pandas as pd
+
+from utils.json_encoder import dumps
+
+logger = logging.getLogger(__name__)
+
+# Seconds between sweeps of expired shared results (per process)
+PURGE_INTERVAL = 60.0
+
+# Stored times are naive UTC; shared metadata holds them as epoch seconds
+_EPOCH = datetime(1970, 1, 1)
+
+
+class StoredResult:
+    """Processed result frame plus the metadata needed to serve its pages"""
+
+    def __init__(self, result_id: str, frame: pd.DataFrame, summary: Optional[Dict[str, Any]] = None,
+                 user_id: Optional[Any] = None, ttl_seconds: float = 900, **metadata):
+        """
+        Initialize stored result
+
+        Args:
+            result_id: Opaque handle for this result
+            frame: Result frame that pages are sliced from
+            summary: Summary block returned alongside every page
+            user_id: Owner of the result (only the owner may read it)
+            ttl_seconds: Lifetime of the result in seconds
+            **metadata: Additional metadata (e.g., analysis name)
+        """
+        self.result_id = result_id
+        self.frame = frame
+        self.summary = summary or {}
+        self.user_id = user_id
+        self.metadata = metadata
+        self.created_at = datetime.utcnow()
+        self.expires_at = self.created_at + timedelta(seconds=ttl_seconds)
+        self._encoded: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._encoded_lock = threading.Lock()
+
+    def is_expired(self) -> bool:
+        """Check if result has outlived its TTL"""
+        return datetime.utcnow() > self.expires_at
+
+    def get_encoded(self, key: str) -> Optional[bytes]:
+        """Get response body compressed for an earlier request (None if not cached)"""
+        with self._encoded_lock:
+            body = self._encoded.get(key)
+            if body is not None:
+                self._encoded.move_to_end(key)
+            return body
+
+    def put_encoded(self, key: str, body: bytes, max_entries: int = 16):
+        """
+        Keep a compressed response body of this result
+
+        Args:
+            key: Page representation and encoding the body belongs to
+            body: Compressed response body
+            max_entries: Maximum bodies kept (least recently used are evicted)
+        """
+        with self._encoded_lock:
+            self._encoded[key] = body
+            self._encoded.move_to_end(key)
+            while len(self._encoded) > max_entries:
+                self._encoded.popitem(last=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Handle information for API responses"""
+        return {
+            'result_id': self.result_id,
+            'total_count': len(self.frame),
+            'expires_at': self.expires_at.isoformat() + 'Z'
+        }
+
+
+# Global result storage (insertion ordered for LRU eviction)
+_result_store: 'OrderedDict[str, StoredResult]' = OrderedDict()
+_store_lock = threading.Lock()
+
+# Directory shared by the workers of this host (None: this process only)
+_shared_dir: Optional[str] = None
+_last_shared_purge = 0.0
+
+
+def configure_result_store(directory: Optional[str]):
+    """
+    Set the directory results are shared through
+
+    Args:
+        directory: Directory on a filesystem all workers of the host see
+            (created if missing), or None to keep results in this process only
+    """
+    global _shared_dir
+
+    if directory:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+    _shared_dir = directory or None
+
+
+def store_result(frame: pd.DataFrame, summary: Optional[Dict[str, Any]] = None,
+                 user_id: Optional[Any] = None, ttl_seconds: int = 900,
+                 max_entries: int = 64, **metadata) -> StoredResult:
+    """
+    Store a processed result frame under a new opaque handle
+
+    Args:
+        frame: Result frame to store
+        summary: Summary block for the result
+        user_id: Owner of the result
+        ttl_seconds: Lifetime of the result in seconds
+        max_entries: Maximum number of results kept (least recently used are evicted)
+        **metadata: Additional metadata
+
+    Returns:
+        StoredResult instance
+    """
+    result = StoredResult(str(uuid.uuid4()), frame, summary, user_id, ttl_seconds, **metadata)
+    _write_shared(result)
+
+    with _store_lock:
+        _purge_expired_locked()
+        _keep_locked(result, max_entries)
+
+    _purge_shared()
+    return result
+
+
+def get_result(result_id: str, max_entries: int = 64) -> Optional[StoredResult]:
+    """
+    Get stored result by handle
+
+    Results of other workers (or evicted from this one) are read from the
+    shared directory and kept in this process from then on.
+
+    Args:
+        result_id: Result handle
+        max_entries: Maximum number of results kept when one is read back
+
+    Returns:
+        StoredResult or None if unknown or expired
+    """
+    with _store_lock:
+        result = _result_store.get(result_id)
+
+        if result is not None and result.is_expired():
+            _result_store.pop(result_id, None)
+            return None
+
+        if result is not None:
+            # Mark as recently used
+            _result_store.move_to_end(result_id)
+            return result
+
+    result = _read_shared(result_id)
+    if result is None:
+        return None
+
+    with _store_lock:
+        # Another thread may have read it back meanwhile
+        return _result_store.get(result_id) or _keep_locked(result, max_entries)
+
+
+def remove_result(result_id: str):
+    """Remove stored result"""
+    with _store_lock:
+        _result_store.pop(result_id, None)
+
+    if _shared_dir:
+        _remove_shared(_shared_dir, result_id)
+
+
+def purge_expired_results() -> int:
+    """
+    Remove all expired results
+
+    Returns:
+        Number of results removed from this process
+    """
+    with _store_lock:
+        removed = _purge_expired_locked()
+
+    _purge_shared(force=True)
+    return removed
+
+
+def _keep_locked(result: StoredResult, max_entries: int) -> StoredResult:
+    """Add result as most recently used, evicting the least recently used (caller must hold _store_lock)"""
+    _result_store[result.result_id] = result
+    _result_store.move_to_end(result.result_id)
+
+    while len(_result_store) > max_entries:
+        _result_store.popitem(last=False)
+
+    return result
+
+
+def _purge_expired_locked() -> int:
+    """Remove expired results (caller must hold _store_lock)"""
+    expired = [result_id for result_id, result in _result_store.items() if result.is_expired()]
+    for result_id in expired:
+        del _result_store[result_id]
+    return len(expired)
+
+
+def _shared_paths(directory: str, result_id: str):
+    """Get paths of a shared result's frame (Arrow IPC) and metadata (JSON)"""
+    base = os.path.join(directory, result_id)
+    return f'{base}.arrow', f'{base}.json'
+
+
+def _write_shared(result: StoredResult):
+    """
+    Write result to the shared directory
+
+    The frame is written first and the metadata last, each under a temporary
+    name and renamed, so readers only see complete results. A frame Arrow
+    cannot represent (e.g. mixed-type object columns) stays in this process.
+    """
+    directory = _shared_dir
+    if not directory:
+        return
+
+    frame_path, meta_path = _shared_paths(directory, result.result_id)
+    meta = {
+        'summary': result.summary,
+        'user_id': result.user_id,
+        'metadata': result.metadata,
+        'created_at': (result.created_at - _EPOCH).total_seconds(),
+        'expires_at': (result.expires_at - _EPOCH).total_seconds()
+    }
+    suffix = f'.{uuid.uuid4().hex}.tmp'
+
+    try:
+        result.frame.to_feather(frame_path + suffix)
+        os.replace(frame_path + suffix, frame_path)
+
+        with open(meta_path + suffix, 'w', encoding='utf-8') as meta_file:
+            meta_file.write(dumps(meta))
+        os.replace(meta_path + suffix, meta_path)
+    except Exception as e:
+        logger.warning(f"Result {result.result_id} kept in this worker only: {str(e)}")
+        for path in (frame_path + suffix, meta_path + suffix, frame_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def _read_shared(result_id: str) -> Optional[StoredResult]:
+    """Read a result from the shared directory (None if unknown or expired)"""
+    directory = _shared_dir
+    if not directory or os.path.basename(result_id) != result_id:
+        return None
+
+    frame_path, meta_path = _shared_paths(directory, result_id)
+
+    try:
+        with open(meta_path, encoding='utf-8') as meta_file:
+            meta = json.load(meta_file)
+
+        if time.time() > meta['expires_at']:
+            _remove_shared(directory, result_id)
+            return None
+
+        frame = pd.read_feather(frame_path)
+    except (OSError, ValueError, KeyError):
+        return None
+
+    result = StoredResult(
+        result_id, frame, meta['summary'], meta['user_id'],
+        ttl_seconds=meta['expires_at'] - time.time(), **meta['metadata']
+    )
+    result.created_at = _EPOCH + timedelta(seconds=meta['created_at'])
+    result.expires_at = _EPOCH + timedelta(seconds=meta['expires_at'])
+
+    return result
+
+
+def _remove_shared(directory: str, result_id: str):
+    """Delete a result from the shared directory"""
+    for path in _shared_paths(directory, result_id)[::-1]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _purge_shared(force: bool = False):
+    """Delete expired results from the shared directory, at most every PURGE_INTERVAL seconds"""
+    global _last_shared_purge
+
+    directory = _shared_dir
+    now = time.time()
+    if not directory or (not force and now - _last_shared_purge < PURGE_INTERVAL):
+        return
+    _last_shared_purge = now
+
+    for entry in os.scandir(directory):
+        if not entry.name.endswith('.json'):
+            continue
+
+        try:
+            with open(entry.path, encoding='utf-8') as meta_file:
+                expires_at = json.load(meta_file)['expires_at']
+        except (OSError, ValueError, KeyError):
+            continue
+
+        if now > expires_at:
+            _remove_shared(directory, entry.name[:-len('.json')])
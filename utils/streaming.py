@@ -0,0 +1,250 @@
+"""
+Streaming export of full analysis results
+Sends result frames as chunked NDJSON or CSV generated in row blocks, so
+memory stays flat and the first rows arrive before the last are encoded.
+Also streams operation progress as Server-Sent Events
+"""
+from flask import Response, request, stream_with_context, current_app
+from middleware.compression import choose_encoding, enabled_encodings
+from middleware.error_handler import ValidationError
+from utils.json_encoder import encode_frame_rows
+from utils.progress import wait_for_progress
+from typing import Any, Dict, Iterator, Optional
+import json
+import time
+import zlib
+
+import pandas as pd
+
+
+# Supported stream formats and their MIME types
+STREAM_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+
+def get_stream_format() -> Optional[str]:
+    """
+    Get requested stream format from query parameters
+
+    Query params:
+        output: 'stream' to request a streamed export
+        format: 'ndjson' (default) or 'csv'
+
+    Returns:
+        Stream format name, or None if streaming was not requested
+
+    Raises:
+        ValidationError: If the format is not supported
+    """
+    if request.args.get('output') != 'stream':
+        return None
+
+    stream_format = request.args.get('format', 'ndjson').lower()
+    if stream_format not in STREAM_FORMATS:
+        raise ValidationError(
+            f"Invalid stream format '{stream_format}'. Allowed: {', '.join(STREAM_FORMATS)}",
+            details={'field': 'format'}
+        )
+
+    return stream_format
+
+
+def iter_ndjson(frame: pd.DataFrame, block_rows: int) -> Iterator[bytes]:
+    """
+    Generate NDJSON (one JSON object per line) in row blocks
+
+    Args:
+        frame: Result frame
+        block_rows: Rows encoded per block
+
+    Yields:
+        Encoded blocks
+    """
+    for start in range(0, len(frame), block_rows):
+        rows = encode_frame_rows(frame.iloc[start:start + block_rows])
+        yield ('\n'.join(rows) + '\n').encode('utf-8')
+
+
+def iter_csv(frame: pd.DataFrame, block_rows: int) -> Iterator[bytes]:
+    """
+    Generate CSV in row blocks (header first)
+
+    Args:
+        frame: Result frame
+        block_rows: Rows encoded per block
+
+    Yields:
+        Encoded blocks
+    """
+    yield frame.iloc[:0].to_csv(index=False).encode('utf-8')
+
+    for start in range(0, len(frame), block_rows):
+        block = frame.iloc[start:start + block_rows]
+        yield block.to_csv(index=False, header=False).encode('utf-8')
+
+
+def gzip_stream(chunks: Iterator[bytes], level: int = 6) -> Iterator[bytes]:
+    """
+    Gzip a stream incrementally, flushing after every block
+
+    Each block is sync-flushed so clients can decode rows as they arrive.
+
+    Args:
+        chunks: Uncompressed blocks
+        level: Compression level
+
+    Yields:
+        Compressed blocks
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31 = gzip container
+
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+
+    yield compressor.flush()
+
+
+def stream_frame_response(
+    frame: pd.DataFrame,
+    stream_format: str,
+    filename: Optional[str] = None,
+    block_rows: Optional[int] = None
+) -> Response:
+    """
+    Create chunked streaming response for a full result frame
+
+    Args:
+        frame: Result frame to export
+        stream_format: 'ndjson' or 'csv'
+        filename: Optional download filename (without extension)
+        block_rows: Rows encoded per block (default: STREAM_BLOCK_ROWS)
+
+    Returns:
+        Streaming Flask response
+    """
+    if block_rows is None:
+        block_rows = current_app.config.get('STREAM_BLOCK_ROWS', 5000)
+
+    if stream_format == 'csv':
+        chunks = iter_csv(frame, block_rows)
+    else:
+        chunks = iter_ndjson(frame, block_rows)
+
+    headers = {
+        'X-Total-Count': str(len(frame)),
+        'Cache-Control': 'no-store'
+    }
+
+    if filename:
+        headers['Content-Disposition'] = f'attachment; filename="{filename}.{stream_format}"'
+
+    # Compress on the fly (response compression would buffer the whole stream); streams only use gzip
+    gzip_enabled = tuple(encoding for encoding in enabled_encodings() if encoding == 'gzip')
+    if choose_encoding(request.headers.get('Accept-Encoding', ''), gzip_enabled):
+        chunks = gzip_stream(chunks, current_app.config.get('COMPRESS_LEVEL', 6))
+        headers['Content-Encoding'] = 'gzip'
+        headers['Vary'] = 'Accept-Encoding'
+
+    return Response(
+        stream_with_context(chunks),
+        mimetype=STREAM_FORMATS[stream_format],
+        headers=headers
+    )
+
+
+def format_event(data: Dict[str, Any], event: str, event_id: Optional[Any] = None) -> bytes:
+    """
+    Encode one Server-Sent Event
+
+    Args:
+        data: Event payload (sent as JSON)
+        event: Event name
+        event_id: Event ID (echoed by reconnecting clients in Last-Event-ID)
+
+    Returns:
+        Encoded event
+    """
+    lines = [f'event: {event}']
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'data: {json.dumps(data, default=str, separators=(",", ":"))}')
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+
+def iter_progress_events(
+    operation_id: str,
+    since_version: Optional[int],
+    heartbeat: float,
+    max_seconds: float
+) -> Iterator[bytes]:
+    """
+    Generate progress events until the operation finishes
+
+    Each event carries the latest progress, so rapid updates are coalesced
+    into one event per flush interval. Comments keep idle connections open.
+    The stream ends after max_seconds; clients reconnect and resume from
+    Last-Event-ID.
+
+    Args:
+        operation_id: Operation to stream
+        since_version: Progress version the client already has
+        heartbeat: Seconds between keep-alive comments while idle
+        max_seconds: Seconds before the stream is closed
+
+    Yields:
+        Encoded events
+    """
+    deadline = time.monotonic() + max_seconds
+
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+
+        status = wait_for_progress(operation_id, since_version, timeout=min(heartbeat, remaining))
+        if status is None:
+            yield format_event({'operation_id': operation_id}, 'expired')
+            return
+
+        if status['version'] != since_version:
+            since_version = status['version']
+            yield format_event(status, 'progress', since_version)
+        elif not status['finished']:
+            yield b': keep-alive\n\n'
+            continue
+
+        if status['finished']:
+            yield format_event(status, 'end', since_version)
+            return
+
+
+def progress_event_stream_response(operation_id: str, since_version: Optional[int] = None) -> Response:
+    """
+    Create Server-Sent Events response for an operation's progress
+
+    Args:
+        operation_id: Operation to stream
+        since_version: Progress version the client already has
+
+    Returns:
+        Streaming Flask response
+    """
+    chunks = iter_progress_events(
+        operation_id,
+        since_version,
+        heartbeat=current_app.config.get('PROGRESS_STREAM_HEARTBEAT', 15),
+        max_seconds=current_app.config.get('PROGRESS_STREAM_MAX_SECONDS', 300)
+    )
+
+    return Response(
+        chunks,
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-store',
+            'X-Accel-Buffering': 'no'  # Deliver events through proxies without buffering
+        }
+    )